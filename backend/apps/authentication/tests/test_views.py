@@ -3,11 +3,20 @@ Tests for Authentication API Endpoints
 """
 
 import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
 
+from apps.inventory import services
+from apps.inventory.models import StockMovement
+from apps.sweets.models import Sweet
+
 User = get_user_model()
 
 
@@ -163,4 +172,139 @@ class TestLogin:
         
         response = self.client.post(self.login_url, data, format='json')
         
-        assert response.status_code == status.HTTP_401_UNAUTHORIZED
\ No newline at end of file
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+class TestOrderHistory:
+    """Test GET /api/auth/profile/orders/ and /api/auth/users/:id/orders/"""
+    
+    def setup_method(self):
+        """Setup a user with a few orders"""
+        self.client = APIClient()
+        self.url = '/api/auth/profile/orders/'
+        self.user = User.objects.create_user(
+            email='buyer@example.com',
+            username='buyer',
+            password='BuyerPass123!'
+        )
+        self.fudge = Sweet.objects.create(name='Fudge', price=Decimal('3.00'), quantity=100)
+        self.toffee = Sweet.objects.create(name='Toffee', price=Decimal('1.50'), quantity=100)
+        
+        services.purchase(self.fudge.id, 2, user=self.user)
+        services.restock(self.fudge.id, 10, user=self.user)
+        services.checkout([(self.toffee.id, 4), (self.fudge.id, 1)], user=self.user)
+        services.purchase(self.toffee.id, 1)
+    
+    def test_orders_newest_first(self):
+        """
+        Test a user sees their purchases only, newest first
+        """
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(self.url)
+        
+        assert response.status_code == status.HTTP_200_OK
+        orders = response.data['results']
+        assert sorted((order['sweet_name'], order['quantity']) for order in orders) == [
+            ('Fudge', 1), ('Fudge', 2), ('Toffee', 4)
+        ]
+        assert orders[-1]['sweet_name'] == 'Fudge'
+        assert orders[-1]['total_cost'] == '6.00'
+        assert [order['created_at'] for order in orders] == sorted(
+            (order['created_at'] for order in orders), reverse=True
+        )
+        assert response.data['next'] is None
+    
+    def test_keyset_paging(self):
+        """
+        Test paging forward and back visits every order exactly once
+        """
+        start = timezone.now() - timedelta(days=1)
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                sweet=self.fudge, kind=StockMovement.PURCHASE, quantity=-1, balance=0,
+                unit_price=self.fudge.price, user=self.user,
+                # Pairs share a timestamp, ordered by id
+                created_at=start + timedelta(seconds=n // 2),
+            )
+            for n in range(25)
+        ])
+        self.client.force_authenticate(user=self.user)
+        
+        pages, url = [], f'{self.url}?page_size=4'
+        while url:
+            response = self.client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            pages.append([order['id'] for order in response.data['results']])
+            url = response.data['next']
+        back = self.client.get(response.data['previous'])
+        
+        seen = [order_id for page in pages for order_id in page]
+        assert len(seen) == len(set(seen)) == 28
+        assert [order['id'] for order in back.data['results']] == pages[-2]
+    
+    def test_invalid_cursor(self):
+        """
+        Test a garbled cursor is rejected
+        """
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(f'{self.url}?cursor=garbage')
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_orders_require_authentication(self):
+        """
+        Test that orders need a logged-in user
+        """
+        response = self.client.get(self.url)
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_admin_looks_up_a_customer(self):
+        """
+        Test admins can see any user's orders, and only admins
+        """
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='AdminPass123!', is_admin=True
+        )
+        url = f'/api/auth/users/{self.user.id}/orders/'
+        
+        self.client.force_authenticate(user=self.user)
+        forbidden = self.client.get(url)
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(url)
+        missing = self.client.get('/api/auth/users/99999/orders/')
+        
+        assert forbidden.status_code == status.HTTP_403_FORBIDDEN
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 3
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_page_is_an_index_range_scan(self):
+        """
+        Test a page of a user with many orders reads the orders index in
+        order from the cursor, without sorting
+        """
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                sweet=self.fudge, kind=StockMovement.PURCHASE, quantity=-1, balance=0,
+                unit_price=self.fudge.price, user=self.user,
+                created_at=timezone.now() - timedelta(minutes=n),
+            )
+            for n in range(5000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE stock_movements')
+        self.client.force_authenticate(user=self.user)
+        cursor_url = self.client.get(f'{self.url}?page_size=10').data['next']
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(cursor_url)
+        
+        sql = next(query['sql'] for query in queries if 'stock_movements' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        assert 'stock_movements_orders_idx' in plan
+        assert 'Sort' not in plan
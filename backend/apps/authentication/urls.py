@@ -10,4 +10,6 @@ urlpatterns = [
     path('login/', views.login, name = 'login'),
     path('token/refresh/', TokenRefreshView.as_view(), name = 'token_refresh'),
     path('profile/', views.get_user_profile, name = 'profile'),
+    path('profile/orders/', views.get_user_orders, name = 'profile-orders'),
+    path('users/<int:pk>/orders/', views.get_customer_orders, name = 'customer-orders'),
 ]
\ No newline at end of file
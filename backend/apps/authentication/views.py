@@ -3,7 +3,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
+from django.contrib.auth import authenticate, get_user_model
+from apps.inventory.orders import OrderCursorPagination, add_details, orders_of
+from apps.inventory.permissions import IsAdminUser
+from apps.inventory.serializers import OrderSerializer
 from .serializers import UserRegistrationSerializer, UserSerializer
 # Create your views here.
 
@@ -102,4 +105,43 @@ def get_user_profile(request):
     }
     """
     serializer = UserSerializer(request.user)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_user_orders(request):
+    """
+    Get current logged-in user's orders, newest first
+    
+    GET /api/auth/profile/orders/?page_size=20
+    Headers: Authorization: Bearer 
+    Query: cursor (from `next`/`previous`), page_size (max 100)
+    
+    Returns: {
+        "next": "...?cursor=...",
+        "previous": null,
+        "results": [{"id", "created_at", "sweet_id", "sweet_name",
+                     "quantity", "unit_price", "total_cost"}, ...]
+    }
+    """
+    return _orders_page(request, request.user.pk)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def get_customer_orders(request, pk):
+    """
+    Get any user's orders, newest first - Admin only
+    
+    GET /api/auth/users/:id/orders/
+    Same query and response as /api/auth/profile/orders/; 404 if the user
+    does not exist
+    """
+    if not get_user_model().objects.filter(pk=pk).exists():
+        return Response({'detail': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    return _orders_page(request, pk)
+
+def _orders_page(request, user_id):
+    paginator = OrderCursorPagination()
+    orders = add_details(paginator.paginate_queryset(orders_of(user_id), request))
+    return paginator.get_paginated_response(OrderSerializer(orders, many=True).data)
+
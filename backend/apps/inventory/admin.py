@@ -1,3 +1,41 @@
+"""
+Django Admin Configuration for the Inventory Ledger
+"""
+
 from django.contrib import admin
+from .models import StockMovement
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """Read-only audit trail of stock changes"""
+
+    list_display = (
+        'created_at',
+        'sweet_id',
+        'kind',
+        'quantity',
+        'balance',
+        'unit_price',
+        'user_id',
+    )
+
+    list_filter = (
+        'kind',
+    )
+
+    # The BRIN index serves ranges of created_at, not sorts by it
+    date_hierarchy = 'created_at'
+
+    ordering = (
+        '-id',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
-# Register your models here.
+    def has_delete_permission(self, request, obj=None):
+        return False
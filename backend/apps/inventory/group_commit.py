@@ -0,0 +1,314 @@
+"""
+Group Commit
+Lets concurrent purchases share one transaction, and so one commit
+
+Each purchase normally commits on its own, and a commit waits for the
+write-ahead log to reach disk, so that wait caps purchases per second. With
+PURCHASE_GROUP_COMMIT_MS set, purchase() hands the request to a flusher
+thread in its worker process instead, which gathers requests for up to that
+long (or PURCHASE_GROUP_COMMIT_MAX_BATCH of them) and commits them together:
+- the sweets in the batch are locked in id order, and each request is
+  granted from what is left for sale, in arrival order
+- one conditional UPDATE takes every sweet's granted total, and the same
+  statement appends one ledger movement per request
+- once the batch commits, each caller gets its own result: the sweet with
+  the stock left after its purchase, or InsufficientStock as of its turn
+
+A purchase with an Idempotency-Key joins the batch too: its key is claimed
+before any sweet is locked, and its response stored, in the batch's
+transaction (see idempotency.py). Calls already inside a transaction and
+sweets with sharded stock are bought the usual way.
+
+Requests only meet in a batch if the worker serves several at once. Under
+ASGI every sync view of a worker shares one thread, so concurrent_view()
+gives the purchase view threads of its own. Under WSGI, gunicorn.conf.py
+runs threaded workers while group commit is on; a single-threaded worker
+would commit every purchase alone, only later.
+"""
+
+import copy
+import os
+import threading
+import time
+from concurrent.futures import Future
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.views.decorators.csrf import csrf_exempt
+
+from apps.sweets.models import Sweet
+from apps.sweets.realtime import publish_stock
+
+from . import services
+from .idempotency import AlreadyClaimed, store_responses
+from .models import StockMovement
+
+# The flusher thread exits, closing its connection, after this long idle
+IDLE_SECONDS = 30
+
+# `sweets` has each sweet's granted total; `lines` one row per request, in
+# arrival order, with the stock left after it
+BATCH_SQL = """
+    WITH updated AS (
+        UPDATE sweets
+           SET quantity = sweets.quantity - batch.quantity, updated_at = clock_timestamp()
+          FROM (VALUES {sweets}) AS batch (id, quantity)
+         WHERE sweets.id = batch.id
+           AND sweets.quantity - sweets.reserved >= batch.quantity
+           AND sweets.stock_shards = 0
+        RETURNING sweets.*
+    ), movements AS (
+        INSERT INTO stock_movements (sweet_id, kind, quantity, balance, unit_price, user_id, created_at)
+        SELECT updated.id, %s, 0 - line.quantity, line.balance, updated.price,
+               line.user_id::bigint, clock_timestamp()
+          FROM (VALUES {lines}) AS line (n, sweet_id, quantity, balance, user_id)
+          JOIN updated ON updated.id = line.sweet_id
+         ORDER BY line.n
+    )
+    SELECT * FROM updated
+"""
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+class PurchaseRequest:
+    """One caller's purchase, waiting in a batch"""
+
+    def __init__(self, sweet_id, quantity, user, keyed=None, respond=None):
+        self.sweet_id = sweet_id
+        self.quantity = quantity
+        self.user = user
+        self.keyed = keyed
+        self.respond = respond
+        self.queued_at = time.monotonic()
+        self.future = Future()
+
+
+class PurchaseBatcher:
+    """Queue of purchase requests and the thread that commits them in batches"""
+
+    def __init__(self, window, max_batch):
+        self.window = window
+        self.max_batch = max_batch
+        self.pid = os.getpid()
+        self._pending = []
+        self._stopping = False
+        self._thread = None
+        self._wakeup = threading.Condition()
+
+    def submit(self, request):
+        """Queue a PurchaseRequest; returns a Future of the updated Sweet"""
+        with self._wakeup:
+            self._pending.append(request)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='purchase-group-commit', daemon=True
+                )
+                self._thread.start()
+            self._wakeup.notify()
+        return request.future
+
+    def stop(self):
+        """Commit what is queued, then end the thread"""
+        with self._wakeup:
+            self._stopping = True
+            thread = self._thread
+            self._wakeup.notify()
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                self._flush(batch)
+        finally:
+            connection.close()
+
+    def _next_batch(self):
+        with self._wakeup:
+            if not self._wakeup.wait_for(lambda: self._pending or self._stopping, IDLE_SECONDS):
+                self._thread = None
+                return None
+            if not self._pending:
+                self._thread = None
+                return None
+            # The window runs from the oldest request's arrival
+            deadline = self._pending[0].queued_at + self.window
+            self._wakeup.wait_for(
+                lambda: len(self._pending) >= self.max_batch or self._stopping,
+                max(0, deadline - time.monotonic())
+            )
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _flush(self, batch):
+        try:
+            close_old_connections()
+            results = commit_purchases(batch)
+        except Exception as exc:
+            for request in batch:
+                request.future.set_exception(exc)
+            return
+        for request, result in zip(batch, results):
+            if isinstance(result, Exception):
+                request.future.set_exception(result)
+            else:
+                request.future.set_result(result)
+
+
+def purchase(sweet_id, quantity, user=None, keyed=None, respond=None):
+    """
+    services.purchase(), committed together with concurrent purchases
+
+    Blocks until the batch commits. Returns the updated Sweet; raises
+    SweetNotFound or InsufficientStock.
+
+    With `keyed`, the request's KeyedRequest, the Idempotency-Key is claimed
+    and respond(result), `result` being the Sweet or the exception, stored
+    as its Response in the transaction that buys. Raises AlreadyClaimed
+    instead if an earlier request owns the key.
+    """
+    request = PurchaseRequest(sweet_id, quantity, user, keyed, respond)
+    if not settings.PURCHASE_GROUP_COMMIT_MS or connection.in_atomic_block:
+        if keyed is None:
+            return services.purchase(sweet_id, quantity, user=user)
+        result = _purchase_keyed(request)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return get_batcher().submit(request).result()
+
+
+def get_batcher():
+    """This process's batcher, created on first use (and again after a fork)"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None or _batcher.pid != os.getpid():
+            _batcher = PurchaseBatcher(
+                settings.PURCHASE_GROUP_COMMIT_MS / 1000,
+                settings.PURCHASE_GROUP_COMMIT_MAX_BATCH
+            )
+        return _batcher
+
+
+def shutdown():
+    """Stop this process's batcher, if it runs; the next purchase starts a new one"""
+    global _batcher
+    with _batcher_lock:
+        batcher, _batcher = _batcher, None
+    if batcher is not None and batcher.pid == os.getpid():
+        batcher.stop()
+
+
+def commit_purchases(batch):
+    """
+    Buy every PurchaseRequest of `batch` in one transaction
+
+    Returns one result per request, in order: the Sweet after its purchase,
+    or the exception it should raise.
+    """
+    results = [None] * len(batch)
+    with transaction.atomic():
+        # In key order, so two batches claiming the same keys cannot deadlock,
+        # and before any sweet is locked while a claim waits
+        keyed = sorted(
+            (n for n, request in enumerate(batch) if request.keyed is not None),
+            key=lambda n: (batch[n].keyed.user.pk, batch[n].keyed.key)
+        )
+        for n in keyed:
+            if not batch[n].keyed.claim():
+                results[n] = AlreadyClaimed()
+
+        locked = {
+            sweet.id: sweet
+            for sweet in Sweet.objects.select_for_update()
+            .filter(pk__in={batch[n].sweet_id for n in range(len(batch)) if results[n] is None})
+            .order_by('pk')
+            .only('id', 'name', 'quantity', 'reserved', 'stock_shards')
+        }
+
+        granted, lines = {}, []
+        for n, request in enumerate(batch):
+            if results[n] is not None:
+                continue
+            sweet = locked.get(request.sweet_id)
+            if sweet is None:
+                results[n] = services.SweetNotFound(request.sweet_id)
+            elif sweet.stock_shards:
+                results[n] = _purchase_alone(request)
+            elif sweet.quantity - sweet.reserved < request.quantity:
+                results[n] = services.InsufficientStock(sweet.name, sweet.quantity - sweet.reserved)
+            else:
+                sweet.quantity -= request.quantity
+                granted[sweet.id] = granted.get(sweet.id, 0) + request.quantity
+                lines.append((n, sweet.id, request.quantity, sweet.quantity, services._user_id(request.user)))
+
+        if lines:
+            sweets = ', '.join(['(%s, %s)'] * len(granted))
+            placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(lines))
+            updated = {
+                sweet.id: sweet
+                for sweet in Sweet.objects.raw(
+                    BATCH_SQL.format(sweets=sweets, lines=placeholders),
+                    [*[value for pair in granted.items() for value in pair],
+                     StockMovement.PURCHASE, *[value for line in lines for value in line]]
+                )
+            }
+            publish_stock(updated.values())
+            for n, sweet_id, _, balance, _ in lines:
+                results[n] = copy.copy(updated[sweet_id])
+                results[n].quantity = balance
+
+        store_responses(
+            (batch[n].keyed, batch[n].respond(results[n]))
+            for n in keyed if batch[n].keyed.claimed is not None
+        )
+    return results
+
+
+def concurrent_view(view):
+    """
+    Serve a sync view under ASGI on a pool thread instead of the shared one
+
+    Each pool thread keeps its own database connection, checked around
+    every request the way Django checks the shared thread's.
+    """
+
+    def run(request, *args, **kwargs):
+        close_old_connections()
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            close_old_connections()
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await sync_to_async(run, thread_sensitive=False)(request, *args, **kwargs)
+
+    return csrf_exempt(wrapper)
+
+
+def _purchase_alone(request):
+    """Buy one request the usual way, in a savepoint of the transaction it runs in"""
+    try:
+        with transaction.atomic():
+            return services.purchase(request.sweet_id, request.quantity, user=request.user)
+    except (services.SweetNotFound, services.InsufficientStock) as exc:
+        return exc
+
+
+def _purchase_keyed(request):
+    """Claim the key, buy and store the response, in one transaction"""
+    with transaction.atomic():
+        if not request.keyed.claim():
+            return AlreadyClaimed()
+        result = _purchase_alone(request)
+        request.keyed.store(request.respond(result))
+    return result
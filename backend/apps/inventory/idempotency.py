@@ -0,0 +1,183 @@
+"""
+Idempotency Keys
+Lets clients retry a stock change safely by sending an Idempotency-Key
+header: the first request with a key runs, every retry gets its response
+
+@idempotent claims the key and runs the view in one transaction. The claim
+is a single INSERT ... ON CONFLICT on (user, key), so:
+- a new key is inserted, the view runs and its response is stored on the
+  same row; if anything fails, the key rolls back with the stock change
+- a retry while the first request is still running waits for it on the
+  unique index, then replays what it stored
+- a key older than IDEMPOTENCY_KEY_TTL_HOURS is claimed afresh, even if
+  the purge has not removed it yet
+
+Keys are per user. Reusing one for a different request is refused with 422.
+
+A view declared with @idempotent(claimed_by_view=True) claims the key and
+stores its response itself, through the KeyedRequest it gets as
+request.idempotency, in whatever transaction makes its change. The purchase
+view does so to buy in a group commit batch (see group_commit.py).
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Returns the row only if this request now owns the key
+CLAIM_SQL = """
+    INSERT INTO idempotency_keys (user_id, key, request_hash, created_at)
+    VALUES (%(user_id)s, %(key)s, %(request_hash)s, %(now)s)
+    ON CONFLICT (user_id, key) DO UPDATE
+       SET request_hash = EXCLUDED.request_hash,
+           created_at = EXCLUDED.created_at,
+           status_code = NULL,
+           response = NULL
+     WHERE idempotency_keys.created_at < %(expired_before)s
+    RETURNING id
+"""
+
+
+class AlreadyClaimed(Exception):
+    """An earlier request owns the Idempotency-Key; its replay() answers this one"""
+
+
+class KeyedRequest:
+    """A request's Idempotency-Key, claimed and answered in one transaction"""
+
+    def __init__(self, user, key, request_hash):
+        self.user = user
+        self.key = key
+        self.request_hash = request_hash
+        # Id of the key's row once this request owns it
+        self.claimed = None
+        self.attempted = False
+
+    def claim(self):
+        """Claim the key; False if an earlier request owns it"""
+        self.attempted = True
+        self.claimed = _claim(self.user, self.key, self.request_hash)
+        return self.claimed is not None
+
+    def store(self, response):
+        """Store the response of the claimed key's request"""
+        IdempotencyKey.objects.filter(pk=self.claimed).update(
+            status_code=response.status_code, response=response.data
+        )
+
+    def replay(self):
+        """The response stored by the request that owns the key"""
+        return _replay(self.user, self.key, self.request_hash)
+
+    def run(self, view):
+        """Claim the key, then run `view` and store its response; or replay"""
+        with transaction.atomic():
+            if not self.claim():
+                return self.replay()
+            response = view()
+            self.store(response)
+        return response
+
+
+def idempotent(view=None, *, claimed_by_view=False):
+    """
+    Make a function view honour Idempotency-Key
+
+    Goes under @api_view, so authentication and permissions run first and
+    their failures are never stored.
+
+    With claimed_by_view, the view gets request.idempotency, a KeyedRequest
+    or None without a key, and claims and stores through it. A response it
+    returns without claiming, which must then have changed nothing, is
+    stored as usual.
+    """
+    if view is None:
+        return partial(idempotent, claimed_by_view=claimed_by_view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            if claimed_by_view:
+                request.idempotency = None
+            return view(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        keyed = KeyedRequest(request.user, key, _request_hash(request))
+        if not claimed_by_view:
+            return keyed.run(partial(view, request, *args, **kwargs))
+
+        request.idempotency = keyed
+        response = view(request, *args, **kwargs)
+        if keyed.attempted:
+            return response
+        return keyed.run(lambda: response)
+
+    return wrapper
+
+
+def store_responses(answered):
+    """Store each (KeyedRequest, Response) pair of `answered`, in one UPDATE"""
+    IdempotencyKey.objects.bulk_update(
+        [
+            IdempotencyKey(pk=keyed.claimed, status_code=response.status_code, response=response.data)
+            for keyed, response in answered
+        ],
+        ['status_code', 'response']
+    )
+
+
+def expiry_horizon():
+    """Keys created before this have expired"""
+    return timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def _claim(user, key, request_hash):
+    with connection.cursor() as cursor:
+        cursor.execute(CLAIM_SQL, {
+            'user_id': user.pk,
+            'key': key,
+            'request_hash': request_hash,
+            'now': timezone.now(),
+            'expired_before': expiry_horizon(),
+        })
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _replay(user, key, request_hash):
+    stored = IdempotencyKey.objects.only('request_hash', 'status_code', 'response').get(
+        user=user, key=key
+    )
+    if bytes(stored.request_hash) != request_hash:
+        return Response(
+            {'error': f'{HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    response = Response(stored.response, status=stored.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _request_hash(request):
+    """SHA-256 of the method, path and parsed body"""
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).digest()
@@ -0,0 +1,145 @@
+"""
+Inventory Ledger
+Answers history questions from stock_movements without reading all of it
+
+Every purchase and restock appends a StockMovement in the statement that
+changes the stock (see services.py), with the change and the stock left
+afterwards. So:
+- stock at a moment is the balance of the sweet's last movement before it,
+  one row from stock_movements_sweet_idx
+- units sold in a range is the difference of two running totals, each the
+  latest StockSnapshot before the moment plus the movements since: at most
+  one snapshot interval of them
+
+take_snapshots() extends the running totals; run the snapshot_stock command
+periodically. Movements from the last STOCK_SNAPSHOT_SETTLE_SECONDS are left
+to the next run, since their transactions may not have committed yet.
+
+A sharded sweet's movement has no balance until its fold records it (see
+sharding.py); stock_at() skips it until then. take_snapshots() also runs
+the folds of settled movements still without one, whose process stopped
+between the commit and the fold.
+
+Stock set directly through the catalog endpoints is not a movement; it shows
+in the balance of the sweet's next purchase or restock.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import sharding
+from .models import StockMovement
+
+STOCK_AT_SQL = """
+    (SELECT balance
+       FROM stock_movements
+      WHERE sweet_id = %(sweet_id)s AND created_at < %(moment)s AND balance IS NOT NULL
+      ORDER BY created_at DESC
+      LIMIT 1)
+    UNION ALL
+    (SELECT balance - quantity
+       FROM stock_movements
+      WHERE sweet_id = %(sweet_id)s AND created_at >= %(moment)s AND balance IS NOT NULL
+      ORDER BY created_at
+      LIMIT 1)
+    LIMIT 1
+"""
+
+TOTALS_SQL = """
+    WITH snapshot AS (
+        SELECT taken_at, units_sold, units_restocked
+          FROM stock_snapshots
+         WHERE sweet_id = %(sweet_id)s AND taken_at <= %(moment)s
+         ORDER BY taken_at DESC
+         LIMIT 1
+    )
+    SELECT coalesce((SELECT units_sold FROM snapshot), 0)
+               + coalesce(sum(-quantity) FILTER (WHERE kind = %(purchase)s), 0),
+           coalesce((SELECT units_restocked FROM snapshot), 0)
+               + coalesce(sum(quantity) FILTER (WHERE kind = %(restock)s), 0)
+      FROM stock_movements
+     WHERE sweet_id = %(sweet_id)s
+       AND created_at >= coalesce((SELECT taken_at FROM snapshot), '-infinity')
+       AND created_at < %(moment)s
+"""
+
+# One row per sweet that moved since the previous run, carrying its totals
+# forward from its own latest snapshot. The window is a BRIN range scan.
+SNAPSHOT_SQL = """
+    WITH previous_run AS (
+        SELECT coalesce(max(taken_at), '-infinity') AS taken_at FROM stock_snapshots
+    ), moved AS (
+        SELECT sweet_id,
+               coalesce(sum(-quantity) FILTER (WHERE kind = %(purchase)s), 0) AS sold,
+               coalesce(sum(quantity) FILTER (WHERE kind = %(restock)s), 0) AS restocked
+          FROM stock_movements
+         WHERE created_at >= (SELECT taken_at FROM previous_run)
+           AND created_at < %(until)s
+         GROUP BY sweet_id
+    )
+    INSERT INTO stock_snapshots (sweet_id, taken_at, units_sold, units_restocked)
+    SELECT moved.sweet_id, %(until)s,
+           coalesce(latest.units_sold, 0) + moved.sold,
+           coalesce(latest.units_restocked, 0) + moved.restocked
+      FROM moved
+      LEFT JOIN LATERAL (
+          SELECT units_sold, units_restocked
+            FROM stock_snapshots
+           WHERE sweet_id = moved.sweet_id
+           ORDER BY taken_at DESC
+           LIMIT 1
+      ) latest ON true
+     WHERE %(until)s > (SELECT taken_at FROM previous_run)
+"""
+
+KINDS = {'purchase': StockMovement.PURCHASE, 'restock': StockMovement.RESTOCK}
+
+
+def stock_at(sweet_id, moment):
+    """
+    Units of a sweet in stock just before `moment`
+
+    None if the sweet has no movements at all: the ledger knows nothing
+    about it.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(STOCK_AT_SQL, {'sweet_id': sweet_id, 'moment': moment})
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def totals_before(sweet_id, moment):
+    """Units of a sweet sold and restocked before `moment`, as a dict"""
+    with connection.cursor() as cursor:
+        cursor.execute(TOTALS_SQL, {**KINDS, 'sweet_id': sweet_id, 'moment': moment})
+        sold, restocked = cursor.fetchone()
+    return {'units_sold': sold, 'units_restocked': restocked}
+
+
+def units_sold(sweet_id, start, end):
+    """Units of a sweet sold from `start` up to (not including) `end`"""
+    return totals_before(sweet_id, end)['units_sold'] - totals_before(sweet_id, start)['units_sold']
+
+
+def take_snapshots(until=None):
+    """
+    Snapshot the totals of every sweet that moved since the previous run
+
+    Covers movements up to `until`, by default STOCK_SNAPSHOT_SETTLE_SECONDS
+    ago. Returns the number of snapshots written.
+    """
+    if until is None:
+        until = timezone.now() - timedelta(seconds=settings.STOCK_SNAPSHOT_SETTLE_SECONDS)
+
+    unbalanced = StockMovement.objects.filter(balance__isnull=True, created_at__lt=until)
+    for sweet_id in unbalanced.values_list('sweet_id', flat=True).distinct():
+        sharding.fold(sweet_id)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Two overlapping runs would count the same window twice
+        cursor.execute('LOCK TABLE stock_snapshots IN EXCLUSIVE MODE')
+        cursor.execute(SNAPSHOT_SQL, {**KINDS, 'until': until})
+        return cursor.rowcount
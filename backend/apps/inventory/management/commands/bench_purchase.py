@@ -0,0 +1,233 @@
+"""
+Multi-process purchase contention benchmark
+
+Several processes hammer one hot sweet with single-unit purchases until it
+sells out, then the command checks that exactly the initial stock was sold
+and, in update mode, that the ledger recorded every sale.
+
+--shards runs the benchmark once per shard count, with the sweet's stock
+split over that many counter rows (0 = not sharded, see sharding.py), and
+also checks that Sweet.quantity, the sum of the shards, ends at zero and
+that the folds recorded every movement's balance.
+
+--hold-ms keeps each purchase's transaction open that long before it
+commits, holding the row lock the way a slow disk's commit or the
+Idempotency-Key transaction around the purchase view does. That wait, not
+CPU, is what limits purchases of one hot sweet in production.
+
+--mode group buys through group_commit.py, committing the purchases of
+each process's --threads buyers in batches gathered for --window-ms. The
+hold then applies once per batch, as a commit's flush would.
+
+--keyed sends every purchase with a fresh Idempotency-Key, claimed and
+answered the way the purchase view does: in its own transaction in update
+mode, in the batch's in group mode.
+
+Usage:
+    python manage.py bench_purchase --processes 8 --stock 5000
+    python manage.py bench_purchase --mode legacy   # old read-modify-write path
+    python manage.py bench_purchase --processes 32 --shards 0 4 16 --hold-ms 5
+    python manage.py bench_purchase --processes 4 --threads 8 --mode group --window-ms 2
+    python manage.py bench_purchase --processes 4 --threads 8 --mode group --keyed --hold-ms 5
+"""
+
+import hashlib
+import multiprocessing
+import threading
+import time
+import uuid
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from apps.inventory import group_commit, services, sharding
+from apps.inventory.idempotency import KeyedRequest
+from apps.inventory.models import IdempotencyKey, StockMovement
+from apps.inventory.views import _purchase_response
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+
+def legacy_purchase(sweet_id, quantity):
+    """The pre-UPDATE implementation: get, check in Python, save()"""
+    sweet = Sweet.objects.get(pk=sweet_id)
+    if quantity > sweet.quantity:
+        raise services.InsufficientStock(sweet.name, sweet.quantity)
+    sweet.quantity -= quantity
+    sweet.save()
+    return sweet
+
+
+MODES = {
+    'update': services.purchase,
+    'legacy': legacy_purchase,
+    'group': group_commit.purchase,
+}
+
+
+def keyed_purchase(user):
+    """A purchase sent with a fresh Idempotency-Key by `user`"""
+
+    def purchase(sweet_id, quantity):
+        key = uuid.uuid4().hex
+        return group_commit.purchase(
+            sweet_id, quantity, user=user,
+            keyed=KeyedRequest(user, key, hashlib.sha256(key.encode()).digest()),
+            respond=partial(_purchase_response, quantity)
+        )
+
+    return purchase
+
+
+def held(commit_purchases, hold):
+    """Keep each batch's transaction open for `hold` seconds before it commits"""
+
+    def commit_and_hold(batch):
+        with transaction.atomic():
+            results = commit_purchases(batch)
+            time.sleep(hold)
+        return results
+
+    return commit_and_hold
+
+
+def buyer(mode, sweet_id, hold, threads, user_id, start_event, results):
+    """Worker process: `threads` buyers each buy one unit at a time until the sweet sells out"""
+    connections.close_all()
+    purchase = MODES[mode]
+    if user_id is not None:
+        purchase = keyed_purchase(User.objects.get(pk=user_id))
+    if mode == 'group' and hold:
+        group_commit.commit_purchases = held(group_commit.commit_purchases, hold)
+        hold = 0
+    sold = []
+
+    def buy():
+        count = 0
+        start_event.wait()
+        try:
+            while True:
+                try:
+                    if hold:
+                        with transaction.atomic():
+                            purchase(sweet_id, 1)
+                            time.sleep(hold)
+                    else:
+                        purchase(sweet_id, 1)
+                except services.InsufficientStock:
+                    break
+                count += 1
+        finally:
+            sold.append(count)
+            connections.close_all()
+
+    buyers = [threading.Thread(target=buy) for _ in range(threads)]
+    for thread in buyers:
+        thread.start()
+    for thread in buyers:
+        thread.join()
+    group_commit.shutdown()
+    results.put(sum(sold))
+
+
+class Command(BaseCommand):
+    help = 'Measure purchases/sec and oversells on one hot sweet under contention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--stock', type=int, default=5000)
+        parser.add_argument('--mode', choices=sorted(MODES), default='update')
+        parser.add_argument('--shards', type=int, nargs='+', default=[0])
+        parser.add_argument('--hold-ms', type=float, default=0)
+        parser.add_argument('--threads', type=int, default=1, help='Buyers per process')
+        parser.add_argument('--window-ms', type=float, default=2, help='Group commit window')
+        parser.add_argument('--keyed', action='store_true', help='Send an Idempotency-Key with each purchase')
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'legacy' and options['shards'] != [0]:
+            raise CommandError('The legacy path does not know about shards')
+        if options['mode'] == 'legacy' and options['keyed']:
+            raise CommandError('The legacy path does not know about Idempotency-Key')
+        # Keyed purchases in update mode go through group_commit.purchase(),
+        # which buys them directly with the window at 0
+        settings.PURCHASE_GROUP_COMMIT_MS = options['window_ms'] if options['mode'] == 'group' else 0
+        for shards in options['shards']:
+            self.run(options, shards)
+
+    def run(self, options, shards):
+        stock = options['stock']
+        sweet = Sweet.objects.create(
+            name='Benchmark Hot Sweet',
+            category='Other',
+            price=Decimal('1.00'),
+            quantity=stock
+        )
+        if shards:
+            sharding.reshard(sweet.id, shards)
+        user = None
+        if options['keyed']:
+            user = User.objects.create_user(
+                email='bench-buyer@example.com', username='bench-buyer', password=uuid.uuid4().hex
+            )
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        start_event = context.Event()
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=buyer,
+                args=(options['mode'], sweet.id, options['hold_ms'] / 1000, options['threads'],
+                      user and user.pk, start_event, results)
+            )
+            for _ in range(options['processes'])
+        ]
+
+        try:
+            for worker in workers:
+                worker.start()
+            started = time.perf_counter()
+            start_event.set()
+            sold = sum(results.get() for _ in workers)
+            elapsed = time.perf_counter() - started
+            for worker in workers:
+                worker.join()
+
+            remaining = Sweet.objects.values_list('quantity', flat=True).get(pk=sweet.id)
+            answered = (
+                IdempotencyKey.objects.filter(user=user, status_code__isnull=False).count()
+                if user else None
+            )
+            recorded = StockMovement.objects.filter(sweet=sweet).count()
+            unbalanced = StockMovement.objects.filter(sweet=sweet, balance__isnull=True).count()
+        finally:
+            StockMovement.objects.filter(sweet=sweet).delete()
+            Sweet.objects.filter(pk=sweet.id).delete()
+            if user:
+                IdempotencyKey.objects.filter(user=user).delete()
+                user.delete()
+
+        oversold = sold - stock
+        window = f" window={options['window_ms']:g}ms" if options['mode'] == 'group' else ''
+        keyed = ' keyed' if user else ''
+        self.stdout.write(
+            f"mode={options['mode']} processes={options['processes']} threads={options['threads']} "
+            f"stock={stock} shards={shards} hold={options['hold_ms']:g}ms{window}{keyed}\n"
+            f'sold={sold} remaining={remaining} oversold={oversold}\n'
+            f'elapsed={elapsed:.2f}s throughput={sold / elapsed:,.0f} purchases/sec'
+        )
+
+        if oversold or remaining:
+            raise CommandError(f'Stock mismatch: {oversold} oversold, {remaining} left')
+        if options['mode'] != 'legacy' and recorded != sold:
+            raise CommandError(f'Ledger mismatch: {recorded} movements for {sold} sales')
+        if unbalanced:
+            raise CommandError(f'Ledger mismatch: {unbalanced} movements without a balance')
+        if user and answered < sold:
+            raise CommandError(f'Key mismatch: {answered} responses stored for {sold} sales')
+        self.stdout.write(self.style.SUCCESS('Zero oversells'))
@@ -0,0 +1,32 @@
+"""
+Release the units held by expired reservations (see
+apps/inventory/reservations.py). Run every minute, e.g. from cron; several
+copies can run at once, each reaping different reservations.
+
+Usage:
+    python manage.py expire_reservations [--batch-size 500]
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Reap expired stock reservations in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Reservations reaped per transaction'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        while True:
+            reaped = release_expired(batch_size)
+            total += reaped
+            if reaped < batch_size:
+                break
+        self.stdout.write(f'Released {total} expired reservations')
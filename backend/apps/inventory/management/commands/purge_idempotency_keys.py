@@ -0,0 +1,22 @@
+"""
+Purge idempotency keys older than IDEMPOTENCY_KEY_TTL_HOURS
+
+Retries after that run as new requests anyway, so the keys and their
+stored responses are no longer needed. Run hourly, e.g. from cron.
+
+Usage:
+    python manage.py purge_idempotency_keys
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.idempotency import expiry_horizon
+from apps.inventory.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys past their TTL'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=expiry_horizon()).delete()
+        self.stdout.write(f'Purged {deleted} idempotency keys')
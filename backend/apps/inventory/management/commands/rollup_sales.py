@@ -0,0 +1,20 @@
+"""
+Add the purchases recorded since the previous run to the hourly and daily
+sales rollups the sales report endpoints read (see
+apps/inventory/sales.py). Run every few minutes, e.g. from cron.
+
+Usage:
+    python manage.py rollup_sales
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.sales import roll_up
+
+
+class Command(BaseCommand):
+    help = 'Roll up recent purchases into the sales report tables'
+
+    def handle(self, *args, **options):
+        added = roll_up()
+        self.stdout.write(f'Rolled up {added} purchases')
@@ -0,0 +1,20 @@
+"""
+Snapshot the running sales and restock totals of every sweet that moved
+since the previous run, so ledger queries read at most one interval of
+movements (see apps/inventory/ledger.py). Run hourly, e.g. from cron.
+
+Usage:
+    python manage.py snapshot_stock
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot per-sweet stock movement totals'
+
+    def handle(self, *args, **options):
+        written = take_snapshots()
+        self.stdout.write(f'Snapshotted {written} sweets')
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.9 on 2026-10-18 05:54
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('sweets', '0006_sweet_tombstone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Purchase'), (2, 'Restock')])),
+                ('quantity', models.IntegerField(help_text='Change in stock')),
+                ('balance', models.IntegerField(help_text='Stock right after this movement')),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('sweet', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='sweets.sweet')),
+                ('user', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'stock_movements',
+                'indexes': [django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='stock_movements_created_brin'), models.Index(fields=['sweet', 'created_at'], name='stock_movements_sweet_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('units_sold', models.BigIntegerField()),
+                ('units_restocked', models.BigIntegerField()),
+                ('sweet', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='sweets.sweet')),
+            ],
+            options={
+                'db_table': 'stock_snapshots',
+                'indexes': [models.Index(fields=['taken_at'], name='stock_snapshots_taken_at_idx')],
+                'constraints': [models.UniqueConstraint(fields=('sweet', 'taken_at'), name='stock_snapshots_sweet_taken_at')],
+            },
+        ),
+    ]
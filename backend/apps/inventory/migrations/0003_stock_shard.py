@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_idempotency_key'),
+        ('sweets', '0007_stock_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('quantity', models.IntegerField()),
+                ('sweet', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sweets.sweet')),
+            ],
+            options={
+                'db_table': 'stock_shards',
+                'constraints': [models.UniqueConstraint(fields=('sweet', 'shard'), name='stock_shards_sweet_shard'), models.CheckConstraint(condition=models.Q(('quantity__gte', 0)), name='stock_shards_quantity_non_negative')],
+            },
+        ),
+    ]
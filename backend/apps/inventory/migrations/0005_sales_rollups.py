@@ -0,0 +1,62 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_reservation'),
+        ('sweets', '0008_sweet_reserved'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollupRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rolled_up_to', models.DateTimeField(unique=True)),
+                ('purchases', models.BigIntegerField(help_text='Purchase movements added by this run')),
+                ('ran_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'sales_rollup_runs',
+            },
+        ),
+        migrations.CreateModel(
+            name='CategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.PositiveSmallIntegerField(choices=[(1, 'Hour'), (2, 'Day')])),
+                ('bucket', models.DateTimeField()),
+                ('category', models.CharField(max_length=50)),
+                ('units', models.BigIntegerField()),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('purchases', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'sales_by_category',
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket', 'category'), name='sales_by_category_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SweetSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.PositiveSmallIntegerField(choices=[(1, 'Hour'), (2, 'Day')])),
+                ('bucket', models.DateTimeField()),
+                ('units', models.BigIntegerField()),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('purchases', models.BigIntegerField()),
+                ('units_to_date', models.BigIntegerField(null=True)),
+                ('revenue_to_date', models.DecimalField(decimal_places=2, max_digits=16, null=True)),
+                ('purchases_to_date', models.BigIntegerField(null=True)),
+                ('sweet', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='sweets.sweet')),
+            ],
+            options={
+                'db_table': 'sales_by_sweet',
+                'constraints': [models.UniqueConstraint(fields=('sweet', 'period', 'bucket'), name='sales_by_sweet_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:56
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Build the index without blocking purchases
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0005_sales_rollups'),
+        ('sweets', '0008_sweet_reserved'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('kind', 1)), fields=['user', '-created_at', 'id'], include=('sweet', 'quantity', 'unit_price'), name='stock_movements_orders_idx'),
+        ),
+    ]
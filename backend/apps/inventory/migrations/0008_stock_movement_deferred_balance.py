@@ -0,0 +1,25 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_movement_user_no_constraint'),
+        ('sweets', '0009_stream_ticket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='balance',
+            field=models.IntegerField(help_text='Stock right after this movement', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('balance__isnull', True)), fields=['sweet', 'created_at'], name='stock_movements_unbalanced_idx'),
+        ),
+    ]
@@ -1,3 +1,329 @@
+"""
+Inventory Ledger Models
+Append-only history of stock changes, see apps/inventory/ledger.py
+"""
+
+from django.conf import settings
+from django.contrib.postgres.indexes import BrinIndex
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
-# Create your models here.
+from apps.sweets.models import Sweet
+
+
+class StockMovement(models.Model):
+    """
+    One purchase or restock of one sweet, written in the same statement as
+    the stock change itself and never updated afterwards, but for the
+    balance of a sharded sweet's movement, which its fold fills in
+
+    Rows are kept narrow (about 60 bytes of data): ids, small integers, the
+    unit price at the time and a timestamp. Neither the sweet nor the user
+    reference has a foreign key constraint, so history outlives deleted
+    sweets and users, and appending a movement never checks or locks either.
+    """
+
+    PURCHASE = 1
+    RESTOCK = 2
+
+    KIND_CHOICES = [
+        (PURCHASE, 'Purchase'),
+        (RESTOCK, 'Restock'),
+    ]
+
+    sweet = models.ForeignKey(
+        Sweet,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    # Signed: negative for purchases
+    quantity = models.IntegerField(help_text="Change in stock")
+    # Null until the fold records it for a sharded sweet, see sharding.py
+    balance = models.IntegerField(null=True, help_text="Stock right after this movement")
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    # Stamped by the database once the sweet's row is locked, so per sweet
+    # the order of created_at is the order the stock changed in
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'stock_movements'
+        indexes = [
+            # Time windows: rows arrive in time order, so a few block ranges
+            # cover any window at a fraction of a B-tree's size
+            BrinIndex(fields=['created_at'], name='stock_movements_created_brin'),
+            # One sweet's history up to a moment
+            models.Index(fields=['sweet', 'created_at'], name='stock_movements_sweet_idx'),
+            # A user's orders (purchases), newest first: a page is one
+            # index-only range scan from the cursor, however many they have
+            models.Index(
+                fields=['user', '-created_at', 'id'],
+                include=['sweet', 'quantity', 'unit_price'],
+                condition=models.Q(kind=1),
+                name='stock_movements_orders_idx',
+            ),
+            # Sharded movements the fold has yet to record a balance for
+            models.Index(
+                fields=['sweet', 'created_at'],
+                condition=models.Q(balance__isnull=True),
+                name='stock_movements_unbalanced_idx',
+            ),
+        ]
+
+    def __str__(self):
+        """String representation"""
+        return f'{self.get_kind_display()} {self.quantity:+d} of sweet {self.sweet_id}'
+
+
+class StockSnapshot(models.Model):
+    """
+    Running totals of one sweet's movements up to `taken_at`
+
+    Written periodically by the snapshot_stock command for every sweet that
+    moved since the previous run, so totals at any moment are the latest
+    snapshot before it plus at most one interval of movements.
+    """
+
+    sweet = models.ForeignKey(
+        Sweet,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    taken_at = models.DateTimeField()
+    units_sold = models.BigIntegerField()
+    units_restocked = models.BigIntegerField()
+
+    class Meta:
+        db_table = 'stock_snapshots'
+        constraints = [
+            models.UniqueConstraint(fields=['sweet', 'taken_at'], name='stock_snapshots_sweet_taken_at'),
+        ]
+        indexes = [
+            # Where the previous run stopped
+            models.Index(fields=['taken_at'], name='stock_snapshots_taken_at_idx'),
+        ]
+
+    def __str__(self):
+        """String representation"""
+        return f'Sweet {self.sweet_id} at {self.taken_at}'
+
+
+class IdempotencyKey(models.Model):
+    """
+    An Idempotency-Key a user sent with a stock change, and the response
+    it got, so a retry gets the same response instead of a second change
+
+    Written in the transaction of the stock change itself, so a key exists
+    exactly when its change committed. Purged after IDEMPOTENCY_KEY_TTL_HOURS
+    by the purge_idempotency_keys command.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='+',
+    )
+    key = models.CharField(max_length=255)
+    # SHA-256 of the request, to refuse a key reused for a different one
+    request_hash = models.BinaryField(max_length=32)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_keys_user_key'),
+        ]
+        indexes = [
+            # The purge deletes the oldest rows, which sit in the first blocks
+            BrinIndex(fields=['created_at'], name='idempotency_keys_created_brin'),
+        ]
+
+    def __str__(self):
+        """String representation"""
+        return f'{self.key} for user {self.user_id}'
+
+
+class StockShard(models.Model):
+    """
+    One of the counter rows a sharded sweet's stock is split over
+
+    Sweet.stock_shards says how many there are; Sweet.quantity is their sum,
+    see apps/inventory/sharding.py.
+    """
+
+    sweet = models.ForeignKey(
+        Sweet,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        db_table = 'stock_shards'
+        constraints = [
+            models.UniqueConstraint(fields=['sweet', 'shard'], name='stock_shards_sweet_shard'),
+            models.CheckConstraint(
+                condition=models.Q(quantity__gte=0),
+                name='stock_shards_quantity_non_negative',
+            ),
+        ]
+
+    def __str__(self):
+        """String representation"""
+        return f'Shard {self.shard} of sweet {self.sweet_id}: {self.quantity}'
+
+
+class Reservation(models.Model):
+    """
+    Units of a sweet held for a user until they confirm the purchase, cancel
+    or let it expire
+
+    Sweet.reserved is the total held by a sweet's reservations, kept in step
+    by the statements in apps/inventory/reservations.py. Reservations are
+    deleted when they end. Neither reference has a constraint: a reservation
+    whose user is deleted still holds its units until it expires.
+    """
+
+    sweet = models.ForeignKey(
+        Sweet,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'stock_reservations'
+        indexes = [
+            # The sweeper takes the longest expired first
+            models.Index(fields=['expires_at'], name='stock_reservations_expires_idx'),
+        ]
+
+    def __str__(self):
+        """String representation"""
+        return f'{self.quantity} of sweet {self.sweet_id} for user {self.user_id}'
+
+
+class SweetSales(models.Model):
+    """
+    Purchases of one sweet in one hour or one day
+
+    Maintained by the rollup_sales command from the movements recorded
+    since its previous run, see apps/inventory/sales.py. The sales report
+    endpoints read only these rows and CategorySales.
+
+    Daily rows also carry the sweet's running totals up to the end of their
+    day, so its sales in any range of days are the difference of two rows.
+    """
+
+    HOUR = 1
+    DAY = 2
+
+    PERIOD_CHOICES = [
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+
+    period = models.PositiveSmallIntegerField(choices=PERIOD_CHOICES)
+    # Start of the hour or day, in UTC
+    bucket = models.DateTimeField()
+    sweet = models.ForeignKey(
+        Sweet,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    units = models.BigIntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    purchases = models.BigIntegerField()
+    # Daily rows only
+    units_to_date = models.BigIntegerField(null=True)
+    revenue_to_date = models.DecimalField(max_digits=16, decimal_places=2, null=True)
+    purchases_to_date = models.BigIntegerField(null=True)
+
+    class Meta:
+        db_table = 'sales_by_sweet'
+        constraints = [
+            # One sweet's sales over time, its latest running totals, and
+            # the rollup's upsert
+            models.UniqueConstraint(fields=['sweet', 'period', 'bucket'], name='sales_by_sweet_bucket'),
+        ]
+
+    def __str__(self):
+        """String representation"""
+        return f'{self.units} of sweet {self.sweet_id} in the {self.get_period_display().lower()} from {self.bucket}'
+
+
+class CategorySales(models.Model):
+    """
+    Purchases of one category's sweets in one hour or one day
+
+    A sale counts towards the category its sweet had when it was rolled up.
+    """
+
+    period = models.PositiveSmallIntegerField(choices=SweetSales.PERIOD_CHOICES)
+    # Start of the hour or day, in UTC
+    bucket = models.DateTimeField()
+    category = models.CharField(max_length=50)
+    units = models.BigIntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    purchases = models.BigIntegerField()
+
+    class Meta:
+        db_table = 'sales_by_category'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'bucket', 'category'], name='sales_by_category_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        """String representation"""
+        return f'{self.units} of {self.category} in the {self.get_period_display().lower()} from {self.bucket}'
+
+
+class SalesRollupRun(models.Model):
+    """
+    One run of the sales rollup: the movements before `rolled_up_to` are in
+    the rollups, so the next run starts from the latest of these
+    """
+
+    rolled_up_to = models.DateTimeField(unique=True)
+    purchases = models.BigIntegerField(help_text="Purchase movements added by this run")
+    ran_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'sales_rollup_runs'
+
+    def __str__(self):
+        """String representation"""
+        return f'Sales rolled up to {self.rolled_up_to}'
@@ -0,0 +1,50 @@
+"""
+Order History
+A user's purchases, newest first, read from the stock movement ledger
+
+Every purchase, checkout line and confirmed reservation already appends a
+StockMovement with the buyer, the sweet, the units and the unit price (see
+ledger.py), so orders need no table of their own. stock_movements_orders_idx
+holds exactly those columns, per user in page order, and pages are located
+by keyset instead of OFFSET: each page is one index-only range scan from
+the cursor, so a user with 100k orders pages as fast as one with 10.
+"""
+
+from apps.sweets.models import Sweet
+from apps.sweets.pagination import SweetCursorPagination
+
+from .models import StockMovement
+
+
+class OrderCursorPagination(SweetCursorPagination):
+    """
+    Keyset pagination over (created_at DESC, id), the order of
+    stock_movements_orders_idx
+    """
+
+    ordering = ('-created_at', 'id')
+
+
+def orders_of(user_id):
+    """A user's orders as dicts, for OrderCursorPagination to order and page"""
+    return StockMovement.objects.filter(
+        user_id=user_id, kind=StockMovement.PURCHASE
+    ).values('id', 'created_at', 'sweet_id', 'quantity', 'unit_price')
+
+
+def add_details(orders):
+    """
+    Turn a page of orders_of() into orders: units bought (the movements
+    record them as negative), total cost and sweet name, one query per page
+
+    The name is None for sweets deleted since.
+    """
+    names = dict(
+        Sweet.objects.filter(pk__in={order['sweet_id'] for order in orders})
+        .values_list('pk', 'name')
+    )
+    for order in orders:
+        order['quantity'] = -order['quantity']
+        order['total_cost'] = order['quantity'] * order['unit_price']
+        order['sweet_name'] = names.get(order['sweet_id'])
+    return orders
@@ -0,0 +1,236 @@
+"""
+Stock Reservations
+Holds units of a sweet for a user between "add to basket" and "pay"
+
+A reservation adds its units to Sweet.reserved in the statement that
+creates it, and every way it ends takes them off in the statement that
+deletes it. So the units for sale, quantity - reserved, are always on the
+sweet's row instead of being summed over reservations per request, and
+purchases and checkouts only sell those (see services.py). The database
+refuses more reserved units than the stock.
+
+- confirm() turns a reservation into a purchase: stock and reserved units
+  go down together and the ledger records the sale
+- cancel() releases the units
+- release_expired() reaps reservations past their expiry in batches,
+  skipping rows another worker is reaping (SKIP LOCKED), so several
+  expire_reservations commands can run at once
+
+An expired reservation holds its units until it is reaped, but can no
+longer be confirmed. Sweets with sharded stock cannot be reserved.
+
+Every change of reserved units changes whether a sweet is in stock, so
+like purchases it stamps updated_at and is announced on the stock stream.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.sweets.models import Sweet
+from apps.sweets.realtime import publish_stock
+
+from .models import Reservation, StockMovement
+from .services import RECORD_MOVEMENTS_SQL, InsufficientStock, SweetNotFound
+
+
+class ReservationNotFound(Exception):
+    """The reservation does not exist or belongs to someone else"""
+
+
+class ReservationExpired(Exception):
+    """The reservation expired before it was confirmed; its units are released"""
+
+
+class ShardedStock(Exception):
+    """Sweets with sharded stock sell directly and cannot be reserved"""
+
+
+# Like purchases (see services.py), the sweet is locked before the
+# statement reads clock_timestamp() for updated_at
+RESERVE_SQL = """
+    WITH locked AS (
+        SELECT id FROM sweets WHERE id = %(sweet_id)s FOR UPDATE
+    ), held AS (
+        UPDATE sweets
+           SET reserved = sweets.reserved + %(quantity)s, updated_at = clock_timestamp()
+          FROM locked
+         WHERE sweets.id = locked.id
+           AND sweets.quantity - sweets.reserved >= %(quantity)s
+           AND sweets.stock_shards = 0
+        RETURNING sweets.*
+    ), reservation AS (
+        INSERT INTO stock_reservations (sweet_id, user_id, quantity, created_at, expires_at)
+        SELECT id, %(user_id)s, %(quantity)s, %(now)s, %(expires_at)s
+          FROM held
+        RETURNING id
+    )
+    SELECT held.*, reservation.id AS reservation_id
+      FROM held, reservation
+"""
+
+CONFIRM_SQL = f"""
+    WITH reservation AS (
+        DELETE FROM stock_reservations
+         WHERE id = %s AND user_id = %s AND expires_at > %s
+        RETURNING sweet_id, quantity
+    ), locked AS (
+        SELECT sweets.id, reservation.quantity
+          FROM sweets
+          JOIN reservation ON reservation.sweet_id = sweets.id
+           FOR UPDATE OF sweets
+    ), updated AS (
+        UPDATE sweets
+           SET quantity = sweets.quantity - reservation.quantity,
+               reserved = sweets.reserved - reservation.quantity,
+               updated_at = clock_timestamp()
+          FROM locked AS reservation
+         WHERE sweets.id = reservation.id
+        RETURNING sweets.*, reservation.quantity AS purchased
+    ), movements AS ({RECORD_MOVEMENTS_SQL.format(change='0 - purchased')})
+    SELECT * FROM updated
+"""
+
+CANCEL_SQL = """
+    WITH reservation AS (
+        DELETE FROM stock_reservations
+         WHERE id = %(id)s AND user_id = %(user_id)s
+        RETURNING sweet_id, quantity
+    ), locked AS (
+        SELECT sweets.id, reservation.quantity
+          FROM sweets
+          JOIN reservation ON reservation.sweet_id = sweets.id
+           FOR UPDATE OF sweets
+    )
+    UPDATE sweets
+       SET reserved = sweets.reserved - reservation.quantity, updated_at = clock_timestamp()
+      FROM locked AS reservation
+     WHERE sweets.id = reservation.id
+    RETURNING sweets.*
+"""
+
+# A batch of the longest expired reservations no other sweeper holds
+EXPIRE_SQL = """
+    DELETE FROM stock_reservations
+     WHERE id IN (
+           SELECT id
+             FROM stock_reservations
+            WHERE expires_at <= %s
+            ORDER BY expires_at
+            LIMIT %s
+              FOR UPDATE SKIP LOCKED
+     )
+    RETURNING sweet_id, quantity
+"""
+
+# Sweets already locked in id order by the caller
+RELEASE_SQL = """
+    UPDATE sweets
+       SET reserved = sweets.reserved - released.quantity, updated_at = clock_timestamp()
+      FROM (VALUES {placeholders}) AS released (id, quantity)
+     WHERE sweets.id = released.id
+    RETURNING sweets.*
+"""
+
+
+def reserve(sweet_id, quantity, user):
+    """
+    Hold `quantity` units of a sweet for `user` for RESERVATION_TTL_SECONDS
+
+    Returns the Reservation, its `sweet` being the Sweet after the hold.
+    Raises SweetNotFound, InsufficientStock or ShardedStock without holding
+    anything.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.RESERVATION_TTL_SECONDS)
+    held = list(Sweet.objects.raw(RESERVE_SQL, {
+        'sweet_id': sweet_id,
+        'quantity': quantity,
+        'user_id': user.pk,
+        'now': now,
+        'expires_at': expires_at,
+    }))
+    if held:
+        publish_stock(held)
+        sweet = held[0]
+        return Reservation(
+            id=sweet.reservation_id, sweet=sweet, user=user,
+            quantity=quantity, created_at=now, expires_at=expires_at
+        )
+
+    # Only the failure path pays for a second query, to explain why
+    current = (
+        Sweet.objects.filter(pk=sweet_id)
+        .values_list('name', 'quantity', 'reserved', 'stock_shards')
+        .first()
+    )
+    if current is None:
+        raise SweetNotFound(sweet_id)
+    name, on_hand, reserved, shards = current
+    if shards:
+        raise ShardedStock(name)
+    raise InsufficientStock(name, on_hand - reserved)
+
+
+def confirm(reservation_id, user):
+    """
+    Buy the units a reservation holds, in one statement
+
+    Returns (sweet, quantity) with the Sweet after the purchase. Raises
+    ReservationNotFound, or ReservationExpired after releasing the units.
+    """
+    updated = list(Sweet.objects.raw(
+        CONFIRM_SQL,
+        [reservation_id, user.pk, timezone.now(), StockMovement.PURCHASE, user.pk]
+    ))
+    if updated:
+        publish_stock(updated)
+        return updated[0], updated[0].purchased
+
+    # Too late to buy, but the units can go back on sale without waiting
+    # for the sweeper
+    cancel(reservation_id, user)
+    raise ReservationExpired(reservation_id)
+
+
+def cancel(reservation_id, user):
+    """Release the units a reservation holds. Raises ReservationNotFound."""
+    released = list(Sweet.objects.raw(CANCEL_SQL, {'id': reservation_id, 'user_id': user.pk}))
+    if not released:
+        raise ReservationNotFound(reservation_id)
+    publish_stock(released)
+
+
+def release_expired(batch_size=500, now=None):
+    """
+    Reap one batch of expired reservations and release their units
+
+    Returns the number reaped; fewer than `batch_size` means none are left
+    that no other worker is reaping.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(EXPIRE_SQL, [now or timezone.now(), batch_size])
+        reaped = cursor.fetchall()
+        if not reaped:
+            return 0
+        released = {}
+        for sweet_id, quantity in reaped:
+            released[sweet_id] = released.get(sweet_id, 0) + quantity
+
+        # Batches releasing overlapping sweets lock them in the same order
+        locked = list(
+            Sweet.objects.select_for_update()
+            .filter(pk__in=released)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        if locked:
+            placeholders = ', '.join(['(%s, %s)'] * len(locked))
+            updated = list(Sweet.objects.raw(
+                RELEASE_SQL.format(placeholders=placeholders),
+                [value for sweet_id in locked for value in (sweet_id, released[sweet_id])]
+            ))
+            publish_stock(updated)
+    return len(reaped)
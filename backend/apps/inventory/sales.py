@@ -0,0 +1,229 @@
+"""
+Sales Rollups
+Sales reports from pre-aggregated rows instead of the purchase history
+
+Every purchase is already a StockMovement with its units and unit price
+(see ledger.py), but summing those per request would read every sale in
+the range. roll_up() instead adds the purchases recorded since its previous
+run to hourly and daily totals per sweet (SweetSales) and per category
+(CategorySales), upserting only the buckets they fall in. The report
+queries below read only those rows, so their cost does not grow with the
+number of sales:
+- top sellers: two running-total rows per sweet, whatever the range
+- revenue by category: one row per category and day
+- units over time: one row per bucket (per category for the whole shop)
+
+Run the rollup_sales command every few minutes. Like the ledger snapshots,
+movements from the last SALES_ROLLUP_SETTLE_SECONDS are left to the next
+run, since their transactions may not have committed yet; reports trail
+sales by about the run interval plus that.
+"""
+
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import CategorySales, SalesRollupRun, StockMovement, SweetSales
+
+# Adds the rows of `sold` to the existing totals of their buckets
+UPSERT_SQL = """
+        INSERT INTO {table} (period, bucket, {key}, units, revenue, purchases)
+        SELECT %({unit})s, date_trunc('{unit}', hour, 'UTC'), {key},
+               sum(units), sum(revenue), sum(purchases)
+          FROM sold
+         GROUP BY 2, {key}
+        ON CONFLICT ON CONSTRAINT {table}_bucket DO UPDATE
+           SET units = {table}.units + excluded.units,
+               revenue = {table}.revenue + excluded.revenue,
+               purchases = {table}.purchases + excluded.purchases
+"""
+
+# The same for days per sweet, carrying each sweet's running totals forward
+# from its latest day. Runs only ever add to that day or later ones, so it
+# is the only day whose running totals an upsert overwrites.
+SWEET_DAYS_SQL = """
+        INSERT INTO sales_by_sweet (period, bucket, sweet_id, units, revenue, purchases,
+                                    units_to_date, revenue_to_date, purchases_to_date)
+        SELECT %(day)s, day.bucket, day.sweet_id, day.units, day.revenue, day.purchases,
+               coalesce(latest.units_to_date, 0) + sum(day.units) OVER running,
+               coalesce(latest.revenue_to_date, 0) + sum(day.revenue) OVER running,
+               coalesce(latest.purchases_to_date, 0) + sum(day.purchases) OVER running
+          FROM (SELECT date_trunc('day', hour, 'UTC') AS bucket, sweet_id,
+                       sum(units) AS units, sum(revenue) AS revenue, sum(purchases) AS purchases
+                  FROM sold
+                 GROUP BY 1, sweet_id) AS day
+          LEFT JOIN LATERAL (
+              SELECT units_to_date, revenue_to_date, purchases_to_date
+                FROM sales_by_sweet
+               WHERE sweet_id = day.sweet_id AND period = %(day)s
+               ORDER BY bucket DESC
+               LIMIT 1
+          ) latest ON true
+        WINDOW running AS (PARTITION BY day.sweet_id ORDER BY day.bucket)
+        ON CONFLICT ON CONSTRAINT sales_by_sweet_bucket DO UPDATE
+           SET units = sales_by_sweet.units + excluded.units,
+               revenue = sales_by_sweet.revenue + excluded.revenue,
+               purchases = sales_by_sweet.purchases + excluded.purchases,
+               units_to_date = excluded.units_to_date,
+               revenue_to_date = excluded.revenue_to_date,
+               purchases_to_date = excluded.purchases_to_date
+"""
+
+# The purchases since the previous run, per sweet and hour (a BRIN range
+# scan), added to all four rollups in one statement
+ROLLUP_SQL = f"""
+    WITH previous_run AS (
+        SELECT coalesce(max(rolled_up_to), '-infinity') AS rolled_up_to FROM sales_rollup_runs
+    ), sold AS (
+        SELECT stock_movements.sweet_id,
+               coalesce(sweets.category, '') AS category,
+               date_trunc('hour', stock_movements.created_at, 'UTC') AS hour,
+               sum(0 - stock_movements.quantity) AS units,
+               sum((0 - stock_movements.quantity) * stock_movements.unit_price) AS revenue,
+               count(*) AS purchases
+          FROM stock_movements
+          LEFT JOIN sweets ON sweets.id = stock_movements.sweet_id
+         WHERE stock_movements.kind = %(purchase)s
+           AND stock_movements.created_at >= (SELECT rolled_up_to FROM previous_run)
+           AND stock_movements.created_at < %(until)s
+         GROUP BY stock_movements.sweet_id, sweets.category, hour
+    ), sweet_hours AS ({UPSERT_SQL.format(table='sales_by_sweet', key='sweet_id', unit='hour')}
+    ), sweet_days AS ({SWEET_DAYS_SQL}
+    ), category_hours AS ({UPSERT_SQL.format(table='sales_by_category', key='category', unit='hour')}
+    ), category_days AS ({UPSERT_SQL.format(table='sales_by_category', key='category', unit='day')}
+    )
+    INSERT INTO sales_rollup_runs (rolled_up_to, purchases, ran_at)
+    SELECT %(until)s, coalesce(sum(purchases), 0), %(now)s
+      FROM sold
+    HAVING %(until)s > (SELECT rolled_up_to FROM previous_run)
+    RETURNING purchases
+"""
+
+# Each sweet's running totals at the end of the range less those at its
+# start: two index lookups per sweet, however long the range
+TOP_SELLERS_SQL = """
+    SELECT sweets.id AS sweet_id, sweets.name, sweets.category,
+           closing.units_to_date - coalesce(opening.units_to_date, 0) AS units,
+           closing.revenue_to_date - coalesce(opening.revenue_to_date, 0) AS revenue,
+           closing.purchases_to_date - coalesce(opening.purchases_to_date, 0) AS purchases
+      FROM sweets
+     CROSS JOIN LATERAL (
+           SELECT units_to_date, revenue_to_date, purchases_to_date
+             FROM sales_by_sweet
+            WHERE sweet_id = sweets.id AND period = %(day)s AND bucket < %(end)s
+            ORDER BY bucket DESC
+            LIMIT 1
+     ) closing
+      LEFT JOIN LATERAL (
+           SELECT units_to_date, revenue_to_date, purchases_to_date
+             FROM sales_by_sweet
+            WHERE sweet_id = sweets.id AND period = %(day)s AND bucket < %(start)s
+            ORDER BY bucket DESC
+            LIMIT 1
+     ) opening ON true
+     WHERE closing.units_to_date > coalesce(opening.units_to_date, 0)
+     ORDER BY units DESC, sweets.id
+     LIMIT %(limit)s
+"""
+
+PERIODS = {'hour': SweetSales.HOUR, 'day': SweetSales.DAY}
+STEPS = {SweetSales.HOUR: timedelta(hours=1), SweetSales.DAY: timedelta(days=1)}
+
+TOTALS = {'units': Sum('units'), 'revenue': Sum('revenue'), 'purchases': Sum('purchases')}
+
+
+def roll_up(until=None):
+    """
+    Add the purchases since the previous run to the sales rollups
+
+    Covers movements up to `until`, by default SALES_ROLLUP_SETTLE_SECONDS
+    ago. Returns the number of purchase movements added.
+    """
+    now = timezone.now()
+    if until is None:
+        until = now - timedelta(seconds=settings.SALES_ROLLUP_SETTLE_SECONDS)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Two overlapping runs would add the same movements twice
+        cursor.execute('LOCK TABLE sales_rollup_runs IN EXCLUSIVE MODE')
+        cursor.execute(ROLLUP_SQL, {
+            'purchase': StockMovement.PURCHASE,
+            'hour': SweetSales.HOUR,
+            'day': SweetSales.DAY,
+            'until': until,
+            'now': now,
+        })
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def day_bounds(start, end):
+    """The moments from the first day `start` up to the end of the day `end`"""
+    return (
+        datetime.combine(start, time.min, tzinfo=dt_timezone.utc),
+        datetime.combine(end + timedelta(days=1), time.min, tzinfo=dt_timezone.utc),
+    )
+
+
+def rolled_up_to():
+    """The moment the rollups are complete up to, or None before the first run"""
+    return SalesRollupRun.objects.aggregate(moment=Max('rolled_up_to'))['moment']
+
+
+def top_sellers(start, end, limit=10):
+    """
+    The `limit` sweets that sold the most units in the days from `start` up
+    to `end`, with their revenue, as dicts
+
+    Sweets deleted since are left out; their sales still count towards
+    their category.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(TOP_SELLERS_SQL, {
+            'day': SweetSales.DAY, 'start': start, 'end': end, 'limit': limit
+        })
+        columns = [column.name for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def revenue_by_category(start, end):
+    """Units and revenue per category in the days from `start` up to `end`"""
+    return list(
+        CategorySales.objects.filter(period=SweetSales.DAY, bucket__gte=start, bucket__lt=end)
+        .values('category')
+        .annotate(**TOTALS)
+        .order_by('-revenue', 'category')
+    )
+
+
+def units_over_time(period, start, end, sweet_id=None, category=None):
+    """
+    Units and revenue per hour or day from `start` up to `end`, for one
+    sweet, one category or the whole shop
+
+    Every bucket of the range is listed, with zeros where nothing sold.
+    """
+    if sweet_id is not None:
+        rows = SweetSales.objects.filter(sweet_id=sweet_id)
+    elif category is not None:
+        rows = CategorySales.objects.filter(category=category)
+    else:
+        rows = CategorySales.objects.all()
+    sold = {
+        row['bucket']: row
+        for row in rows.filter(period=period, bucket__gte=start, bucket__lt=end)
+        .values('bucket')
+        .annotate(**TOTALS)
+    }
+
+    series, bucket = [], start
+    while bucket < end:
+        series.append(sold.get(bucket) or {
+            'bucket': bucket, 'units': 0, 'revenue': Decimal('0.00'), 'purchases': 0
+        })
+        bucket += STEPS[period]
+    return series
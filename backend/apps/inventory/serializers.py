@@ -2,8 +2,20 @@
 Serializers for Inventory Management
 """
 
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 
+from .models import Reservation
+from .sharding import MAX_STOCK_SHARDS
+
+# Most lines one bulk restock may carry
+RESTOCK_MAX_LINES = 5000
+
+# Most days one sales report may cover, by its buckets
+SALES_MAX_DAYS = {'hour': 31, 'day': 366}
+
 
 class PurchaseSerializer(serializers.Serializer):
     """
@@ -36,4 +48,176 @@ class RestockSerializer(serializers.Serializer):
         """Ensure quantity is positive"""
         if value <= 0:
             raise serializers.ValidationError("Quantity must be greater than 0")
-        return value
\ No newline at end of file
+        return value
+
+
+class RestockListSerializer(serializers.ListSerializer):
+    """
+    A delivery: many restock lines, each sweet at most once
+    """
+
+    def validate(self, attrs):
+        sweet_ids = [line['sweet_id'] for line in attrs]
+        if len(sweet_ids) != len(set(sweet_ids)):
+            raise serializers.ValidationError("Each sweet_id may only appear once")
+        return attrs
+
+
+class RestockLineSerializer(RestockSerializer):
+    """
+    One delivery line: which sweet and how many units arrived
+    Validate a delivery with many=True
+    """
+    sweet_id = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        list_serializer_class = RestockListSerializer
+
+
+class CheckoutItemSerializer(serializers.Serializer):
+    """
+    One basket line: which sweet and how many
+    """
+    sweet_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(
+        default=1,
+        min_value=1,
+        help_text="Quantity to purchase (default: 1)"
+    )
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """
+    Serializer for multi-item checkout requests
+    """
+    items = CheckoutItemSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=100,
+        help_text="Basket lines to purchase together"
+    )
+    
+    def validate_items(self, value):
+        """Each sweet may only appear once per basket"""
+        sweet_ids = [item['sweet_id'] for item in value]
+        if len(sweet_ids) != len(set(sweet_ids)):
+            raise serializers.ValidationError("Each sweet_id may only appear once")
+        return value
+
+
+class ShardStockSerializer(serializers.Serializer):
+    """
+    Serializer for switching a sweet's stock sharding
+    """
+    shards = serializers.IntegerField(
+        min_value=0,
+        max_value=MAX_STOCK_SHARDS,
+        help_text="Counter rows to split the stock over (0 to stop sharding)"
+    )
+
+
+class ReserveSerializer(serializers.Serializer):
+    """
+    Serializer for reservation requests
+    """
+    quantity = serializers.IntegerField(
+        default=1,
+        min_value=1,
+        help_text="Quantity to hold (default: 1)"
+    )
+
+
+class ReservationSerializer(serializers.ModelSerializer):
+    """
+    Serializer for Reservation model
+    """
+    sweet_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Reservation
+        fields = (
+            'id',
+            'sweet_id',
+            'quantity',
+            'created_at',
+            'expires_at',
+        )
+        read_only_fields = fields
+
+
+class SalesRangeSerializer(serializers.Serializer):
+    """
+    Serializer for the days a sales report covers
+    """
+    start = serializers.DateField(
+        required=False,
+        help_text="First day (default: 29 days before end)"
+    )
+    end = serializers.DateField(
+        required=False,
+        help_text="Last day, included (default: today, UTC)"
+    )
+
+    def validate(self, attrs):
+        """Fill in the default range and keep it within SALES_MAX_DAYS"""
+        end = attrs.get('end') or timezone.now().date()
+        start = attrs.get('start') or end - timedelta(days=29)
+        if start > end:
+            raise serializers.ValidationError("start must not be after end")
+        max_days = SALES_MAX_DAYS[attrs.get('interval', 'day')]
+        if (end - start).days >= max_days:
+            raise serializers.ValidationError(f"A report may cover at most {max_days} days")
+        attrs['start'], attrs['end'] = start, end
+        return attrs
+
+
+class TopSellersSerializer(SalesRangeSerializer):
+    """
+    Serializer for top-sellers report requests
+    """
+    limit = serializers.IntegerField(
+        default=10,
+        min_value=1,
+        max_value=100,
+        help_text="Sweets to list (default: 10)"
+    )
+
+
+class SalesOverTimeSerializer(SalesRangeSerializer):
+    """
+    Serializer for units-over-time report requests
+    """
+    interval = serializers.ChoiceField(
+        choices=['hour', 'day'],
+        default='day',
+        help_text="Bucket size (default: day)"
+    )
+    sweet_id = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Only this sweet"
+    )
+    category = serializers.CharField(
+        required=False,
+        max_length=50,
+        help_text="Only this category"
+    )
+
+    def validate(self, attrs):
+        """A series is for one sweet, one category or the whole shop"""
+        if 'sweet_id' in attrs and 'category' in attrs:
+            raise serializers.ValidationError("Give sweet_id or category, not both")
+        return super().validate(attrs)
+
+
+class OrderSerializer(serializers.Serializer):
+    """
+    Serializer for one order in a user's history (see orders.py)
+    """
+    id = serializers.IntegerField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+    sweet_id = serializers.IntegerField(read_only=True)
+    sweet_name = serializers.CharField(read_only=True, allow_null=True)
+    quantity = serializers.IntegerField(read_only=True)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    total_cost = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
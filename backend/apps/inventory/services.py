@@ -0,0 +1,297 @@
+"""
+Stock Operations
+Every stock change is a single conditional UPDATE so concurrent buyers can
+neither lose updates nor oversell, and only quantity/updated_at are written.
+Sweets in sharded stock mode are changed on their shards instead (see
+sharding.py).
+Units held by reservations (Sweet.reserved, see reservations.py) are not
+for sale.
+The same statement appends the change to the stock_movements ledger (see
+ledger.py), so the history can never disagree with the stock.
+Each change is announced to live dashboards when it commits (see
+apps/sweets/realtime.py).
+"""
+
+from django.db import transaction
+
+from apps.sweets.models import Sweet
+from apps.sweets.realtime import publish_stock
+
+from . import sharding
+from .models import StockMovement
+
+
+class SweetNotFound(Exception):
+    """The sweet does not exist"""
+
+
+class InsufficientStock(Exception):
+    """Not enough units left to complete a purchase"""
+
+    def __init__(self, name, available):
+        self.name = name
+        self.available = available
+        super().__init__(f'Insufficient stock for {name}: {available} available')
+
+
+class CheckoutFailed(Exception):
+    """At least one basket line cannot be fulfilled; nothing was bought"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        super().__init__('Checkout failed')
+
+
+class RestockFailed(Exception):
+    """Some delivery lines name sweets that do not exist; nothing was restocked"""
+
+    def __init__(self, sweet_ids):
+        self.sweet_ids = sweet_ids
+        super().__init__(f'Sweets not found: {sweet_ids}')
+
+
+# Appends a movement for each row of `updated`; created_at is read once the
+# row is locked, so it orders the movements of one sweet correctly
+RECORD_MOVEMENTS_SQL = """
+    INSERT INTO stock_movements (sweet_id, kind, quantity, balance, unit_price, user_id, created_at)
+    SELECT id, %s, {change}, quantity, price, %s, clock_timestamp()
+      FROM updated
+"""
+
+# Statements changing one sweet lock it first, so that clock_timestamp()
+# in SET is read after any wait: an UPDATE computes its new row before
+# waiting on a lock, and keeps it if the holder did not change the row
+PURCHASE_SQL = f"""
+    WITH locked AS (
+        SELECT id FROM sweets WHERE id = %s FOR UPDATE
+    ), updated AS (
+        UPDATE sweets
+           SET quantity = sweets.quantity - %s, updated_at = clock_timestamp()
+          FROM locked
+         WHERE sweets.id = locked.id
+           AND sweets.quantity - sweets.reserved >= %s
+           AND sweets.stock_shards = 0
+        RETURNING sweets.*
+    ), movements AS ({RECORD_MOVEMENTS_SQL.format(change='0 - %s')})
+    SELECT * FROM updated
+"""
+
+RESTOCK_SQL = f"""
+    WITH locked AS (
+        SELECT id FROM sweets WHERE id = %s FOR UPDATE
+    ), updated AS (
+        UPDATE sweets
+           SET quantity = sweets.quantity + %s, updated_at = clock_timestamp()
+          FROM locked
+         WHERE sweets.id = locked.id AND sweets.stock_shards = 0
+        RETURNING sweets.*
+    ), movements AS ({RECORD_MOVEMENTS_SQL.format(change='%s')})
+    SELECT * FROM updated
+"""
+
+# Rows are locked in id order before any is changed, so overlapping
+# deliveries queue behind each other instead of deadlocking
+BULK_RESTOCK_SQL = f"""
+    WITH delivery (id, quantity) AS (
+        VALUES {{placeholders}}
+    ), locked AS (
+        SELECT sweets.id, delivery.quantity
+          FROM sweets
+          JOIN delivery ON delivery.id = sweets.id
+         WHERE sweets.stock_shards = 0
+         ORDER BY sweets.id
+           FOR UPDATE OF sweets
+    ), updated AS (
+        UPDATE sweets
+           SET quantity = sweets.quantity + locked.quantity, updated_at = clock_timestamp()
+          FROM locked
+         WHERE sweets.id = locked.id
+        RETURNING sweets.*, locked.quantity AS added
+    ), movements AS ({RECORD_MOVEMENTS_SQL.format(change='added')})
+    SELECT * FROM updated
+"""
+
+CHECKOUT_SQL = f"""
+    WITH updated AS (
+        UPDATE sweets
+           SET quantity = sweets.quantity - basket.quantity,
+               updated_at = clock_timestamp()
+          FROM (VALUES {{placeholders}}) AS basket (id, quantity)
+         WHERE sweets.id = basket.id AND sweets.stock_shards = 0
+        RETURNING sweets.*, basket.quantity AS purchased
+    ), movements AS ({RECORD_MOVEMENTS_SQL.format(change='0 - purchased')})
+    SELECT * FROM updated
+"""
+
+
+def purchase(sweet_id, quantity, user=None):
+    """
+    Take `quantity` units of a sweet in one statement
+
+    `user` is the buyer, recorded in the ledger. Returns the updated Sweet.
+    Raises SweetNotFound or InsufficientStock without changing anything
+    when the purchase cannot be made.
+    """
+    updated = list(Sweet.objects.raw(
+        PURCHASE_SQL,
+        [sweet_id, quantity, quantity,
+         StockMovement.PURCHASE, quantity, _user_id(user)]
+    ))
+    if updated:
+        publish_stock(updated)
+        return updated[0]
+
+    # Only the failure path, and sharded sweets, pay for a second query
+    current = (
+        Sweet.objects.filter(pk=sweet_id)
+        .values_list('name', 'quantity', 'reserved', 'stock_shards')
+        .first()
+    )
+    if current is None:
+        raise SweetNotFound(sweet_id)
+    name, on_hand, reserved, shards = current
+    available = on_hand - reserved
+    if shards:
+        sweet, available = sharding.take(sweet_id, quantity, shards, _user_id(user))
+        if sweet is not None:
+            return sweet
+    raise InsufficientStock(name, available)
+
+
+def restock(sweet_id, quantity, user=None):
+    """
+    Add `quantity` units to a sweet in one statement
+
+    `user` is the admin restocking, recorded in the ledger. Returns (sweet, previous_quantity). Raises SweetNotFound.
+    """
+    updated = list(Sweet.objects.raw(
+        RESTOCK_SQL,
+        [sweet_id, quantity,
+         StockMovement.RESTOCK, quantity, _user_id(user)]
+    ))
+    if updated:
+        publish_stock(updated)
+        sweet = updated[0]
+    else:
+        shards = Sweet.objects.filter(pk=sweet_id).values_list('stock_shards', flat=True).first()
+        if not shards:
+            raise SweetNotFound(sweet_id)
+        sweet = sharding.add(sweet_id, quantity, shards, _user_id(user))
+    return sweet, sweet.quantity - quantity
+
+
+def bulk_restock(lines, user=None):
+    """
+    Add units to many sweets with one statement
+
+    `lines` is a list of (sweet_id, quantity) pairs with unique ids; sharded
+    sweets are restocked on their shards afterwards. Returns a list of
+    (sweet, added) in request order. Raises RestockFailed, restocking
+    nothing, if any sweet does not exist.
+    """
+    with transaction.atomic():
+        placeholders = ', '.join(['(%s::bigint, %s::integer)'] * len(lines))
+        updated = {
+            sweet.id: sweet
+            for sweet in Sweet.objects.raw(
+                BULK_RESTOCK_SQL.format(placeholders=placeholders),
+                [*[value for pair in lines for value in pair],
+                 StockMovement.RESTOCK, _user_id(user)]
+            )
+        }
+        if updated:
+            publish_stock(updated.values())
+
+        # Only sharded and unknown sweets pay for another query
+        missing = [(sweet_id, quantity) for sweet_id, quantity in lines if sweet_id not in updated]
+        if missing:
+            shards = dict(
+                Sweet.objects.filter(pk__in=[sweet_id for sweet_id, _ in missing])
+                .values_list('id', 'stock_shards')
+            )
+            not_found = [sweet_id for sweet_id, _ in missing if not shards.get(sweet_id)]
+            if not_found:
+                raise RestockFailed(not_found)
+            for sweet_id, quantity in missing:
+                updated[sweet_id] = sharding.add(sweet_id, quantity, shards[sweet_id], _user_id(user))
+
+    return [(updated[sweet_id], quantity) for sweet_id, quantity in lines]
+
+
+def checkout(items, user=None):
+    """
+    Buy several sweets all-or-nothing in one transaction
+
+    `items` is a list of (sweet_id, quantity) pairs with unique ids. Rows are
+    locked in primary-key order, so two overlapping baskets always queue
+    behind each other instead of deadlocking, and then decremented with one
+    batched UPDATE that also records a movement per line for `user`.
+    Sharded sweets are taken from their shards instead.
+
+    Returns a list of (sweet, quantity) in request order. Raises
+    CheckoutFailed with a status for every line if any line cannot be filled.
+    """
+    requested = dict(items)
+
+    with transaction.atomic():
+        locked = {
+            sweet.id: sweet
+            for sweet in Sweet.objects.select_for_update()
+            .filter(pk__in=requested)
+            .order_by('pk')
+            .only('id', 'name', 'quantity', 'reserved', 'stock_shards')
+        }
+        available = {
+            sweet_id: sweet.quantity - sweet.reserved for sweet_id, sweet in locked.items()
+        }
+
+        # Sharded sweets are taken from their shards right away; a failed
+        # checkout rolls those back with everything else
+        updated = {}
+        plain = []
+        for sweet_id, quantity in items:
+            shards = locked[sweet_id].stock_shards if sweet_id in locked else 0
+            if not shards:
+                plain.append((sweet_id, quantity))
+                continue
+            sweet, available[sweet_id] = sharding.take(sweet_id, quantity, shards, _user_id(user))
+            if sweet is not None:
+                updated[sweet_id] = sweet
+                available[sweet_id] = sweet.quantity + quantity
+
+        lines = [
+            _checkout_line(sweet_id, quantity, available.get(sweet_id))
+            for sweet_id, quantity in items
+        ]
+        if any(line['status'] != 'ok' for line in lines):
+            raise CheckoutFailed(lines)
+
+        if plain:
+            placeholders = ', '.join(['(%s, %s)'] * len(plain))
+            params = [value for pair in plain for value in pair]
+            updated.update(
+                (sweet.id, sweet)
+                for sweet in Sweet.objects.raw(
+                    CHECKOUT_SQL.format(placeholders=placeholders),
+                    [*params, StockMovement.PURCHASE, _user_id(user)]
+                )
+            )
+            publish_stock(updated[sweet_id] for sweet_id, _ in plain)
+
+    return [(updated[sweet_id], quantity) for sweet_id, quantity in items]
+
+
+def _checkout_line(sweet_id, quantity, available):
+    line = {'sweet_id': sweet_id, 'requested_quantity': quantity}
+    if available is None:
+        line['status'] = 'not_found'
+    elif available < quantity:
+        line['status'] = 'insufficient_stock'
+        line['available_quantity'] = available
+    else:
+        line['status'] = 'ok'
+    return line
+
+
+def _user_id(user):
+    return user.pk if user is not None and user.is_authenticated else None
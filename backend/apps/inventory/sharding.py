@@ -0,0 +1,338 @@
+"""
+Sharded Stock
+Lets a flash-sale sweet take purchases on several rows at once
+
+Normally every purchase of a sweet updates its one `sweets` row, so
+concurrent buyers queue on that row's lock for the length of a commit. A
+sharded sweet (Sweet.stock_shards > 0) keeps its stock in that many
+StockShard counter rows instead:
+- a purchase takes from one shard, starting at a random one and skipping
+  shards other purchases hold (SKIP LOCKED). If every shard with enough
+  left is busy it waits for one; only if no shard has enough on its own
+  does it lock all of them in order and borrow across them. A sold-out
+  sweet is refused from an unlocked sum, without waiting on any shard
+- a restock spreads the units evenly over the shards
+
+Sweet.quantity stays their sum, so catalog reads and is_in_stock need not
+know about shards. After each change commits, fold() re-sums the shards
+into the sweet, serialized per sweet by an advisory lock. A fold that
+finds another one already ran since its change committed writes nothing,
+so under load one write to `sweets` covers a whole burst of purchases.
+
+Each change is also a StockMovement, appended by the statement that
+changes the shards, but without a balance: changes on different shards
+commit in any order, and nothing per sweet is held until commit to order
+them. The fold fills balances in instead. Under its lock it takes the
+committed movements from the oldest without a balance on, in created_at
+order, and sets each balance to the sum of the shards less the changes
+recorded after it. created_at is stamped once the shards are changed, so a
+change that waited for another's units is always ordered after it.
+Movements still without a balance are left out of stock_at() (see
+ledger.py) until their fold runs, normally right after they commit.
+"""
+
+import random
+from functools import partial
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from apps.sweets.models import Sweet
+from apps.sweets.realtime import publish_stock
+
+from .models import StockMovement, StockShard
+
+
+class StockReserved(Exception):
+    """Shards cannot tell reserved units from units for sale"""
+
+MAX_STOCK_SHARDS = 64
+
+# Shards a purchase queues for before borrowing across all of them
+WAIT_ATTEMPTS = 2
+
+# First key of the per-sweet fold advisory locks
+FOLD_LOCK_NAMESPACE = 21320
+
+# Ends a shard change: appends its movement, balance left to the fold, if
+# any shard was changed, and returns a row only then
+RECORD_SQL = """
+    , movements AS (
+        INSERT INTO stock_movements (sweet_id, kind, quantity, balance, unit_price, user_id, created_at)
+        SELECT id, %(kind)s, %(change)s, NULL, price, %(user_id)s, clock_timestamp()
+          FROM sweets
+         WHERE id = %(sweet_id)s AND EXISTS (SELECT 1 FROM taken)
+    )
+    SELECT 1 FROM taken LIMIT 1
+"""
+
+# The sweet, with its stock after a change as `remaining`
+REMAINING_SQL = """
+    SELECT sweets.*,
+           (SELECT coalesce(sum(quantity), 0)
+              FROM stock_shards
+             WHERE sweet_id = %(sweet_id)s) AS remaining
+      FROM sweets
+     WHERE sweets.id = %(sweet_id)s
+"""
+
+# One shard with enough stock, from a random starting shard
+TAKE_SQL = """
+    WITH taken AS (
+        UPDATE stock_shards
+           SET quantity = quantity - %(quantity)s
+         WHERE id = (
+               SELECT id
+                 FROM stock_shards
+                WHERE sweet_id = %(sweet_id)s AND quantity >= %(quantity)s
+                ORDER BY shard < %(start)s, shard
+                LIMIT 1
+                {lock}
+         )
+           AND quantity >= %(quantity)s
+        RETURNING sweet_id
+    )""" + RECORD_SQL
+
+# A shard no other purchase holds
+TAKE_FREE_SQL = TAKE_SQL.format(lock='FOR UPDATE SKIP LOCKED')
+
+# Waits for the one shard picked. A scan with FOR UPDATE would keep shards
+# it locked but found emptied meanwhile, and two such scans could deadlock.
+TAKE_WAITING_SQL = TAKE_SQL.format(lock='')
+
+# Shards already locked in order by the caller, `plan` saying how many
+# units to take from each
+BORROW_SQL = """
+    WITH taken AS (
+        UPDATE stock_shards
+           SET quantity = stock_shards.quantity - plan.take
+          FROM (VALUES {placeholders}) AS plan (id, take)
+         WHERE stock_shards.id = plan.id
+        RETURNING stock_shards.sweet_id
+    )""" + RECORD_SQL
+
+# Every shard locked in order, then topped up evenly
+ADD_SQL = """
+    WITH locked AS (
+        SELECT id, shard
+          FROM stock_shards
+         WHERE sweet_id = %(sweet_id)s
+         ORDER BY shard
+           FOR UPDATE
+    ), added AS (
+        UPDATE stock_shards
+           SET quantity = stock_shards.quantity + %(quantity)s / %(shards)s
+                          + CASE WHEN locked.shard < %(quantity)s %% %(shards)s THEN 1 ELSE 0 END
+          FROM locked
+         WHERE stock_shards.id = locked.id
+        RETURNING stock_shards.sweet_id
+    )""" + RECORD_SQL.replace('taken', 'added')
+
+# Balances of the committed movements from the oldest without one on, each
+# the sum of the shards less the changes after it. Rows whose balance is
+# already right are left alone.
+BALANCE_SQL = """
+    WITH pending AS (
+        SELECT min(created_at) AS since
+          FROM stock_movements
+         WHERE sweet_id = %(sweet_id)s AND balance IS NULL
+    ), balances AS (
+        SELECT id,
+               (SELECT coalesce(sum(quantity), 0)
+                  FROM stock_shards
+                 WHERE sweet_id = %(sweet_id)s)
+               - coalesce(sum(quantity) OVER (
+                     ORDER BY created_at DESC, id DESC
+                     ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                 ), 0) AS balance
+          FROM stock_movements
+         WHERE sweet_id = %(sweet_id)s
+           AND created_at >= (SELECT since FROM pending)
+    )
+    UPDATE stock_movements
+       SET balance = balances.balance
+      FROM balances
+     WHERE stock_movements.id = balances.id
+       AND stock_movements.balance IS DISTINCT FROM balances.balance
+"""
+
+# Skipped when a fold began after this transaction did: its sum already
+# includes every change committed before this fold was asked for
+FOLD_SQL = """
+    UPDATE sweets
+       SET quantity = shards.total,
+           stock_folded_at = statement_timestamp(),
+           updated_at = clock_timestamp()
+      FROM (
+           SELECT coalesce(sum(quantity), 0) AS total
+             FROM stock_shards
+            WHERE sweet_id = %(sweet_id)s
+      ) AS shards
+     WHERE sweets.id = %(sweet_id)s
+       AND sweets.stock_shards > 0
+       AND sweets.quantity <> shards.total
+       AND (sweets.stock_folded_at IS NULL OR sweets.stock_folded_at < transaction_timestamp())
+    RETURNING sweets.*
+"""
+
+
+def take(sweet_id, quantity, shards, user_id=None):
+    """
+    Take `quantity` units of a sharded sweet
+
+    Returns (sweet, available): the Sweet with `quantity` set to its stock
+    after the purchase, or None and the units available when there are not
+    enough.
+    """
+    params = {
+        'sweet_id': sweet_id,
+        'quantity': quantity,
+        'start': random.randrange(shards),
+        'kind': StockMovement.PURCHASE,
+        'change': -quantity,
+        'user_id': user_id,
+    }
+    sweet = _change(TAKE_FREE_SQL, params)
+    if sweet is not None:
+        return sweet, None
+
+    # Sold out is the common failure in a flash sale: answer it unlocked
+    available = _available(sweet_id)
+    if available < quantity:
+        return None, available
+
+    # The shards with enough left are busy: queue for one. The savepoint
+    # releases a shard that was emptied while we waited, before the next try.
+    for _ in range(WAIT_ATTEMPTS):
+        with transaction.atomic():
+            sweet = _change(TAKE_WAITING_SQL, params)
+            if sweet is None:
+                transaction.set_rollback(True)
+        if sweet is not None:
+            return sweet, None
+    return _borrow(params)
+
+
+def add(sweet_id, quantity, shards, user_id=None):
+    """Spread `quantity` units over a sharded sweet's shards; returns the Sweet"""
+    return _change(ADD_SQL, {
+        'sweet_id': sweet_id,
+        'quantity': quantity,
+        'shards': shards,
+        'kind': StockMovement.RESTOCK,
+        'change': quantity,
+        'user_id': user_id,
+    })
+
+
+def fold(sweet_id):
+    """
+    Record the balances of the sweet's committed movements, and set its
+    quantity to the sum of its shards unless already done
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        _lock_fold(cursor, sweet_id)
+        cursor.execute(BALANCE_SQL, {'sweet_id': sweet_id})
+        updated = list(Sweet.objects.raw(FOLD_SQL, {'sweet_id': sweet_id}))
+        if updated:
+            publish_stock(updated)
+
+
+def reshard(sweet_id, shards):
+    """
+    Split a sweet's stock over `shards` counter rows, or 0 to stop sharding
+
+    Returns the updated Sweet. Raises Sweet.DoesNotExist, or StockReserved
+    while reservations hold some of the stock.
+    """
+    with transaction.atomic():
+        sweet = Sweet.objects.select_for_update().get(pk=sweet_id)
+        if sweet.reserved:
+            raise StockReserved(sweet.name)
+        if sweet.stock_shards:
+            total = sum(
+                StockShard.objects.select_for_update()
+                .filter(sweet_id=sweet_id)
+                .order_by('shard')
+                .values_list('quantity', flat=True)
+            )
+            # Balances are computed from the shards, so record them first
+            with connection.cursor() as cursor:
+                _lock_fold(cursor, sweet_id)
+                cursor.execute(BALANCE_SQL, {'sweet_id': sweet_id})
+            StockShard.objects.filter(sweet_id=sweet_id).delete()
+        else:
+            total = sweet.quantity
+
+        StockShard.objects.bulk_create(
+            StockShard(sweet_id=sweet_id, shard=shard, quantity=share)
+            for shard, share in enumerate(_split(total, shards))
+        )
+        sweet.quantity = total
+        sweet.stock_shards = shards
+        # Folds compare this with database time, so let the next one run
+        sweet.stock_folded_at = None
+        sweet.save(update_fields=['quantity', 'stock_shards', 'stock_folded_at', 'updated_at'])
+    return sweet
+
+
+def _borrow(params):
+    """Take the units from several shards, all locked in shard order"""
+    with transaction.atomic():
+        shards = list(
+            StockShard.objects.select_for_update()
+            .filter(sweet_id=params['sweet_id'])
+            .order_by('shard')
+            .values_list('id', 'quantity')
+        )
+        available = sum(on_hand for _, on_hand in shards)
+        if available < params['quantity']:
+            return None, available
+
+        plan, remaining = [], params['quantity']
+        for shard_id, on_hand in shards:
+            if remaining and on_hand:
+                plan.append((shard_id, min(on_hand, remaining)))
+                remaining -= plan[-1][1]
+
+        placeholders = ', '.join(f'(%(id{n})s, %(take{n})s)' for n in range(len(plan)))
+        for n, (shard_id, units) in enumerate(plan):
+            params[f'id{n}'], params[f'take{n}'] = shard_id, units
+        sweet = _change(BORROW_SQL.format(placeholders=placeholders), params)
+    return sweet, None
+
+
+def _available(sweet_id):
+    return StockShard.objects.filter(sweet_id=sweet_id).aggregate(
+        total=Coalesce(Sum('quantity'), 0)
+    )['total']
+
+
+def _change(sql, params):
+    """
+    Run a shard change and record its movement
+
+    Returns the Sweet with `quantity` set to its stock after the change,
+    and queues a fold for once it commits; None if no shard was changed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        if not cursor.fetchall():
+            return None
+    sweet = list(Sweet.objects.raw(REMAINING_SQL, params))[0]
+    sweet.quantity = sweet.remaining
+    transaction.on_commit(partial(fold, sweet.id))
+    return sweet
+
+
+def _lock_fold(cursor, sweet_id):
+    cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [FOLD_LOCK_NAMESPACE, _lock_key(sweet_id)])
+
+
+def _lock_key(sweet_id):
+    return sweet_id % 2 ** 31
+
+
+def _split(total, shards):
+    return [total // shards + (shard < total % shards) for shard in range(shards)]
@@ -0,0 +1,285 @@
+"""
+Tests for Group Commit of Purchases
+"""
+
+import threading
+
+import pytest
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.inventory import group_commit, reservations, services, sharding
+from apps.inventory.group_commit import PurchaseRequest, commit_purchases
+from apps.inventory.models import IdempotencyKey, StockMovement
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestCommitPurchases:
+    """One batch: each request granted in arrival order from what is for sale"""
+
+    def setup_method(self):
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="user123"
+        )
+        self.sweet = Sweet.objects.create(
+            name="Test Chocolate", category="Chocolate", price=Decimal("2.50"), quantity=5
+        )
+        self.toffee = Sweet.objects.create(name="Toffee", price=Decimal("1.00"), quantity=10)
+
+    def test_each_request_gets_its_own_result(self):
+        batch = [
+            PurchaseRequest(self.sweet.id, 2, self.user),
+            PurchaseRequest(self.toffee.id, 1, None),
+            PurchaseRequest(self.sweet.id, 4, None),
+            PurchaseRequest(self.sweet.id, 3, self.user),
+            PurchaseRequest(99999, 1, None),
+        ]
+
+        results = commit_purchases(batch)
+
+        assert results[0].quantity == 3
+        assert results[1].quantity == 9
+        assert isinstance(results[2], services.InsufficientStock)
+        assert results[2].available == 3
+        assert results[3].quantity == 0
+        assert isinstance(results[4], services.SweetNotFound)
+        self.sweet.refresh_from_db()
+        self.toffee.refresh_from_db()
+        assert (self.sweet.quantity, self.toffee.quantity) == (0, 9)
+
+    def test_one_movement_per_granted_request(self):
+        commit_purchases([
+            PurchaseRequest(self.sweet.id, 2, self.user),
+            PurchaseRequest(self.sweet.id, 1, None),
+            PurchaseRequest(self.sweet.id, 9, None),
+        ])
+
+        movements = StockMovement.objects.order_by('created_at').values_list(
+            'quantity', 'balance', 'unit_price', 'user_id'
+        )
+        assert list(movements) == [
+            (-2, 3, Decimal("2.50"), self.user.id),
+            (-1, 2, Decimal("2.50"), None),
+        ]
+
+    def test_reserved_units_are_not_sold(self):
+        reservations.reserve(self.sweet.id, 4, self.user)
+
+        results = commit_purchases([
+            PurchaseRequest(self.sweet.id, 1, None),
+            PurchaseRequest(self.sweet.id, 1, None),
+        ])
+
+        assert results[0].quantity == 4
+        assert results[1].available == 0
+
+    def test_sharded_sweets_are_bought_alone(self):
+        sharding.reshard(self.sweet.id, 2)
+
+        results = commit_purchases([
+            PurchaseRequest(self.sweet.id, 2, None),
+            PurchaseRequest(self.sweet.id, 4, None),
+        ])
+
+        assert results[0].quantity == 3
+        assert results[1].available == 3
+        assert StockMovement.objects.count() == 1
+
+    def test_disabled_buys_directly(self, settings):
+        settings.PURCHASE_GROUP_COMMIT_MS = 0
+
+        assert group_commit.purchase(self.sweet.id, 2).quantity == 3
+        assert group_commit._batcher is None
+
+
+@pytest.fixture
+def group_commit_on(settings):
+    settings.PURCHASE_GROUP_COMMIT_MS = 50
+    yield
+    group_commit.shutdown()
+
+
+def buy_concurrently(sweet_id, buyers):
+    """Start `buyers` threads together; returns their results or exceptions"""
+    barrier = threading.Barrier(buyers)
+    results = []
+
+    def buy():
+        try:
+            barrier.wait()
+            results.append(group_commit.purchase(sweet_id, 1))
+        except Exception as exc:
+            results.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buy) for _ in range(buyers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_purchases_share_commits(group_commit_on, monkeypatch):
+    """
+    Purchases arriving together are committed in fewer batches than purchases
+    """
+    sweet = Sweet.objects.create(name="Hot Item", price=Decimal("1.00"), quantity=100)
+    batches = []
+
+    def counted(batch):
+        batches.append(len(batch))
+        return commit_purchases(batch)
+
+    monkeypatch.setattr(group_commit, 'commit_purchases', counted)
+
+    results = buy_concurrently(sweet.id, 8)
+
+    assert sorted(result.quantity for result in results) == list(range(92, 100))
+    assert sum(batches) == 8
+    assert len(batches) < 8
+    sweet.refresh_from_db()
+    assert sweet.quantity == 92
+    assert StockMovement.objects.filter(sweet=sweet).count() == 8
+
+
+@pytest.mark.django_db(transaction=True)
+def test_group_commit_never_oversells(group_commit_on):
+    """
+    Every buyer beyond the stock gets InsufficientStock
+    """
+    sweet = Sweet.objects.create(name="Hot Item", price=Decimal("1.00"), quantity=5)
+
+    results = buy_concurrently(sweet.id, 8)
+
+    assert sum(isinstance(result, Sweet) for result in results) == 5
+    assert sum(isinstance(result, services.InsufficientStock) for result in results) == 3
+    sweet.refresh_from_db()
+    assert sweet.quantity == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_purchase_endpoint_with_group_commit(group_commit_on):
+    """
+    The view answers from its own batch result, keyed requests included
+    """
+    user = User.objects.create_user(email="buyer@example.com", username="buyer", password="x")
+    sweet = Sweet.objects.create(name="Fudge", price=Decimal("3.00"), quantity=5)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    url = f'/api/sweets/{sweet.id}/purchase/'
+
+    response = client.post(url, {'quantity': 2}, format='json')
+    keyed = client.post(url, {'quantity': 1}, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+    short = client.post(url, {'quantity': 3}, format='json')
+
+    assert response.status_code == keyed.status_code == status.HTTP_200_OK
+    assert response.data['remaining_quantity'] == 3
+    assert keyed.data['remaining_quantity'] == 2
+    assert short.status_code == status.HTTP_400_BAD_REQUEST
+    assert short.data['available_quantity'] == 2
+    assert StockMovement.objects.filter(sweet=sweet, user=user).count() == 2
+
+
+def test_concurrent_view_leaves_the_shared_thread():
+    """
+    The wrapped sync view runs on a pool thread, not the caller's
+    """
+    seen = []
+
+    def view(request):
+        seen.append(threading.current_thread())
+        return HttpResponse('ok')
+
+    response = async_to_sync(group_commit.concurrent_view(view))(RequestFactory().get('/'))
+
+    assert response.content == b'ok'
+    assert seen[0] is not threading.current_thread()
+
+
+def post_concurrently(user, url, keys):
+    """POST one unit to `url` from a thread per Idempotency-Key, all at once"""
+    barrier = threading.Barrier(len(keys))
+    responses = []
+
+    def post(key):
+        try:
+            client = APIClient()
+            client.force_authenticate(user=user)
+            barrier.wait()
+            responses.append(client.post(url, {'quantity': 1}, format='json', HTTP_IDEMPOTENCY_KEY=key))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=post, args=(key,)) for key in keys]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+@pytest.mark.django_db(transaction=True)
+def test_keyed_purchases_share_commits(group_commit_on, monkeypatch):
+    """
+    Keys are claimed, and their responses stored, in the batch's transaction
+    """
+    user = User.objects.create_user(email="buyer@example.com", username="buyer", password="x")
+    sweet = Sweet.objects.create(name="Hot Item", price=Decimal("1.00"), quantity=100)
+    url = f'/api/sweets/{sweet.id}/purchase/'
+    batches = []
+
+    def counted(batch):
+        batches.append(len(batch))
+        return commit_purchases(batch)
+
+    monkeypatch.setattr(group_commit, 'commit_purchases', counted)
+
+    responses = post_concurrently(user, url, [f'key-{n}' for n in range(8)])
+
+    assert [response.status_code for response in responses] == [status.HTTP_200_OK] * 8
+    assert sum(batches) == 8
+    assert len(batches) < 8
+    stored = IdempotencyKey.objects.filter(user=user).order_by('key')
+    assert [key.status_code for key in stored] == [status.HTTP_200_OK] * 8
+    assert sorted(key.response['remaining_quantity'] for key in stored) == list(range(92, 100))
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    retry = client.post(url, {'quantity': 1}, format='json', HTTP_IDEMPOTENCY_KEY='key-3')
+
+    assert retry['Idempotent-Replayed'] == 'true'
+    assert retry.json() == stored.get(key='key-3').response
+    sweet.refresh_from_db()
+    assert sweet.quantity == 92
+
+
+@pytest.mark.django_db(transaction=True)
+def test_retries_in_one_batch_buy_once(group_commit_on):
+    """
+    The first request with a key buys; the others replay its response
+    """
+    user = User.objects.create_user(email="buyer@example.com", username="buyer", password="x")
+    sweet = Sweet.objects.create(name="Hot Item", price=Decimal("1.00"), quantity=10)
+
+    responses = post_concurrently(user, f'/api/sweets/{sweet.id}/purchase/', ['same-key'] * 6)
+
+    assert [response.status_code for response in responses] == [status.HTTP_200_OK] * 6
+    assert sum('Idempotent-Replayed' in response for response in responses) == 5
+    assert len({response.json()['remaining_quantity'] for response in responses}) == 1
+    sweet.refresh_from_db()
+    assert sweet.quantity == 9
@@ -0,0 +1,185 @@
+"""
+Tests for Idempotency-Key on Stock Changes
+"""
+
+import io
+import threading
+
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.inventory.models import IdempotencyKey, StockMovement
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestIdempotencyKey:
+    """Retries with the same key replay the first response"""
+
+    def setup_method(self):
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="user123"
+        )
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            username="admin",
+            password="admin123",
+            is_admin=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.sweet = Sweet.objects.create(
+            name="Test Chocolate", category="Chocolate", price=Decimal("2.50"), quantity=10
+        )
+        self.url = f'/api/sweets/{self.sweet.id}/purchase/'
+
+    def post(self, url, data, key, client=None):
+        return (client or self.client).post(url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_without_buying_again(self):
+        first = self.post(self.url, {'quantity': 3}, 'key-1')
+        retry = self.post(self.url, {'quantity': 3}, 'key-1')
+
+        assert first.status_code == retry.status_code == status.HTTP_200_OK
+        assert retry.json() == first.json()
+        assert retry['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in first
+        self.sweet.refresh_from_db()
+        assert self.sweet.quantity == 7
+        assert StockMovement.objects.count() == 1
+
+    def test_new_key_buys_again(self):
+        self.post(self.url, {'quantity': 3}, 'key-1')
+        self.post(self.url, {'quantity': 3}, 'key-2')
+
+        self.sweet.refresh_from_db()
+        assert self.sweet.quantity == 4
+
+    def test_without_key_every_request_runs(self):
+        self.client.post(self.url, {'quantity': 1}, format='json')
+        self.client.post(self.url, {'quantity': 1}, format='json')
+
+        self.sweet.refresh_from_db()
+        assert self.sweet.quantity == 8
+        assert not IdempotencyKey.objects.exists()
+
+    def test_failures_are_replayed_too(self):
+        first = self.post(self.url, {'quantity': 50}, 'key-1')
+        Sweet.objects.filter(pk=self.sweet.pk).update(quantity=100)
+
+        retry = self.post(self.url, {'quantity': 50}, 'key-1')
+
+        assert retry.status_code == first.status_code == status.HTTP_400_BAD_REQUEST
+        assert retry.json() == first.json()
+
+    def test_key_reused_for_a_different_request(self):
+        self.post(self.url, {'quantity': 1}, 'key-1')
+
+        response = self.post(self.url, {'quantity': 2}, 'key-1')
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert 'error' in response.json()
+        self.sweet.refresh_from_db()
+        assert self.sweet.quantity == 9
+
+    def test_keys_are_per_user(self):
+        other = User.objects.create_user(email="other@example.com", username="other", password="x")
+        other_client = APIClient()
+        other_client.force_authenticate(user=other)
+
+        self.post(self.url, {'quantity': 1}, 'key-1')
+        self.post(self.url, {'quantity': 1}, 'key-1', client=other_client)
+
+        self.sweet.refresh_from_db()
+        assert self.sweet.quantity == 8
+
+    def test_expired_key_runs_again(self, settings):
+        settings.IDEMPOTENCY_KEY_TTL_HOURS = 1
+        self.post(self.url, {'quantity': 1}, 'key-1')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=2))
+
+        response = self.post(self.url, {'quantity': 1}, 'key-1')
+
+        assert 'Idempotent-Replayed' not in response
+        self.sweet.refresh_from_db()
+        assert self.sweet.quantity == 8
+        assert IdempotencyKey.objects.count() == 1
+
+    def test_restock_and_checkout(self):
+        admin_client = APIClient()
+        admin_client.force_authenticate(user=self.admin)
+        restock_url = f'/api/sweets/{self.sweet.id}/restock/'
+        basket = {'items': [{'sweet_id': self.sweet.id, 'quantity': 2}]}
+
+        for _ in range(2):
+            self.post(restock_url, {'quantity': 5}, 'restock-1', client=admin_client)
+            self.post('/api/sweets/checkout/', basket, 'checkout-1')
+
+        self.sweet.refresh_from_db()
+        assert self.sweet.quantity == 13
+
+    def test_rejected_requests_do_not_use_the_key(self):
+        response = self.post(f'/api/sweets/{self.sweet.id}/restock/', {'quantity': 5}, 'key-1')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not IdempotencyKey.objects.exists()
+
+    def test_key_too_long(self):
+        response = self.post(self.url, {'quantity': 1}, 'k' * 256)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'error' in response.json()
+
+    def test_purge(self, settings):
+        settings.IDEMPOTENCY_KEY_TTL_HOURS = 1
+        self.post(self.url, {'quantity': 1}, 'old')
+        self.post(self.url, {'quantity': 1}, 'new')
+        IdempotencyKey.objects.filter(key='old').update(created_at=timezone.now() - timedelta(hours=2))
+
+        call_command('purge_idempotency_keys', stdout=io.StringIO())
+
+        assert list(IdempotencyKey.objects.values_list('key', flat=True)) == ['new']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_retries_buy_once():
+    """
+    Retries racing the first request wait for it and replay its response
+    """
+    user = User.objects.create_user(email="racer@example.com", username="racer", password="x")
+    sweet = Sweet.objects.create(name="Hot Item", price=Decimal("1.00"), quantity=40)
+    responses = []
+
+    def retry():
+        try:
+            client = APIClient()
+            client.force_authenticate(user=user)
+            responses.append(client.post(
+                f'/api/sweets/{sweet.id}/purchase/', {'quantity': 1},
+                format='json', HTTP_IDEMPOTENCY_KEY='same-key'
+            ))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=retry) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    sweet.refresh_from_db()
+    assert sweet.quantity == 39
+    assert [response.status_code for response in responses] == [status.HTTP_200_OK] * 8
+    assert sum('Idempotent-Replayed' in response for response in responses) == 7
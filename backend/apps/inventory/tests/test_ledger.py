@@ -0,0 +1,168 @@
+"""
+Tests for the Inventory Ledger
+"""
+
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.inventory import ledger, services
+from apps.inventory.models import StockMovement, StockSnapshot
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestMovementsAreRecorded:
+    """Every stock change appends a movement in the same statement"""
+
+    def setup_method(self):
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="user123"
+        )
+        self.sweet = Sweet.objects.create(
+            name="Test Chocolate", category="Chocolate", price=Decimal("2.50"), quantity=5
+        )
+
+    def test_purchase(self):
+        services.purchase(self.sweet.id, 2, user=self.user)
+
+        movement = StockMovement.objects.get()
+        assert movement.sweet_id == self.sweet.id
+        assert movement.kind == StockMovement.PURCHASE
+        assert movement.quantity == -2
+        assert movement.balance == 3
+        assert movement.unit_price == Decimal("2.50")
+        assert movement.user_id == self.user.id
+
+    def test_failed_purchase_records_nothing(self):
+        with pytest.raises(services.InsufficientStock):
+            services.purchase(self.sweet.id, 6)
+
+        assert not StockMovement.objects.exists()
+
+    def test_restock(self):
+        services.restock(self.sweet.id, 10)
+
+        movement = StockMovement.objects.get()
+        assert (movement.kind, movement.quantity, movement.balance) == (StockMovement.RESTOCK, 10, 15)
+        assert movement.user_id is None
+
+    def test_checkout_records_each_line(self):
+        toffee = Sweet.objects.create(name="Toffee", price=Decimal("1.00"), quantity=4)
+
+        services.checkout([(toffee.id, 3), (self.sweet.id, 1)], user=self.user)
+
+        movements = StockMovement.objects.order_by('sweet_id').values_list(
+            'sweet_id', 'kind', 'quantity', 'balance', 'unit_price', 'user_id'
+        )
+        assert list(movements) == [
+            (self.sweet.id, StockMovement.PURCHASE, -1, 4, Decimal("2.50"), self.user.id),
+            (toffee.id, StockMovement.PURCHASE, -3, 1, Decimal("1.00"), self.user.id),
+        ]
+
+    def test_movements_follow_the_order_stock_changed_in(self):
+        services.purchase(self.sweet.id, 1)
+        services.restock(self.sweet.id, 3)
+        services.purchase(self.sweet.id, 2)
+
+        balances = StockMovement.objects.order_by('created_at').values_list('balance', flat=True)
+        assert list(balances) == [4, 7, 5]
+
+    def test_endpoints_record_the_user(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        client.post(f'/api/sweets/{self.sweet.id}/purchase/', {'quantity': 1}, format='json')
+
+        assert StockMovement.objects.get().user_id == self.user.id
+
+    def test_history_outlives_the_user(self):
+        services.purchase(self.sweet.id, 1, user=self.user)
+        user_id = self.user.id
+
+        self.user.delete()
+
+        assert StockMovement.objects.get().user_id == user_id
+
+
+@pytest.mark.django_db
+class TestLedgerQueries:
+    """Stock at a moment and units sold, with and without snapshots"""
+
+    def setup_method(self):
+        self.sweet = Sweet.objects.create(name="Fudge", price=Decimal("3.00"), quantity=0)
+        self.other = Sweet.objects.create(name="Toffee", price=Decimal("1.00"), quantity=0)
+        self.start = timezone.now() - timedelta(days=10)
+        # Day 0: +20, then one sale of 2 a day for days 1..9
+        self.move(self.sweet, 0, StockMovement.RESTOCK, 20, 20)
+        for day in range(1, 10):
+            self.move(self.sweet, day, StockMovement.PURCHASE, -2, 20 - 2 * day)
+        self.move(self.other, 5, StockMovement.RESTOCK, 7, 7)
+
+    def move(self, sweet, day, kind, quantity, balance):
+        StockMovement.objects.create(
+            sweet=sweet, kind=kind, quantity=quantity, balance=balance,
+            unit_price=sweet.price, created_at=self.day(day),
+        )
+
+    def day(self, day, hours=0):
+        return self.start + timedelta(days=day, hours=hours)
+
+    def test_stock_at(self):
+        assert ledger.stock_at(self.sweet.id, self.day(0)) == 0
+        assert ledger.stock_at(self.sweet.id, self.day(0, hours=1)) == 20
+        assert ledger.stock_at(self.sweet.id, self.day(3, hours=1)) == 14
+        assert ledger.stock_at(self.sweet.id, self.day(30)) == 2
+
+    def test_stock_at_without_movements(self):
+        lonely = Sweet.objects.create(name="Lonely", price=Decimal("1.00"), quantity=3)
+
+        assert ledger.stock_at(lonely.id, self.day(5)) is None
+
+    def test_units_sold(self):
+        assert ledger.units_sold(self.sweet.id, self.day(0), self.day(30)) == 18
+        assert ledger.units_sold(self.sweet.id, self.day(2), self.day(5)) == 6
+        assert ledger.units_sold(self.other.id, self.day(0), self.day(30)) == 0
+
+    def test_snapshots_carry_totals_forward(self):
+        assert ledger.take_snapshots(until=self.day(4)) == 1
+        assert ledger.take_snapshots(until=self.day(8, hours=1)) == 2
+        # Nothing moved in this window
+        assert ledger.take_snapshots(until=self.day(8, hours=12)) == 0
+
+        snapshots = StockSnapshot.objects.filter(sweet=self.sweet).order_by('taken_at')
+        assert [(s.units_sold, s.units_restocked) for s in snapshots] == [(6, 20), (16, 20)]
+        other = StockSnapshot.objects.get(sweet=self.other)
+        assert (other.taken_at, other.units_sold, other.units_restocked) == (self.day(8, hours=1), 0, 7)
+
+    def test_queries_agree_with_and_without_snapshots(self):
+        ranges = [(0, 30), (2, 5), (3, 9), (8, 9), (9, 30)]
+        expected = [ledger.units_sold(self.sweet.id, self.day(a), self.day(b)) for a, b in ranges]
+
+        ledger.take_snapshots(until=self.day(4))
+        ledger.take_snapshots(until=self.day(8))
+
+        assert [
+            ledger.units_sold(self.sweet.id, self.day(a), self.day(b)) for a, b in ranges
+        ] == expected
+        assert ledger.totals_before(self.sweet.id, self.day(30)) == {
+            'units_sold': 18, 'units_restocked': 20
+        }
+
+    def test_snapshots_skip_unsettled_movements(self, settings):
+        settings.STOCK_SNAPSHOT_SETTLE_SECONDS = 60
+        services.restock(self.sweet.id, 5)
+
+        ledger.take_snapshots()
+
+        # The restock is too recent to be included
+        snapshot = StockSnapshot.objects.get(sweet=self.sweet)
+        assert snapshot.units_restocked == 20
@@ -0,0 +1,354 @@
+"""
+Tests for Stock Reservations
+"""
+
+import io
+import threading
+
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.inventory import reservations, services, sharding
+from apps.inventory.models import Reservation, StockMovement
+from apps.sweets.facets import facet_counts
+from apps.sweets.fastpath import SweetRowSerializer
+from apps.sweets.models import Sweet
+from apps.sweets.search import search_sweets
+from apps.sweets.serializers import SweetSerializer
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestReservations:
+    """Held units are kept out of sale until confirmed, cancelled or expired"""
+
+    def setup_method(self):
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="user123"
+        )
+        self.sweet = Sweet.objects.create(
+            name="Test Chocolate", category="Chocolate", price=Decimal("2.50"), quantity=10
+        )
+
+    def expire(self, reservation):
+        Reservation.objects.filter(pk=reservation.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_reserve_holds_units(self):
+        reservation = reservations.reserve(self.sweet.id, 4, self.user)
+
+        assert reservation.sweet.reserved == 4
+        self.sweet.refresh_from_db()
+        assert (self.sweet.quantity, self.sweet.reserved) == (10, 4)
+        assert Reservation.objects.get().quantity == 4
+
+    def test_reserve_expiry_follows_the_ttl(self, settings):
+        settings.RESERVATION_TTL_SECONDS = 60
+
+        reservation = reservations.reserve(self.sweet.id, 1, self.user)
+
+        assert reservation.expires_at - reservation.created_at == timedelta(seconds=60)
+
+    def test_reserve_more_than_available(self):
+        reservations.reserve(self.sweet.id, 7, self.user)
+
+        with pytest.raises(services.InsufficientStock) as excinfo:
+            reservations.reserve(self.sweet.id, 4, self.user)
+
+        assert excinfo.value.available == 3
+
+    def test_reserve_nonexistent_sweet(self):
+        with pytest.raises(services.SweetNotFound):
+            reservations.reserve(99999, 1, self.user)
+
+    def test_purchases_only_sell_unreserved_units(self):
+        reservations.reserve(self.sweet.id, 8, self.user)
+
+        with pytest.raises(services.InsufficientStock) as excinfo:
+            services.purchase(self.sweet.id, 3)
+
+        assert excinfo.value.available == 2
+        assert services.purchase(self.sweet.id, 2).quantity == 8
+
+    def test_checkout_only_sells_unreserved_units(self):
+        reservations.reserve(self.sweet.id, 8, self.user)
+
+        with pytest.raises(services.CheckoutFailed) as excinfo:
+            services.checkout([(self.sweet.id, 3)])
+
+        assert excinfo.value.lines[0]['available_quantity'] == 2
+
+    def test_confirm_buys_the_held_units(self):
+        reservation = reservations.reserve(self.sweet.id, 4, self.user)
+
+        sweet, quantity = reservations.confirm(reservation.id, self.user)
+
+        assert (sweet.quantity, sweet.reserved, quantity) == (6, 0, 4)
+        assert not Reservation.objects.exists()
+        movement = StockMovement.objects.get()
+        assert (movement.kind, movement.quantity, movement.balance, movement.user_id) == (
+            StockMovement.PURCHASE, -4, 6, self.user.id
+        )
+
+    def test_confirm_twice(self):
+        reservation = reservations.reserve(self.sweet.id, 4, self.user)
+        reservations.confirm(reservation.id, self.user)
+
+        with pytest.raises(reservations.ReservationNotFound):
+            reservations.confirm(reservation.id, self.user)
+
+    def test_confirm_expired_releases_the_units(self):
+        reservation = reservations.reserve(self.sweet.id, 4, self.user)
+        self.expire(reservation)
+
+        with pytest.raises(reservations.ReservationExpired):
+            reservations.confirm(reservation.id, self.user)
+
+        self.sweet.refresh_from_db()
+        assert (self.sweet.quantity, self.sweet.reserved) == (10, 0)
+        assert not StockMovement.objects.exists()
+
+    def test_cancel_releases_the_units(self):
+        reservation = reservations.reserve(self.sweet.id, 4, self.user)
+
+        reservations.cancel(reservation.id, self.user)
+
+        self.sweet.refresh_from_db()
+        assert self.sweet.reserved == 0
+        assert not Reservation.objects.exists()
+
+    def test_other_users_cannot_touch_a_reservation(self):
+        other = User.objects.create_user(email="other@example.com", username="other", password="x")
+        reservation = reservations.reserve(self.sweet.id, 4, self.user)
+
+        with pytest.raises(reservations.ReservationNotFound):
+            reservations.confirm(reservation.id, other)
+        with pytest.raises(reservations.ReservationNotFound):
+            reservations.cancel(reservation.id, other)
+
+        self.sweet.refresh_from_db()
+        assert self.sweet.reserved == 4
+
+    def test_release_expired_in_batches(self):
+        toffee = Sweet.objects.create(name="Toffee", price=Decimal("1.00"), quantity=5)
+        held = [
+            reservations.reserve(self.sweet.id, 2, self.user),
+            reservations.reserve(self.sweet.id, 1, self.user),
+            reservations.reserve(toffee.id, 3, self.user),
+            reservations.reserve(self.sweet.id, 1, self.user),
+        ]
+        for reservation in held[:3]:
+            self.expire(reservation)
+
+        assert reservations.release_expired(batch_size=2) == 2
+        assert reservations.release_expired(batch_size=2) == 1
+        assert reservations.release_expired(batch_size=2) == 0
+
+        self.sweet.refresh_from_db()
+        toffee.refresh_from_db()
+        assert (self.sweet.reserved, toffee.reserved) == (1, 0)
+        assert list(Reservation.objects.values_list('id', flat=True)) == [held[3].id]
+
+    def test_expire_reservations_command(self):
+        self.expire(reservations.reserve(self.sweet.id, 2, self.user))
+        out = io.StringIO()
+
+        call_command('expire_reservations', '--batch-size', '1', stdout=out)
+
+        assert 'Released 1 expired reservations' in out.getvalue()
+        self.sweet.refresh_from_db()
+        assert self.sweet.reserved == 0
+
+    def test_sharded_sweets_cannot_be_reserved(self):
+        sharding.reshard(self.sweet.id, 2)
+
+        with pytest.raises(reservations.ShardedStock):
+            reservations.reserve(self.sweet.id, 1, self.user)
+
+    def test_reserved_sweets_cannot_be_sharded(self):
+        reservations.reserve(self.sweet.id, 1, self.user)
+
+        with pytest.raises(sharding.StockReserved):
+            sharding.reshard(self.sweet.id, 2)
+
+    def test_fully_reserved_sweets_are_out_of_stock(self):
+        reservations.reserve(self.sweet.id, 10, self.user)
+        self.sweet.refresh_from_db()
+        rows = SweetRowSerializer()
+
+        assert SweetSerializer(self.sweet).data['is_in_stock'] is False
+        assert rows.to_representation(rows.select(Sweet.objects.all()))[0]['is_in_stock'] is False
+        assert facet_counts(Sweet.objects.all())['stock'] == {'in_stock': 0, 'out_of_stock': 1}
+        assert not search_sweets(Sweet.objects.all(), {'in_stock': 'true'})[0].exists()
+
+    def test_reservation_changes_are_stock_changes(
+        self, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        published = []
+        monkeypatch.setattr(
+            reservations, 'publish_stock',
+            lambda sweets: published.extend((sweet.id, sweet.reserved) for sweet in sweets)
+        )
+        seen = [self.sweet.updated_at]
+
+        def changed():
+            self.sweet.refresh_from_db()
+            seen.append(self.sweet.updated_at)
+            return seen[-1] > seen[-2]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            reservation = reservations.reserve(self.sweet.id, 4, self.user)
+        assert changed()
+        with django_capture_on_commit_callbacks(execute=True):
+            reservations.cancel(reservation.id, self.user)
+        assert changed()
+        with django_capture_on_commit_callbacks(execute=True):
+            reservations.confirm(reservations.reserve(self.sweet.id, 2, self.user).id, self.user)
+        assert changed()
+        self.expire(reservations.reserve(self.sweet.id, 3, self.user))
+        with django_capture_on_commit_callbacks(execute=True):
+            reservations.release_expired()
+        assert changed()
+
+        assert [reserved for _, reserved in published] == [4, 0, 2, 0, 3, 0]
+
+    def test_catalog_edits_keep_reserved_units_in_stock(self):
+        reservations.reserve(self.sweet.id, 4, self.user)
+        self.sweet.refresh_from_db()
+
+        assert not SweetSerializer(self.sweet, data={'quantity': 3}, partial=True).is_valid()
+        assert SweetSerializer(self.sweet, data={'quantity': 4}, partial=True).is_valid()
+
+
+@pytest.mark.django_db
+class TestReservationEndpoints:
+    """POST /api/sweets/:id/reserve/ and /api/sweets/reservations/:id/..."""
+
+    def setup_method(self):
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="user123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.sweet = Sweet.objects.create(name="Fudge", price=Decimal("3.00"), quantity=5)
+
+    def reserve(self, quantity):
+        return self.client.post(
+            f'/api/sweets/{self.sweet.id}/reserve/', {'quantity': quantity}, format='json'
+        )
+
+    def test_reserve_and_confirm(self):
+        response = self.reserve(2)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['available_quantity'] == 3
+        reservation = response.data['reservation']
+        assert (reservation['sweet_id'], reservation['quantity']) == (self.sweet.id, 2)
+
+        response = self.client.post(f"/api/sweets/reservations/{reservation['id']}/confirm/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['purchased_quantity'] == 2
+        assert response.data['remaining_quantity'] == 3
+        assert response.data['total_cost'] == 6.0
+
+    def test_reserve_insufficient_stock(self):
+        response = self.reserve(6)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['available_quantity'] == 5
+
+    def test_reserve_nonexistent_sweet(self):
+        response = self.client.post('/api/sweets/99999/reserve/', {'quantity': 1}, format='json')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert 'error' in response.data
+
+    def test_confirm_expired(self):
+        reservation_id = self.reserve(2).data['reservation']['id']
+        Reservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.client.post(f'/api/sweets/reservations/{reservation_id}/confirm/')
+
+        assert response.status_code == status.HTTP_410_GONE
+
+    def test_cancel(self):
+        reservation_id = self.reserve(2).data['reservation']['id']
+
+        response = self.client.post(f'/api/sweets/reservations/{reservation_id}/cancel/')
+        again = self.client.post(f'/api/sweets/reservations/{reservation_id}/cancel/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert again.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_requires_authentication(self):
+        response = APIClient().post(
+            f'/api/sweets/{self.sweet.id}/reserve/', {'quantity': 1}, format='json'
+        )
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_bulk_delete_removes_reservations(self):
+        admin = User.objects.create_user(
+            email="admin@example.com", username="admin", password="x", is_admin=True
+        )
+        self.reserve(2)
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.delete('/api/sweets/bulk/', {'ids': [self.sweet.id]}, format='json')
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert not Reservation.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_sweepers_release_each_reservation_once():
+    """
+    Sweepers running together reap disjoint batches
+    """
+    user = User.objects.create_user(email="racer@example.com", username="racer", password="x")
+    sweets = [
+        Sweet.objects.create(name=f"Sweet {n}", price=Decimal("1.00"), quantity=100)
+        for n in range(4)
+    ]
+    for n in range(200):
+        reservations.reserve(sweets[n % 4].id, 1, user)
+    Reservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+    reaped, errors = [], []
+
+    def sweeper():
+        try:
+            while True:
+                count = reservations.release_expired(batch_size=10)
+                reaped.append(count)
+                if count < 10:
+                    return
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=sweeper) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sum(reaped) == 200
+    assert not Reservation.objects.exists()
+    assert list(Sweet.objects.values_list('reserved', flat=True)) == [0, 0, 0, 0]
@@ -0,0 +1,262 @@
+"""
+Tests for the Sales Rollups and Reports
+"""
+
+import io
+
+import pytest
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.inventory import sales, services
+from apps.inventory.models import CategorySales, StockMovement, SweetSales
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+DAY_ONE = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+
+
+def moment(day, hours=0, minutes=0):
+    return DAY_ONE + timedelta(days=day, hours=hours, minutes=minutes)
+
+
+def sell(sweet, quantity, at, kind=StockMovement.PURCHASE):
+    StockMovement.objects.create(
+        sweet=sweet, kind=kind, quantity=-quantity if kind == StockMovement.PURCHASE else quantity,
+        balance=0, unit_price=sweet.price, created_at=at,
+    )
+
+
+class SalesData:
+    """Fudge and mints selling over the first days of March 2026"""
+
+    def setup_method(self):
+        self.fudge = Sweet.objects.create(
+            name="Fudge", category="Chocolate", price=Decimal("3.00"), quantity=0
+        )
+        self.truffle = Sweet.objects.create(
+            name="Truffle", category="Chocolate", price=Decimal("5.00"), quantity=0
+        )
+        self.mints = Sweet.objects.create(
+            name="Mints", category="Hard Candy", price=Decimal("0.50"), quantity=0
+        )
+        sell(self.fudge, 2, moment(0, 10, 15))
+        sell(self.fudge, 1, moment(0, 10, 45))
+        sell(self.mints, 10, moment(0, 14))
+        sell(self.truffle, 1, moment(1, 9))
+        sell(self.fudge, 1, moment(1, 23, 59))
+        sell(self.fudge, 50, moment(1, 12), kind=StockMovement.RESTOCK)
+
+
+@pytest.mark.django_db
+class TestRollUp(SalesData):
+    """Purchases since the previous run are added to their buckets"""
+
+    def test_hours_and_days_per_sweet(self):
+        assert sales.roll_up(until=moment(3)) == 5
+
+        rows = SweetSales.objects.filter(sweet=self.fudge).order_by('period', 'bucket').values_list(
+            'period', 'bucket', 'units', 'revenue', 'purchases'
+        )
+        assert list(rows) == [
+            (SweetSales.HOUR, moment(0, 10), 3, Decimal("9.00"), 2),
+            (SweetSales.HOUR, moment(1, 23), 1, Decimal("3.00"), 1),
+            (SweetSales.DAY, moment(0), 3, Decimal("9.00"), 2),
+            (SweetSales.DAY, moment(1), 1, Decimal("3.00"), 1),
+        ]
+
+    def test_days_per_category(self):
+        sales.roll_up(until=moment(3))
+
+        rows = CategorySales.objects.filter(period=SweetSales.DAY).order_by('bucket', 'category')
+        assert [(row.bucket, row.category, row.units, row.revenue) for row in rows] == [
+            (moment(0), 'Chocolate', 3, Decimal("9.00")),
+            (moment(0), 'Hard Candy', 10, Decimal("5.00")),
+            (moment(1), 'Chocolate', 2, Decimal("8.00")),
+        ]
+
+    def test_runs_add_to_existing_buckets(self):
+        assert sales.roll_up(until=moment(0, 10, 30)) == 1
+        assert sales.roll_up(until=moment(1)) == 2
+        # Nothing is counted twice
+        assert sales.roll_up(until=moment(1)) == 0
+        assert sales.roll_up(until=moment(0, 12)) == 0
+
+        hour = SweetSales.objects.get(sweet=self.fudge, period=SweetSales.HOUR, bucket=moment(0, 10))
+        assert (hour.units, hour.purchases) == (3, 2)
+        assert SweetSales.objects.filter(period=SweetSales.DAY).count() == 2
+
+    def test_days_carry_running_totals(self):
+        sales.roll_up(until=moment(0, 10, 30))
+        sales.roll_up(until=moment(1, 12))
+        sell(self.fudge, 4, moment(4, 8))
+        sales.roll_up(until=moment(5))
+
+        days = SweetSales.objects.filter(sweet=self.fudge, period=SweetSales.DAY).order_by('bucket')
+        assert list(days.values_list(
+            'units', 'units_to_date', 'revenue_to_date', 'purchases_to_date'
+        )) == [
+            (3, 3, Decimal("9.00"), 2),
+            (1, 4, Decimal("12.00"), 3),
+            (4, 8, Decimal("24.00"), 4),
+        ]
+
+    def test_unsettled_purchases_wait_for_the_next_run(self, settings):
+        settings.SALES_ROLLUP_SETTLE_SECONDS = 60
+        self.fudge.quantity = 5
+        self.fudge.save()
+        services.purchase(self.fudge.id, 2)
+
+        assert sales.roll_up() == 5
+
+        today = timezone.now().date()
+        assert sales.units_over_time(
+            SweetSales.DAY, *sales.day_bounds(today, today), sweet_id=self.fudge.id
+        )[0]['units'] == 0
+
+    def test_rollup_sales_command(self):
+        out = io.StringIO()
+
+        call_command('rollup_sales', stdout=out)
+
+        assert 'Rolled up 5 purchases' in out.getvalue()
+        assert sales.rolled_up_to() is not None
+
+
+@pytest.mark.django_db
+class TestReports(SalesData):
+    """Reports read the rollups only"""
+
+    def setup_method(self):
+        super().setup_method()
+        sales.roll_up(until=moment(3))
+        self.march = sales.day_bounds(date(2026, 3, 1), date(2026, 3, 31))
+
+    def test_top_sellers(self):
+        rows = sales.top_sellers(*self.march, limit=2)
+
+        assert [(row['name'], row['units'], row['revenue']) for row in rows] == [
+            ("Mints", 10, Decimal("5.00")),
+            ("Fudge", 4, Decimal("12.00")),
+        ]
+
+    def test_top_sellers_within_the_range(self):
+        rows = sales.top_sellers(*sales.day_bounds(date(2026, 3, 2), date(2026, 3, 2)))
+        later = sales.top_sellers(*sales.day_bounds(date(2026, 3, 3), date(2026, 3, 31)))
+
+        assert [(row['sweet_id'], row['units'], row['revenue']) for row in rows] == [
+            (self.fudge.id, 1, Decimal("3.00")), (self.truffle.id, 1, Decimal("5.00"))
+        ]
+        assert later == []
+
+    def test_top_sellers_leave_out_deleted_sweets(self):
+        self.mints.delete()
+
+        rows = sales.top_sellers(*self.march)
+
+        assert [row['name'] for row in rows] == ["Fudge", "Truffle"]
+        assert sales.revenue_by_category(*self.march)[1]['units'] == 10
+
+    def test_revenue_by_category(self):
+        rows = sales.revenue_by_category(*self.march)
+
+        assert [(row['category'], row['units'], row['revenue']) for row in rows] == [
+            ('Chocolate', 5, Decimal("17.00")),
+            ('Hard Candy', 10, Decimal("5.00")),
+        ]
+
+    def test_units_over_time_fills_the_gaps(self):
+        series = sales.units_over_time(SweetSales.HOUR, moment(0, 9), moment(0, 15))
+
+        assert [(point['bucket'].hour, point['units']) for point in series] == [
+            (9, 0), (10, 3), (11, 0), (12, 0), (13, 0), (14, 10)
+        ]
+
+    def test_units_over_time_for_a_sweet_or_category(self):
+        days = sales.day_bounds(date(2026, 3, 1), date(2026, 3, 3))
+
+        by_sweet = sales.units_over_time(SweetSales.DAY, *days, sweet_id=self.fudge.id)
+        by_category = sales.units_over_time(SweetSales.DAY, *days, category='Chocolate')
+
+        assert [point['units'] for point in by_sweet] == [3, 1, 0]
+        assert [point['revenue'] for point in by_category] == [
+            Decimal("9.00"), Decimal("8.00"), Decimal("0.00")
+        ]
+
+
+@pytest.mark.django_db
+class TestSalesEndpoints(SalesData):
+    """GET /api/sweets/sales/... (Admin only)"""
+
+    def setup_method(self):
+        super().setup_method()
+        sales.roll_up(until=moment(3))
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            username="admin",
+            password="admin123",
+            is_admin=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_top_sellers(self):
+        response = self.client.get(
+            '/api/sweets/sales/top-sellers/', {'start': '2026-03-01', 'end': '2026-03-31', 'limit': 1}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['rolled_up_to'] == moment(3)
+        assert [(row['name'], row['units']) for row in response.data['results']] == [("Mints", 10)]
+
+    def test_revenue_by_category(self):
+        response = self.client.get(
+            '/api/sweets/sales/by-category/', {'start': '2026-03-02', 'end': '2026-03-02'}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [(row['category'], row['revenue']) for row in response.data['results']] == [
+            ('Chocolate', Decimal("8.00"))
+        ]
+
+    def test_sales_over_time(self):
+        response = self.client.get('/api/sweets/sales/over-time/', {
+            'interval': 'hour', 'start': '2026-03-01', 'end': '2026-03-02', 'sweet_id': self.fudge.id
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 48
+        assert sum(point['units'] for point in response.data['results']) == 4
+
+    def test_default_range_is_the_last_30_days(self):
+        response = self.client.get('/api/sweets/sales/over-time/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 30
+        assert response.data['end'] == timezone.now().date()
+
+    def test_invalid_ranges(self):
+        url = '/api/sweets/sales/over-time/'
+
+        backwards = self.client.get(url, {'start': '2026-03-02', 'end': '2026-03-01'})
+        too_long = self.client.get(url, {'interval': 'hour', 'start': '2026-01-01', 'end': '2026-03-01'})
+        both = self.client.get(url, {'sweet_id': self.fudge.id, 'category': 'Chocolate'})
+
+        assert backwards.status_code == status.HTTP_400_BAD_REQUEST
+        assert too_long.status_code == status.HTTP_400_BAD_REQUEST
+        assert both.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_regular_user_forbidden(self):
+        user = User.objects.create_user(email="user@example.com", username="user", password="x")
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get('/api/sweets/sales/top-sellers/')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
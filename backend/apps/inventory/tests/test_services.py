@@ -0,0 +1,151 @@
+"""
+Tests for Inventory Stock Operations
+"""
+
+import threading
+import time
+
+import psycopg2
+import pytest
+from decimal import Decimal
+from django.db import IntegrityError, connection
+from django.utils import timezone
+from apps.inventory import services
+from apps.sweets.models import Sweet
+
+
+@pytest.mark.django_db
+class TestPurchaseService:
+    """Test the conditional UPDATE purchase path"""
+
+    def setup_method(self):
+        self.sweet = Sweet.objects.create(
+            name="Test Chocolate",
+            category="Chocolate",
+            price=Decimal("2.50"),
+            quantity=5
+        )
+
+    def test_purchase_returns_updated_sweet(self):
+        sweet = services.purchase(self.sweet.id, 2)
+
+        assert sweet.quantity == 3
+        assert sweet.updated_at > self.sweet.updated_at
+
+    def test_purchase_more_than_available_changes_nothing(self):
+        with pytest.raises(services.InsufficientStock) as excinfo:
+            services.purchase(self.sweet.id, 6)
+
+        assert excinfo.value.available == 5
+        self.sweet.refresh_from_db()
+        assert self.sweet.quantity == 5
+
+    def test_purchase_nonexistent_sweet(self):
+        with pytest.raises(services.SweetNotFound):
+            services.purchase(99999, 1)
+
+    def test_restock_reports_previous_quantity(self):
+        sweet, previous = services.restock(self.sweet.id, 10)
+
+        assert previous == 5
+        assert sweet.quantity == 15
+
+    def test_database_rejects_negative_quantity(self):
+        with pytest.raises(IntegrityError):
+            Sweet.objects.filter(pk=self.sweet.pk).update(quantity=-1)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_purchases_never_oversell():
+    """
+    Many threads buying one unit at a time must sell exactly the stock
+    """
+    sweet = Sweet.objects.create(
+        name="Hot Item",
+        category="Chocolate",
+        price=Decimal("1.00"),
+        quantity=40
+    )
+    sold = []
+
+    def buyer():
+        try:
+            while True:
+                try:
+                    services.purchase(sweet.id, 1)
+                except services.InsufficientStock:
+                    return
+                sold.append(1)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buyer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    sweet.refresh_from_db()
+    assert len(sold) == 40
+    assert sweet.quantity == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_overlapping_checkouts_do_not_deadlock():
+    """
+    Baskets listing the same sweets in opposite orders must all succeed
+    """
+    first = Sweet.objects.create(name="First", price=Decimal("1.00"), quantity=100)
+    second = Sweet.objects.create(name="Second", price=Decimal("1.00"), quantity=100)
+    errors = []
+
+    def shopper(items):
+        try:
+            for _ in range(10):
+                services.checkout(items)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    baskets = [[(first.id, 1), (second.id, 1)], [(second.id, 1), (first.id, 1)]] * 2
+    threads = [threading.Thread(target=shopper, args=(items,)) for items in baskets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert errors == []
+    assert first.quantity == second.quantity == 60
+
+
+@pytest.mark.django_db(transaction=True)
+def test_purchase_waiting_for_a_lock_is_stamped_after_it():
+    """
+    updated_at is taken once the row is held, so delta sync clients cannot
+    have moved past it by the time the purchase commits
+    """
+    sweet = Sweet.objects.create(name="Hot Item", price=Decimal("1.00"), quantity=5)
+    holder = psycopg2.connect(**connection.get_connection_params())
+    with holder.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sweets WHERE id = %s FOR UPDATE", [sweet.id])
+
+    def buyer():
+        try:
+            services.purchase(sweet.id, 1)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=buyer)
+    thread.start()
+    time.sleep(0.5)
+    released_at = timezone.now()
+    holder.commit()
+    holder.close()
+    thread.join()
+
+    sweet.refresh_from_db()
+    assert sweet.quantity == 4
+    assert sweet.updated_at >= released_at
@@ -0,0 +1,301 @@
+"""
+Tests for Sharded Stock
+"""
+
+import threading
+import time
+
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.inventory import ledger, services, sharding
+from apps.inventory.models import StockMovement, StockShard
+from apps.sweets.models import Sweet
+from apps.sweets.serializers import SweetSerializer
+
+User = get_user_model()
+
+
+def shard_quantities(sweet):
+    return list(
+        StockShard.objects.filter(sweet=sweet).order_by('shard').values_list('quantity', flat=True)
+    )
+
+
+@pytest.mark.django_db
+class TestStockShards:
+    """Purchases and restocks of a sharded sweet go through its shards"""
+
+    def setup_method(self):
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="user123"
+        )
+        self.sweet = Sweet.objects.create(
+            name="Test Chocolate", category="Chocolate", price=Decimal("2.50"), quantity=10
+        )
+        sharding.reshard(self.sweet.id, 4)
+
+    def test_reshard_splits_the_stock(self):
+        assert shard_quantities(self.sweet) == [3, 3, 2, 2]
+
+        sweet = sharding.reshard(self.sweet.id, 3)
+
+        assert shard_quantities(self.sweet) == [4, 3, 3]
+        assert (sweet.quantity, sweet.stock_shards) == (10, 3)
+
+    def test_unshard_folds_the_stock_back(self):
+        services.purchase(self.sweet.id, 3)
+
+        sweet = sharding.reshard(self.sweet.id, 0)
+
+        assert (sweet.quantity, sweet.stock_shards) == (7, 0)
+        assert not StockShard.objects.exists()
+        assert services.purchase(self.sweet.id, 7).quantity == 0
+
+    def test_purchase_takes_from_one_shard(self):
+        sweet = services.purchase(self.sweet.id, 2, user=self.user)
+
+        assert sweet.quantity == 8
+        taken = [a - b for a, b in zip([3, 3, 2, 2], shard_quantities(self.sweet))]
+        assert sorted(taken) == [0, 0, 0, 2]
+        movement = StockMovement.objects.get()
+        assert (movement.quantity, movement.balance, movement.user_id) == (-2, None, self.user.id)
+
+    def test_fold_records_the_balance(self):
+        services.purchase(self.sweet.id, 2)
+        services.restock(self.sweet.id, 5)
+        # Not recorded yet: stock_at only sees the ledger up to here
+        assert ledger.stock_at(self.sweet.id, timezone.now()) is None
+
+        sharding.fold(self.sweet.id)
+
+        balances = StockMovement.objects.order_by('created_at').values_list('balance', flat=True)
+        assert list(balances) == [8, 13]
+        assert ledger.stock_at(self.sweet.id, timezone.now()) == 13
+
+    def test_snapshots_record_balances_a_lost_fold_left(self):
+        services.purchase(self.sweet.id, 2)
+
+        ledger.take_snapshots(until=timezone.now())
+
+        assert StockMovement.objects.get().balance == 8
+
+    def test_fold_updates_the_sweet(self, django_capture_on_commit_callbacks):
+        # The fold runs once the purchase commits
+        with django_capture_on_commit_callbacks(execute=True):
+            services.purchase(self.sweet.id, 2)
+
+        self.sweet.refresh_from_db()
+        assert self.sweet.quantity == 8
+        assert self.sweet.stock_folded_at is not None
+
+    def test_purchase_borrows_across_shards(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            sweet = services.purchase(self.sweet.id, 9)
+
+        assert sweet.quantity == 1
+        assert sum(shard_quantities(self.sweet)) == 1
+        assert StockMovement.objects.get().balance == 1
+
+    def test_insufficient_stock(self):
+        with pytest.raises(services.InsufficientStock) as excinfo:
+            services.purchase(self.sweet.id, 11)
+
+        assert excinfo.value.available == 10
+        assert shard_quantities(self.sweet) == [3, 3, 2, 2]
+        assert not StockMovement.objects.exists()
+
+    def test_restock_spreads_over_the_shards(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            sweet, previous = services.restock(self.sweet.id, 6)
+
+        assert (sweet.quantity, previous) == (16, 10)
+        assert shard_quantities(self.sweet) == [5, 5, 3, 3]
+        movement = StockMovement.objects.get()
+        assert (movement.kind, movement.quantity, movement.balance) == (StockMovement.RESTOCK, 6, 16)
+
+    def test_checkout_mixes_sharded_and_plain_sweets(self):
+        toffee = Sweet.objects.create(name="Toffee", price=Decimal("1.00"), quantity=4)
+
+        lines = services.checkout([(self.sweet.id, 5), (toffee.id, 1)], user=self.user)
+
+        assert [(sweet.id, sweet.quantity, quantity) for sweet, quantity in lines] == [
+            (self.sweet.id, 5, 5), (toffee.id, 3, 1)
+        ]
+        assert sum(shard_quantities(self.sweet)) == 5
+        assert StockMovement.objects.count() == 2
+
+    def test_failed_checkout_returns_the_shard_stock(self):
+        toffee = Sweet.objects.create(name="Toffee", price=Decimal("1.00"), quantity=4)
+
+        with pytest.raises(services.CheckoutFailed) as excinfo:
+            services.checkout([(self.sweet.id, 5), (toffee.id, 9)])
+
+        assert [line['status'] for line in excinfo.value.lines] == ['ok', 'insufficient_stock']
+        assert sum(shard_quantities(self.sweet)) == 10
+        assert not StockMovement.objects.exists()
+
+    def test_catalog_edits_cannot_change_sharded_stock(self):
+        self.sweet.refresh_from_db()
+
+        serializer = SweetSerializer(self.sweet, data={'quantity': 50}, partial=True)
+
+        assert not serializer.is_valid()
+        assert 'quantity' in serializer.errors
+
+
+@pytest.mark.django_db
+class TestShardStockEndpoint:
+    """POST /api/sweets/:id/shards/"""
+
+    def setup_method(self):
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            username="admin",
+            password="admin123",
+            is_admin=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        self.sweet = Sweet.objects.create(name="Fudge", price=Decimal("3.00"), quantity=20)
+
+    def test_shard_stock(self):
+        response = self.client.post(
+            f'/api/sweets/{self.sweet.id}/shards/', {'shards': 8}, format='json'
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['shards'] == 8
+        assert response.data['sweet']['quantity'] == 20
+        assert StockShard.objects.filter(sweet=self.sweet).count() == 8
+
+    def test_invalid_shard_count(self):
+        response = self.client.post(
+            f'/api/sweets/{self.sweet.id}/shards/', {'shards': sharding.MAX_STOCK_SHARDS + 1},
+            format='json'
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_nonexistent_sweet(self):
+        response = self.client.post('/api/sweets/99999/shards/', {'shards': 2}, format='json')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert 'error' in response.data
+
+    def test_regular_user_forbidden(self):
+        user = User.objects.create_user(email="user@example.com", username="user", password="x")
+        self.client.force_authenticate(user=user)
+
+        response = self.client.post(
+            f'/api/sweets/{self.sweet.id}/shards/', {'shards': 2}, format='json'
+        )
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_sharded_purchases_never_oversell():
+    """
+    Buyers spread over the shards must still sell exactly the stock
+    """
+    sweet = Sweet.objects.create(name="Hot Item", price=Decimal("1.00"), quantity=40)
+    sharding.reshard(sweet.id, 4)
+    sold = []
+
+    def buyer():
+        try:
+            while True:
+                try:
+                    services.purchase(sweet.id, 1)
+                except services.InsufficientStock:
+                    return
+                sold.append(1)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buyer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    sweet.refresh_from_db()
+    assert len(sold) == 40
+    assert sweet.quantity == 0
+    assert shard_quantities(sweet) == [0, 0, 0, 0]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_sharded_purchases_record_the_ledger_in_order():
+    """
+    Purchases on different shards commit in any order, but once folded
+    each movement's balance must still be the stock left after it
+    """
+    sweet = Sweet.objects.create(name="Hot Item", price=Decimal("1.00"), quantity=40)
+    sharding.reshard(sweet.id, 4)
+    services.restock(sweet.id, 8)
+
+    def buyer():
+        try:
+            for _ in range(6):
+                services.purchase(sweet.id, 1)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buyer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    movements = list(
+        StockMovement.objects.filter(sweet=sweet).order_by('created_at')
+        .values_list('created_at', 'balance')
+    )
+    assert [balance for _, balance in movements] == list(range(48, -1, -1))
+    for (_, before), (moment, _) in zip(movements, movements[1:]):
+        assert ledger.stock_at(sweet.id, moment) == before
+    assert ledger.stock_at(sweet.id, timezone.now()) == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sharded_purchases_do_not_wait_for_each_other_to_commit():
+    """
+    A purchase still open on one shard must not hold up one on another
+    """
+    sweet = Sweet.objects.create(name="Hot Item", price=Decimal("1.00"), quantity=40)
+    sharding.reshard(sweet.id, 4)
+    bought, release = threading.Event(), threading.Event()
+
+    def slow_buyer():
+        try:
+            with transaction.atomic():
+                services.purchase(sweet.id, 1)
+                bought.set()
+                release.wait(5)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=slow_buyer)
+    thread.start()
+    try:
+        assert bought.wait(5)
+        started = time.monotonic()
+        services.purchase(sweet.id, 1)
+        waited = time.monotonic() - started
+    finally:
+        release.set()
+        thread.join()
+
+    assert waited < 1
+    balances = StockMovement.objects.order_by('created_at').values_list('balance', flat=True)
+    assert list(balances) == [39, 38]
@@ -276,4 +276,239 @@ class TestRestockEndpoint:
         
         response = self.client.post(url, data, format='json')
         
-        assert response.status_code == status.HTTP_404_NOT_FOUND
\ No newline at end of file
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestCheckoutEndpoint:
+    """Test POST /api/sweets/checkout/ - Multi-item purchase"""
+    
+    def setup_method(self):
+        """Setup test data"""
+        self.client = APIClient()
+        
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            password='pass123'
+        )
+        
+        self.chocolate = Sweet.objects.create(
+            name="Test Chocolate",
+            category="Chocolate",
+            price=Decimal("2.50"),
+            quantity=10
+        )
+        
+        self.gummy = Sweet.objects.create(
+            name="Test Gummy",
+            category="Gummy",
+            price=Decimal("1.20"),
+            quantity=3
+        )
+        
+        self.url = '/api/sweets/checkout/'
+    
+    def test_checkout_success(self):
+        """
+        Test buying several sweets in one request
+        Should decrease every quantity and report the total
+        """
+        self.client.force_authenticate(user=self.user)
+        
+        data = {'items': [
+            {'sweet_id': self.gummy.id, 'quantity': 2},
+            {'sweet_id': self.chocolate.id, 'quantity': 4},
+        ]}
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_cost'] == 12.40
+        assert [line['sweet_id'] for line in response.data['items']] == [
+            self.gummy.id, self.chocolate.id
+        ]
+        assert response.data['items'][0]['remaining_quantity'] == 1
+        
+        self.chocolate.refresh_from_db()
+        self.gummy.refresh_from_db()
+        assert self.chocolate.quantity == 6
+        assert self.gummy.quantity == 1
+    
+    def test_checkout_is_all_or_nothing(self):
+        """
+        Test that one short line aborts the whole basket
+        """
+        self.client.force_authenticate(user=self.user)
+        
+        data = {'items': [
+            {'sweet_id': self.chocolate.id, 'quantity': 4},
+            {'sweet_id': self.gummy.id, 'quantity': 5},
+            {'sweet_id': 99999, 'quantity': 1},
+        ]}
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert [line['status'] for line in response.data['items']] == [
+            'ok', 'insufficient_stock', 'not_found'
+        ]
+        assert response.data['items'][1]['available_quantity'] == 3
+        
+        self.chocolate.refresh_from_db()
+        assert self.chocolate.quantity == 10
+    
+    def test_checkout_rejects_duplicate_lines(self):
+        """
+        Test that a sweet may only appear once per basket
+        """
+        self.client.force_authenticate(user=self.user)
+        
+        data = {'items': [
+            {'sweet_id': self.chocolate.id, 'quantity': 1},
+            {'sweet_id': self.chocolate.id, 'quantity': 2},
+        ]}
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'items' in response.data
+    
+    def test_checkout_rejects_empty_or_invalid_basket(self):
+        """
+        Test empty baskets and invalid quantities
+        """
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.post(self.url, {'items': []}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        data = {'items': [{'sweet_id': self.chocolate.id, 'quantity': 0}]}
+        response = self.client.post(self.url, data, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_checkout_requires_authentication(self):
+        """
+        Test that checkout requires authentication
+        """
+        data = {'items': [{'sweet_id': self.chocolate.id, 'quantity': 1}]}
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestBulkRestockEndpoint:
+    """Test POST /api/sweets/restock/ - Restock many sweets at once (Admin only)"""
+    
+    def setup_method(self):
+        """Setup test data"""
+        self.client = APIClient()
+        self.url = '/api/sweets/restock/'
+        
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            password='pass123'
+        )
+        self.admin = User.objects.create_user(
+            email='admin@example.com',
+            username='admin',
+            password='admin123',
+            is_admin=True
+        )
+        
+        self.chocolate = Sweet.objects.create(
+            name="Chocolate Bar", category="Chocolate", price=Decimal("2.50"), quantity=5
+        )
+        self.gummy = Sweet.objects.create(
+            name="Gummy Bears", category="Gummy", price=Decimal("1.00"), quantity=0
+        )
+    
+    def test_bulk_restock(self):
+        """
+        Test every line is restocked, with previous and new quantities
+        in request order
+        """
+        self.client.force_authenticate(user=self.admin)
+        data = [
+            {'sweet_id': self.gummy.id, 'quantity': 12},
+            {'sweet_id': self.chocolate.id, 'quantity': 20},
+        ]
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert [
+            (item['sweet_id'], item['previous_quantity'], item['new_quantity'])
+            for item in response.data['items']
+        ] == [(self.gummy.id, 0, 12), (self.chocolate.id, 5, 25)]
+        
+        self.chocolate.refresh_from_db()
+        self.gummy.refresh_from_db()
+        assert (self.chocolate.quantity, self.gummy.quantity) == (25, 12)
+    
+    def test_bulk_restock_unknown_sweet_changes_nothing(self):
+        """
+        Test a line naming a missing sweet fails the whole delivery
+        """
+        self.client.force_authenticate(user=self.admin)
+        data = [
+            {'sweet_id': self.chocolate.id, 'quantity': 20},
+            {'sweet_id': 99999, 'quantity': 1},
+        ]
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['sweet_ids'] == [99999]
+        self.chocolate.refresh_from_db()
+        assert self.chocolate.quantity == 5
+    
+    def test_bulk_restock_rejects_invalid_lines(self):
+        """
+        Test empty deliveries, invalid quantities and repeated sweets
+        """
+        self.client.force_authenticate(user=self.admin)
+        
+        response = self.client.post(self.url, [], format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        data = [{'sweet_id': self.chocolate.id, 'quantity': 0}]
+        response = self.client.post(self.url, data, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        data = [{'sweet_id': self.chocolate.id, 'quantity': 1}] * 2
+        response = self.client.post(self.url, data, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_bulk_restock_sharded_sweet(self):
+        """
+        Test sharded sweets are restocked on their shards
+        """
+        from apps.inventory import sharding
+        sharding.reshard(self.gummy.id, 2)
+        self.client.force_authenticate(user=self.admin)
+        data = [
+            {'sweet_id': self.gummy.id, 'quantity': 6},
+            {'sweet_id': self.chocolate.id, 'quantity': 1},
+        ]
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['items'][0]['new_quantity'] == 6
+        assert response.data['items'][1]['new_quantity'] == 6
+    
+    def test_bulk_restock_as_regular_user_forbidden(self):
+        """
+        Test that regular users cannot restock
+        """
+        self.client.force_authenticate(user=self.user)
+        data = [{'sweet_id': self.chocolate.id, 'quantity': 20}]
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
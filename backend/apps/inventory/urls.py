@@ -2,10 +2,26 @@
 URL Configuration for Inventory Management
 """
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import group_commit, views
+
+# Purchases waiting for their batch must not hold the thread that every
+# sync view shares under ASGI
+purchase_view = views.purchase_sweet
+if settings.PURCHASE_GROUP_COMMIT_MS and settings.SERVER_MODE == 'asgi':
+    purchase_view = group_commit.concurrent_view(purchase_view)
 
 urlpatterns = [
-    path('<int:pk>/purchase/', views.purchase_sweet, name='purchase-sweet'),
+    path('checkout/', views.checkout, name='checkout'),
+    path('restock/', views.bulk_restock, name='bulk-restock'),
+    path('<int:pk>/purchase/', purchase_view, name='purchase-sweet'),
     path('<int:pk>/restock/', views.restock_sweet, name='restock-sweet'),
+    path('<int:pk>/shards/', views.shard_stock, name='shard-stock'),
+    path('<int:pk>/reserve/', views.reserve_sweet, name='reserve-sweet'),
+    path('reservations/<int:pk>/confirm/', views.confirm_reservation, name='confirm-reservation'),
+    path('reservations/<int:pk>/cancel/', views.cancel_reservation, name='cancel-reservation'),
+    path('sales/top-sellers/', views.top_sellers, name='sales-top-sellers'),
+    path('sales/by-category/', views.revenue_by_category, name='sales-by-category'),
+    path('sales/over-time/', views.sales_over_time, name='sales-over-time'),
 ]
\ No newline at end of file
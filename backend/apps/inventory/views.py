@@ -3,23 +3,33 @@ API Views for Inventory Management
 Handles purchase and restock operations
 """
 
+from functools import partial
+
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from apps.sweets.models import Sweet
 from apps.sweets.serializers import SweetSerializer
-from .serializers import PurchaseSerializer, RestockSerializer
+from apps.sweets.models import Sweet
+from . import group_commit, reservations, sales, services, sharding
+from .serializers import (
+    PurchaseSerializer, RestockSerializer, CheckoutSerializer, ShardStockSerializer,
+    ReserveSerializer, ReservationSerializer, RestockLineSerializer, RESTOCK_MAX_LINES,
+    SalesRangeSerializer, TopSellersSerializer, SalesOverTimeSerializer,
+)
 from .permissions import IsAdminUser
+from .idempotency import AlreadyClaimed, idempotent
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent(claimed_by_view=True)
 def purchase_sweet(request, pk):
     """
     Purchase a sweet (decrease quantity)
     
     POST /api/sweets/:id/purchase/
+    Header: Idempotency-Key (optional), see idempotency.py
     Body: {
         "quantity": 1  // Optional, defaults to 1
     }
@@ -28,43 +38,53 @@ def purchase_sweet(request, pk):
     - 200: Purchase successful
     - 400: Invalid quantity or insufficient stock
     - 404: Sweet not found
+    - 422: Idempotency-Key already used for a different request
     """
-    try:
-        sweet = Sweet.objects.get(pk=pk)
-    except Sweet.DoesNotExist:
-        return Response(
-            {'error': 'Sweet not found'},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    
     # Validate request data
     serializer = PurchaseSerializer(data=request.data)
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     quantity_to_purchase = serializer.validated_data['quantity']
+    respond = partial(_purchase_response, quantity_to_purchase)
     
-    # Check if sweet is in stock
-    if sweet.quantity == 0:
+    # Check and decrement stock in one conditional UPDATE, committed with
+    # concurrent purchases when group commit is on (see group_commit.py).
+    # The Idempotency-Key and its response go in the same transaction.
+    try:
+        result = group_commit.purchase(
+            pk, quantity_to_purchase, user=request.user,
+            keyed=request.idempotency, respond=respond
+        )
+    except AlreadyClaimed:
+        return request.idempotency.replay()
+    except (services.SweetNotFound, services.InsufficientStock) as exc:
+        result = exc
+    return respond(result)
+
+
+def _purchase_response(quantity_to_purchase, result):
+    """The purchase view's Response to `result`, the bought Sweet or why not"""
+    if isinstance(result, services.SweetNotFound):
         return Response(
-            {'error': f'{sweet.name} is currently out of stock'},
-            status=status.HTTP_400_BAD_REQUEST
+            {'error': 'Sweet not found'},
+            status=status.HTTP_404_NOT_FOUND
         )
-    
-    # Check if enough quantity available
-    if quantity_to_purchase > sweet.quantity:
+    if isinstance(result, services.InsufficientStock):
+        if result.available == 0:
+            return Response(
+                {'error': f'{result.name} is currently out of stock'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         return Response(
             {
-                'error': f'Insufficient stock. Only {sweet.quantity} units available',
-                'available_quantity': sweet.quantity
+                'error': f'Insufficient stock. Only {result.available} units available',
+                'available_quantity': result.available
             },
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Update quantity
-    sweet.quantity -= quantity_to_purchase
-    sweet.save()
-    
+    sweet = result
     return Response({
         'message': f'Successfully purchased {quantity_to_purchase} unit(s) of {sweet.name}',
         'sweet': SweetSerializer(sweet).data,
@@ -76,11 +96,13 @@ def purchase_sweet(request, pk):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsAdminUser])
+@idempotent
 def restock_sweet(request, pk):
     """
     Restock a sweet (increase quantity) - Admin only
     
     POST /api/sweets/:id/restock/
+    Header: Idempotency-Key (optional), see idempotency.py
     Body: {
         "quantity": 10  // Optional, defaults to 10
     }
@@ -90,15 +112,8 @@ def restock_sweet(request, pk):
     - 400: Invalid quantity
     - 403: User is not admin
     - 404: Sweet not found
+    - 422: Idempotency-Key already used for a different request
     """
-    try:
-        sweet = Sweet.objects.get(pk=pk)
-    except Sweet.DoesNotExist:
-        return Response(
-            {'error': 'Sweet not found'},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    
     # Validate request data
     serializer = RestockSerializer(data=request.data)
     if not serializer.is_valid():
@@ -106,10 +121,14 @@ def restock_sweet(request, pk):
     
     quantity_to_add = serializer.validated_data['quantity']
     
-    # Update quantity
-    old_quantity = sweet.quantity
-    sweet.quantity += quantity_to_add
-    sweet.save()
+    # Increment stock in one UPDATE
+    try:
+        sweet, old_quantity = services.restock(pk, quantity_to_add, user=request.user)
+    except services.SweetNotFound:
+        return Response(
+            {'error': 'Sweet not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
     
     return Response({
         'message': f'Successfully restocked {sweet.name}',
@@ -117,4 +136,379 @@ def restock_sweet(request, pk):
         'added_quantity': quantity_to_add,
         'previous_quantity': old_quantity,
         'new_quantity': sweet.quantity
-    }, status=status.HTTP_200_OK)
\ No newline at end of file
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+@idempotent
+def bulk_restock(request):
+    """
+    Restock many sweets at once, e.g. a whole delivery - Admin only
+    
+    Every line is applied by one statement (see services.bulk_restock).
+    
+    POST /api/sweets/restock/
+    Header: Idempotency-Key (optional), see idempotency.py
+    Body: [
+        {"sweet_id": 1, "quantity": 24},
+        {"sweet_id": 5, "quantity": 10}
+    ]
+    
+    Returns:
+    - 200: Every line restocked; previous and new quantity per line
+    - 400: Invalid lines, or a sweet does not exist (nothing restocked)
+    - 403: User is not admin
+    - 422: Idempotency-Key already used for a different request
+    """
+    serializer = RestockLineSerializer(
+        data=request.data, many=True, allow_empty=False, max_length=RESTOCK_MAX_LINES
+    )
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    lines = [(line['sweet_id'], line['quantity']) for line in serializer.validated_data]
+    
+    try:
+        restocked = services.bulk_restock(lines, user=request.user)
+    except services.RestockFailed as exc:
+        return Response(
+            {
+                'error': 'Sweets not found, nothing was restocked',
+                'sweet_ids': exc.sweet_ids
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response({
+        'message': f'Successfully restocked {len(restocked)} sweet(s)',
+        'items': [
+            {
+                'sweet_id': sweet.id,
+                'name': sweet.name,
+                'added_quantity': added,
+                'previous_quantity': sweet.quantity - added,
+                'new_quantity': sweet.quantity,
+            }
+            for sweet, added in restocked
+        ]
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def checkout(request):
+    """
+    Purchase several sweets at once (all-or-nothing)
+    
+    POST /api/sweets/checkout/
+    Header: Idempotency-Key (optional), see idempotency.py
+    Body: {
+        "items": [
+            {"sweet_id": 1, "quantity": 2},
+            {"sweet_id": 5, "quantity": 1}
+        ]
+    }
+    
+    Returns:
+    - 200: Every line purchased; per-line results and total cost
+    - 400: Invalid basket, or a line is unknown/short of stock (nothing bought)
+    - 422: Idempotency-Key already used for a different request
+    """
+    serializer = CheckoutSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    items = [
+        (item['sweet_id'], item['quantity'])
+        for item in serializer.validated_data['items']
+    ]
+    
+    try:
+        purchased = services.checkout(items, user=request.user)
+    except services.CheckoutFailed as exc:
+        return Response(
+            {
+                'error': 'Checkout failed, no items were purchased',
+                'items': exc.lines
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    lines = [
+        {
+            'sweet_id': sweet.id,
+            'name': sweet.name,
+            'purchased_quantity': quantity,
+            'remaining_quantity': sweet.quantity,
+            'unit_price': float(sweet.price),
+            'line_total': float(sweet.price * quantity),
+        }
+        for sweet, quantity in purchased
+    ]
+    total_cost = sum(sweet.price * quantity for sweet, quantity in purchased)
+    
+    return Response({
+        'message': f'Successfully purchased {len(lines)} item(s)',
+        'items': lines,
+        'total_cost': float(total_cost)
+    }, status=status.HTTP_200_OK)
+
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def shard_stock(request, pk):
+    """
+    Split a sweet's stock over several counter rows - Admin only
+    
+    For flash sales: concurrent purchases of a sharded sweet lock different
+    rows instead of all queueing on one (see sharding.py).
+    
+    POST /api/sweets/:id/shards/
+    Body: {
+        "shards": 8  // 0 to stop sharding
+    }
+    
+    Returns:
+    - 200: Stock redistributed
+    - 400: Invalid shard count, or the sweet has reserved units
+    - 403: User is not admin
+    - 404: Sweet not found
+    """
+    serializer = ShardStockSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    shards = serializer.validated_data['shards']
+    
+    try:
+        sweet = sharding.reshard(pk, shards)
+    except Sweet.DoesNotExist:
+        return Response(
+            {'error': 'Sweet not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except sharding.StockReserved as exc:
+        return Response(
+            {'error': f'{exc} has reserved units; shard it once its reservations end'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response({
+        'message': f'{sweet.name} stock is now split over {shards} shard(s)' if shards
+                   else f'{sweet.name} stock is no longer sharded',
+        'sweet': SweetSerializer(sweet).data,
+        'shards': shards
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def reserve_sweet(request, pk):
+    """
+    Hold units of a sweet until checkout (see reservations.py)
+    
+    The units are not for sale to anyone else until the reservation is
+    confirmed, cancelled or expires after RESERVATION_TTL_SECONDS.
+    
+    POST /api/sweets/:id/reserve/
+    Header: Idempotency-Key (optional), see idempotency.py
+    Body: {
+        "quantity": 1  // Optional, defaults to 1
+    }
+    
+    Returns:
+    - 201: Units held
+    - 400: Invalid quantity, not enough units for sale, or sharded stock
+    - 404: Sweet not found
+    - 422: Idempotency-Key already used for a different request
+    """
+    serializer = ReserveSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    quantity_to_reserve = serializer.validated_data['quantity']
+    
+    try:
+        reservation = reservations.reserve(pk, quantity_to_reserve, request.user)
+    except services.SweetNotFound:
+        return Response(
+            {'error': 'Sweet not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except services.InsufficientStock as exc:
+        return Response(
+            {
+                'error': f'Insufficient stock. Only {exc.available} units available',
+                'available_quantity': exc.available
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except reservations.ShardedStock as exc:
+        return Response(
+            {'error': f'{exc} is on flash sale and cannot be reserved, purchase it directly'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    sweet = reservation.sweet
+    return Response({
+        'message': f'Reserved {quantity_to_reserve} unit(s) of {sweet.name}',
+        'reservation': ReservationSerializer(reservation).data,
+        'available_quantity': sweet.quantity - sweet.reserved
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def confirm_reservation(request, pk):
+    """
+    Purchase the units a reservation holds
+    
+    POST /api/sweets/reservations/:id/confirm/
+    Header: Idempotency-Key (optional), see idempotency.py
+    
+    Returns:
+    - 200: Purchase successful
+    - 404: Reservation not found
+    - 410: Reservation expired (its units are released)
+    - 422: Idempotency-Key already used for a different request
+    """
+    try:
+        sweet, quantity = reservations.confirm(pk, request.user)
+    except reservations.ReservationNotFound:
+        return Response(
+            {'error': 'Reservation not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except reservations.ReservationExpired:
+        return Response(
+            {'error': 'Reservation has expired'},
+            status=status.HTTP_410_GONE
+        )
+    
+    return Response({
+        'message': f'Successfully purchased {quantity} unit(s) of {sweet.name}',
+        'sweet': SweetSerializer(sweet).data,
+        'purchased_quantity': quantity,
+        'remaining_quantity': sweet.quantity,
+        'total_cost': float(sweet.price) * quantity
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cancel_reservation(request, pk):
+    """
+    Release the units a reservation holds
+    
+    POST /api/sweets/reservations/:id/cancel/
+    
+    Returns:
+    - 200: Reservation cancelled
+    - 404: Reservation not found
+    """
+    try:
+        reservations.cancel(pk, request.user)
+    except reservations.ReservationNotFound:
+        return Response(
+            {'error': 'Reservation not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return Response({'message': 'Reservation cancelled'}, status=status.HTTP_200_OK)
+
+
+def _sales_report(start, end, results):
+    """The response body shared by the sales reports"""
+    return {
+        'start': start,
+        'end': end,
+        'rolled_up_to': sales.rolled_up_to(),
+        'results': results
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def top_sellers(request):
+    """
+    Best-selling sweets by units sold - Admin only
+    
+    Reads the daily sales rollups only (see sales.py), so sales since
+    `rolled_up_to` are not counted yet.
+    
+    GET /api/sweets/sales/top-sellers/?start=2026-01-01&end=2026-01-31&limit=10
+    
+    Returns:
+    - 200: Sweets with units, revenue and purchases, best first
+    - 400: Invalid range or limit
+    - 403: User is not admin
+    """
+    serializer = TopSellersSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    start, end = serializer.validated_data['start'], serializer.validated_data['end']
+    results = sales.top_sellers(*sales.day_bounds(start, end), serializer.validated_data['limit'])
+    
+    return Response(_sales_report(start, end, results), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def revenue_by_category(request):
+    """
+    Units and revenue per category - Admin only
+    
+    GET /api/sweets/sales/by-category/?start=2026-01-01&end=2026-01-31
+    
+    Returns:
+    - 200: Categories with units, revenue and purchases, highest revenue first
+    - 400: Invalid range
+    - 403: User is not admin
+    """
+    serializer = SalesRangeSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    start, end = serializer.validated_data['start'], serializer.validated_data['end']
+    results = sales.revenue_by_category(*sales.day_bounds(start, end))
+    
+    return Response(_sales_report(start, end, results), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def sales_over_time(request):
+    """
+    Units and revenue per hour or day - Admin only
+    
+    For the whole shop, or one sweet or category. Every bucket in the range
+    is listed, with zeros where nothing sold.
+    
+    GET /api/sweets/sales/over-time/?interval=hour&start=2026-01-01&end=2026-01-07
+    Query: interval (hour|day), start, end, sweet_id or category (optional)
+    
+    Returns:
+    - 200: One entry per bucket, oldest first
+    - 400: Invalid range, interval or filter
+    - 403: User is not admin
+    """
+    serializer = SalesOverTimeSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    results = sales.units_over_time(
+        sales.PERIODS[data['interval']],
+        *sales.day_bounds(data['start'], data['end']),
+        sweet_id=data.get('sweet_id'),
+        category=data.get('category')
+    )
+    
+    return Response(_sales_report(data['start'], data['end'], results), status=status.HTTP_200_OK)
+
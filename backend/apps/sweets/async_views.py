@@ -0,0 +1,84 @@
+"""
+Async Catalog Reads
+Serves the hot read actions of a DRF viewset from the event loop when the
+app runs under ASGI (SERVER_MODE=asgi, see gunicorn.conf.py)
+
+DRF views are synchronous, and under ASGI Django would run each one in a
+thread. Instead, as_async_view() dispatches GET/HEAD to an async
+counterpart of the action (list -> alist, ...) that reads with Django's
+async ORM, and passes every other method to the usual sync view.
+Authentication, permissions and error handling are DRF's own.
+
+At most ASYNC_DB_CONCURRENCY async reads per worker query the database
+at once; each holds a connection while it does. Requests beyond that
+wait on the event loop, which costs no thread and no connection.
+"""
+
+import asyncio
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+
+_slots = weakref.WeakKeyDictionary()
+
+
+def database_slots():
+    """This event loop's semaphore of ASYNC_DB_CONCURRENCY slots"""
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(loop)
+    if slots is None:
+        slots = _slots[loop] = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+    return slots
+
+
+class AsyncReadMixin:
+    """
+    Adds as_async_view() to a viewset
+
+    `async_actions` maps each action with an async version to the name of
+    its coroutine method, which takes the same arguments and returns a
+    Response.
+    """
+
+    async_actions = {}
+
+    @classmethod
+    def as_async_view(cls, actions, **initkwargs):
+        """Like as_view(actions), serving async_actions without a thread"""
+        sync_view = cls.as_view(actions, **initkwargs)
+
+        async def view(request, *args, **kwargs):
+            method = 'get' if request.method == 'HEAD' else request.method.lower()
+            handler = cls.async_actions.get(actions.get(method))
+            if handler is None:
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+            self = cls(**initkwargs)
+            self.action_map = {**actions, 'head': actions['get']}
+            async with database_slots():
+                return await self.async_dispatch(request, handler, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.actions = actions
+        return csrf_exempt(view)
+
+    async def async_dispatch(self, request, handler, *args, **kwargs):
+        """APIView.dispatch() with an awaited handler"""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication may look the user up, which the sync ORM does
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await getattr(self, handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,232 @@
+"""
+Name Autocomplete
+A per-worker, in-memory sorted index of sweet names for prefix lookups
+
+Every name is indexed under its normalized form (case-folded, accents and
+extra whitespace removed) and under each of its later word suffixes, so
+"bar" finds "Milk Chocolate Bar". Names starting with the prefix are
+suggested before names with a later word starting with it. Lookups are a
+bisect into sorted lists and never touch the database.
+
+Keeping it current, all off the request path:
+- saves and deletes in this worker update the index in place (signals.py)
+- a background thread per worker, started by start() (gunicorn.conf.py
+  calls it as the worker boots), builds the index and then,
+  every AUTOCOMPLETE_REFRESH_SECONDS, picks up other writers (other
+  workers, bulk writes, imports) from the delta sync feed (changes.py).
+  Only sweets changed or deleted since the previous check are read, and
+  only those whose name changed touch the lists, each with an insort or a
+  del, SYNC_CHUNK_SIZE at a time so lookups never wait long for the lock.
+  Larger change sets, and a position the feed no longer covers, rebuild the
+  index instead, off the lock, swapping it in when done
+"""
+
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .changes import changed_after, settled_until, tombstone_horizon
+from .models import Sweet, SweetTombstone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Changes applied per hold of the lock lookups take
+SYNC_CHUNK_SIZE = 100
+
+# Changed sweets beyond which a sync rebuilds the index instead
+SYNC_REBUILD_AFTER = 2000
+
+
+def normalize(text):
+    """Case-folded, accent-free, single-spaced form of `text`"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.split())
+
+
+def _keys(name):
+    """
+    Index keys of a name: (the normalized name, [each later suffix of it
+    that starts a word])
+    """
+    words = normalize(name).split(' ')
+    return ' '.join(words), [' '.join(words[index:]) for index in range(1, len(words))]
+
+
+class NameIndex:
+    """
+    Two sorted lists of (key, id) entries, for whole names and for later
+    word suffixes, plus the display name of each id
+
+    Changes are made to the lists in place under the lock, which lookups
+    take as well; both are a few bisects.
+    """
+
+    def __init__(self, refresh_seconds=None):
+        self.refresh_seconds = refresh_seconds
+        self._whole = self._words = self._names = None
+        # Delta sync position the index is current up to
+        self._position = None
+        self._maintainer = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._names is not None
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        """
+        Up to `limit` {'id', 'name'} dicts whose name has a word starting
+        with `prefix`
+
+        Nothing is suggested until the index is built; the first call
+        starts building it if start() has not.
+        """
+        key = normalize(prefix)
+        if not key:
+            return []
+        if not self.loaded:
+            self.start()
+            return []
+
+        results = []
+        seen = set()
+        with self._lock:
+            for entries in (self._whole, self._words):
+                position = bisect_left(entries, (key,))
+                while position < len(entries) and len(results) < limit:
+                    entry_key, sweet_id = entries[position]
+                    if not entry_key.startswith(key):
+                        break
+                    if sweet_id not in seen:
+                        seen.add(sweet_id)
+                        results.append({'id': sweet_id, 'name': self._names[sweet_id]})
+                    position += 1
+        return results
+
+    def start(self):
+        """Build the index, and keep it current, from a background thread"""
+        with self._lock:
+            if self._maintainer is not None and self._maintainer.is_alive():
+                return
+            self._maintainer = threading.Thread(
+                target=self._maintain, name='autocomplete-index', daemon=True
+            )
+            self._maintainer.start()
+
+    def load(self):
+        """(Re)build the whole index from the database"""
+        # Changes the query below may miss are after this position
+        position = (settled_until(), 0)
+        names = dict(Sweet.objects.values_list('id', 'name'))
+        whole, words = [], []
+        for sweet_id, name in names.items():
+            name_key, word_keys = _keys(name)
+            whole.append((name_key, sweet_id))
+            words.extend((key, sweet_id) for key in word_keys)
+        whole.sort()
+        words.sort()
+
+        with self._lock:
+            self._whole, self._words, self._names = whole, words, names
+            self._position = position
+
+    def sync(self):
+        """Apply the changes other writers made since the index was last current"""
+        position = self._position
+        if position[0] < tombstone_horizon():
+            self.load()
+            return
+
+        until = settled_until()
+        changed = list(
+            changed_after(Sweet.objects.filter(updated_at__lte=until), 'updated_at', 'id', position)
+            .values_list('id', 'name')
+        )
+        deleted = list(
+            changed_after(
+                SweetTombstone.objects.filter(deleted_at__lte=until), 'deleted_at', 'sweet_id', position
+            ).values_list('sweet_id', flat=True)
+        )
+        if len(changed) + len(deleted) > SYNC_REBUILD_AFTER:
+            self.load()
+            return
+
+        # Ids are never reused, so the order of the two does not matter
+        changes = [(self._index, change) for change in changed]
+        changes += [(self._unindex, (sweet_id,)) for sweet_id in deleted]
+        for start in range(0, len(changes), SYNC_CHUNK_SIZE):
+            with self._lock:
+                for apply, arguments in changes[start:start + SYNC_CHUNK_SIZE]:
+                    apply(*arguments)
+        with self._lock:
+            self._position = (until, 0)
+
+    def update(self, sweet_id, name):
+        """Index a created or renamed sweet"""
+        with self._lock:
+            if self.loaded:
+                self._index(sweet_id, name)
+
+    def remove(self, sweet_id):
+        """Drop a deleted sweet"""
+        with self._lock:
+            if self.loaded:
+                self._unindex(sweet_id)
+
+    def clear(self):
+        with self._lock:
+            self._whole = self._words = self._names = None
+            self._position = None
+
+    def _index(self, sweet_id, name):
+        if self._names.get(sweet_id) == name:
+            return
+        self._unindex(sweet_id)
+        name_key, word_keys = _keys(name)
+        insort(self._whole, (name_key, sweet_id))
+        for key in word_keys:
+            insort(self._words, (key, sweet_id))
+        self._names[sweet_id] = name
+
+    def _unindex(self, sweet_id):
+        old_name = self._names.pop(sweet_id, None)
+        if old_name is not None:
+            name_key, word_keys = _keys(old_name)
+            _discard(self._whole, (name_key, sweet_id))
+            for key in word_keys:
+                _discard(self._words, (key, sweet_id))
+
+    def _maintain(self):
+        while True:
+            try:
+                if self.loaded:
+                    self.sync()
+                else:
+                    self.load()
+            except DatabaseError:
+                logger.exception('Could not refresh the autocomplete index, retrying')
+            finally:
+                connection.close()
+
+            refresh_seconds = self.refresh_seconds
+            if refresh_seconds is None:
+                refresh_seconds = settings.AUTOCOMPLETE_REFRESH_SECONDS
+            time.sleep(refresh_seconds)
+
+
+def _discard(entries, entry):
+    position = bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
+
+
+name_index = NameIndex()
@@ -0,0 +1,119 @@
+"""
+Benchmark Helpers
+Shared by the bench_* management commands
+
+Benchmarks seed synthetic rows straight into the database with one
+set-based INSERT, so large catalogs (1M rows) can be built in seconds.
+Commands run inside a transaction that is rolled back unless told otherwise.
+"""
+
+import socket
+import statistics
+import time
+
+from django.db import connection
+
+from .models import Sweet
+
+FLAVOURS = [
+    'caramel', 'chocolate', 'strawberry', 'lemon', 'mint', 'cherry', 'toffee',
+    'vanilla', 'raspberry', 'liquorice', 'orange', 'coconut', 'hazelnut',
+    'butterscotch', 'apple', 'blackcurrant', 'cola', 'peach', 'honey', 'ginger',
+]
+
+SHAPES = [
+    'bar', 'drops', 'bears', 'worms', 'buttons', 'truffle', 'fudge', 'lollipop',
+    'chews', 'bonbons', 'twists', 'rings', 'hearts', 'stars', 'fizz', 'cubes',
+]
+
+CATEGORIES = [choice for choice, _label in Sweet.CATEGORY_CHOICES]
+
+SEED_SQL = """
+    INSERT INTO sweets (name, category, description, price, quantity, created_at, updated_at)
+    SELECT
+        initcap(flavours[1 + (i * 7) %% cardinality(flavours)]) || ' '
+            || initcap(shapes[1 + (i * 13) %% cardinality(shapes)]) || ' #' || (%(offset)s + i),
+        categories[1 + i %% cardinality(categories)],
+        'Handmade ' || flavours[1 + (i * 11) %% cardinality(flavours)] || ' '
+            || shapes[1 + (i * 5) %% cardinality(shapes)] || ' with a hint of '
+            || flavours[1 + (i * 17) %% cardinality(flavours)],
+        round((0.5 + random() * 20)::numeric, 2),
+        CASE WHEN i %% 10 = 0 THEN 0 ELSE (i * 31) %% 500 END,
+        now(),
+        now()
+    FROM generate_series(1, %(count)s) AS i,
+         (SELECT %(flavours)s::text[] AS flavours,
+                 %(shapes)s::text[] AS shapes,
+                 %(categories)s::text[] AS categories) AS vocabulary
+"""
+
+
+def seed_sweets(count, offset=0):
+    """Insert `count` synthetic sweets and refresh planner statistics"""
+    with connection.cursor() as cursor:
+        cursor.execute(SEED_SQL, {
+            'count': count,
+            'offset': offset,
+            'flavours': FLAVOURS,
+            'shapes': SHAPES,
+            'categories': CATEGORIES,
+        })
+        cursor.execute('ANALYZE sweets')
+
+
+def index_exists(name):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [name])
+        return cursor.fetchone() is not None
+
+
+def measure(func, repeat=20, warmup=2):
+    """Call `func` repeatedly and return latency stats in milliseconds"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'p50': percentile(ordered, 50),
+        'p95': percentile(ordered, 95),
+        'p99': percentile(ordered, 99),
+        'max': ordered[-1],
+    }
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def free_port():
+    """A TCP port on localhost nothing is listening on, for a server under test"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    """Block until a server accepts connections on `port`"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Nothing is listening on port {port}')
@@ -0,0 +1,268 @@
+"""
+Bulk Catalog Import
+Loads a CSV or NDJSON supplier catalog in one set-based upsert
+
+The file is parsed as a stream and validated in batches with the same rules
+as SweetSerializer. Valid rows are COPYed into a temporary staging table,
+which is then merged into `sweets` with a single statement:
+- rows with an `id` update that sweet
+- other rows update the sweet with the same name, or create a new one
+
+Invalid rows do not stop the import; they are returned in the report with
+their line number and errors.
+"""
+
+import csv
+import io
+import json
+
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from .cache import bump_catalog_version
+from .serializers import RESERVED_QUANTITY_ERROR, SHARDED_QUANTITY_ERROR, SweetSerializer
+
+IMPORT_BATCH_SIZE = 5000
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+
+IMPORT_COLUMNS = ('line', 'id', 'name', 'category', 'description', 'price', 'quantity')
+
+CREATE_STAGING_SQL = """
+    CREATE TEMPORARY TABLE sweets_import (
+        line integer NOT NULL,
+        id bigint,
+        name varchar(200) NOT NULL,
+        category varchar(50),
+        description text,
+        price numeric(10, 2) NOT NULL,
+        quantity integer NOT NULL
+    ) ON COMMIT DROP
+"""
+
+COPY_SQL = f"COPY sweets_import ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+# Locks the sweets the file matches, in primary-key order like checkouts
+# and bulk updates, so the checks below still hold when the merge runs
+LOCK_SQL = """
+    SELECT s.id
+    FROM sweets s
+    WHERE s.id IN (SELECT i.id FROM sweets_import i WHERE i.id IS NOT NULL)
+       OR s.name IN (SELECT i.name FROM sweets_import i WHERE i.id IS NULL)
+    ORDER BY s.id
+    FOR UPDATE
+"""
+
+# Rows the merge cannot place: unknown ids, names shared by several sweets,
+# new quantities for sweets with sharded stock and quantities below the
+# units reserved
+UNRESOLVED_SQL = """
+    SELECT i.line, 'id', 'Sweet not found'
+    FROM sweets_import i
+    WHERE i.id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM sweets s WHERE s.id = i.id)
+    UNION ALL
+    SELECT i.line, 'name', 'Several sweets have this name, give an id to pick one'
+    FROM sweets_import i
+    JOIN sweets s ON s.name = i.name
+    WHERE i.id IS NULL
+    GROUP BY i.line
+    HAVING count(*) > 1
+    UNION ALL
+    SELECT i.line, 'quantity', %s
+    FROM sweets_import i
+    JOIN sweets s ON s.id = i.id OR (i.id IS NULL AND s.name = i.name)
+    WHERE s.stock_shards > 0 AND s.quantity <> i.quantity
+    UNION ALL
+    SELECT i.line, 'quantity', %s
+    FROM sweets_import i
+    JOIN sweets s ON s.id = i.id OR (i.id IS NULL AND s.name = i.name)
+    WHERE s.stock_shards = 0 AND i.quantity < s.reserved
+"""
+
+MERGE_SQL = """
+    WITH targets AS (
+        SELECT i.*, coalesce(i.id, s.id) AS sweet_id
+        FROM sweets_import i
+        LEFT JOIN sweets s ON i.id IS NULL AND s.name = i.name
+    ),
+    updated AS (
+        UPDATE sweets SET
+            name = t.name,
+            category = coalesce(t.category, sweets.category),
+            description = coalesce(t.description, sweets.description),
+            price = t.price,
+            quantity = t.quantity,
+            updated_at = statement_timestamp()
+        FROM targets t
+        WHERE sweets.id = t.sweet_id
+        RETURNING 1
+    ),
+    inserted AS (
+        INSERT INTO sweets (name, category, description, price, quantity, created_at, updated_at)
+        SELECT t.name, coalesce(t.category, %s), coalesce(t.description, ''),
+               t.price, t.quantity, statement_timestamp(), statement_timestamp()
+        FROM targets t
+        WHERE t.sweet_id IS NULL
+        ORDER BY t.line
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM inserted), (SELECT count(*) FROM updated)
+"""
+
+
+class InvalidImportFile(ValueError):
+    """Raised when an import file has an unknown format or cannot be read"""
+
+
+def import_format(name):
+    """Validate an import format name"""
+    if name not in IMPORT_FORMATS:
+        raise InvalidImportFile(
+            f"Invalid type value, expected one of: {', '.join(IMPORT_FORMATS)}"
+        )
+    return name
+
+
+def import_sweets(stream, name, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import the catalog in binary `stream` (csv or ndjson)
+
+    Returns a report:
+        {'processed': 3, 'created': 1, 'updated': 1,
+         'errors': [{'line': 4, 'errors': {'price': ['...']}}]}
+    Raises InvalidImportFile, and writes nothing, if the file cannot be
+    decoded at all.
+    """
+    import_format(name)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    records = _read_csv(text) if name == 'csv' else _read_ndjson(text)
+
+    report = {'processed': 0, 'created': 0, 'updated': 0, 'errors': []}
+    seen = {}
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(CREATE_STAGING_SQL)
+
+        try:
+            for batch in _batches(records, batch_size):
+                report['processed'] += len(batch)
+                rows = _validate(batch, seen, report['errors'])
+                if rows:
+                    _copy(cursor, rows)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise InvalidImportFile(f'Could not read file: {exc}')
+
+        cursor.execute(LOCK_SQL)
+        cursor.execute(UNRESOLVED_SQL, [SHARDED_QUANTITY_ERROR, RESERVED_QUANTITY_ERROR])
+        unresolved = cursor.fetchall()
+        if unresolved:
+            report['errors'].extend(
+                {'line': line, 'errors': {field: [message]}}
+                for line, field, message in unresolved
+            )
+            cursor.execute(
+                'DELETE FROM sweets_import WHERE line = ANY(%s)',
+                [[line for line, _, _ in unresolved]]
+            )
+
+        cursor.execute(MERGE_SQL, ['Other'])
+        report['created'], report['updated'] = cursor.fetchone()
+        # ON COMMIT DROP only fires at the outermost commit
+        cursor.execute('DROP TABLE sweets_import')
+
+        if report['created'] or report['updated']:
+            bump_catalog_version()
+
+    report['errors'].sort(key=lambda error: error['line'])
+    return report
+
+
+def _read_csv(text):
+    reader = csv.DictReader(text)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _read_ndjson(text):
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None
+            continue
+        yield number, record if isinstance(record, dict) else None
+
+
+def _batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _validate(batch, seen, errors):
+    """
+    Validate one batch with the rules of SweetSerializer
+
+    Like SweetSerializer(many=True), one serializer instance validates every
+    record of the batch. Errors are appended to `errors` and the valid
+    records are returned as staging rows. `seen` maps each id/name key to
+    the first line that used it, so a file cannot change one sweet twice.
+    """
+    serializer = SweetSerializer()
+    rows = []
+    for line, record in batch:
+        try:
+            if record is None:
+                raise serializers.ValidationError('Invalid JSON object')
+            sweet_id = _parse_id(record.get('id'))
+            # CSV gives empty strings for blank cells; treat them as missing
+            validated = serializer.run_validation(
+                {key: value for key, value in record.items() if value not in ('', None)}
+            )
+        except serializers.ValidationError as exc:
+            errors.append({'line': line, 'errors': serializers.as_serializer_error(exc)})
+            continue
+
+        key = ('id', sweet_id) if sweet_id is not None else ('name', validated['name'])
+        if key in seen:
+            errors.append({'line': line, 'errors': {key[0]: [f'Duplicate of line {seen[key]}']}})
+            continue
+        seen[key] = line
+
+        rows.append((
+            line,
+            sweet_id,
+            validated['name'],
+            validated.get('category'),
+            validated.get('description'),
+            validated['price'],
+            validated['quantity'],
+        ))
+    return rows
+
+
+def _parse_id(value):
+    if value in ('', None):
+        return None
+    try:
+        if isinstance(value, bool):
+            raise ValueError(value)
+        return int(value)
+    except (TypeError, ValueError):
+        raise serializers.ValidationError({'id': ['A valid integer is required.']})
+
+
+def _copy(cursor, rows):
+    """COPY validated rows into the staging table"""
+    buffer = io.StringIO()
+    # None is written as an empty unquoted value, which COPY reads as NULL
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(COPY_SQL, buffer)
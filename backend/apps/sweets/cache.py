@@ -0,0 +1,223 @@
+"""
+Catalog Cache
+Per-worker LRU of serialized catalog payloads (list/search pages, details)
+
+Entries are only valid for the catalog version they were built under. The
+version lives in one database row shared by every worker and is bumped after
+each committed catalog edit (name, price, category, description, sweets
+added or deleted), so one primary-key lookup per request is enough to know
+whether this worker's entries are still fresh.
+
+Stock changes do not bump it: a sale would otherwise make every writer
+queue on the version row and flush every worker's cache. Cached payloads
+are served with their stock fields (see fastpath.STOCK_FIELDS) read fresh
+by primary key from current_stock(). Reads whose rows depend on stock, such
+as facets and in-stock searches, are cached per stock_changed_at() (the
+latest updated_at of any sweet) instead, so a sale only misses those. The
+validators of every page include it too.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import CatalogVersion, Sweet
+
+CATALOG_VERSION_PK = 1
+
+
+def get_catalog_version():
+    """Current (version, changed_at) token of the catalog"""
+    row = (
+        CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK)
+        .values_list('version', 'changed_at')
+        .first()
+    )
+    if row is None:
+        catalog, _ = CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_PK)
+        row = (catalog.version, catalog.changed_at)
+    return row
+
+
+async def aget_catalog_version():
+    """get_catalog_version() for async views"""
+    row = await (
+        CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK)
+        .values_list('version', 'changed_at')
+        .afirst()
+    )
+    if row is None:
+        catalog, _ = await CatalogVersion.objects.aget_or_create(pk=CATALOG_VERSION_PK)
+        row = (catalog.version, catalog.changed_at)
+    return row
+
+
+def stock_changed_at():
+    """
+    When a sweet last changed, stock included: one probe of the end of
+    sweets_updated_at_id_idx
+    """
+    return Sweet.objects.aggregate(moment=Max('updated_at'))['moment']
+
+
+async def astock_changed_at():
+    """stock_changed_at() for async views"""
+    return (await Sweet.objects.aaggregate(moment=Max('updated_at')))['moment']
+
+
+def current_stock(ids):
+    """(quantity, reserved, updated_at) of the sweets `ids` that still exist, by id"""
+    return {
+        row[0]: row[1:]
+        for row in Sweet.objects.filter(pk__in=ids)
+        .values_list('id', 'quantity', 'reserved', 'updated_at')
+    }
+
+
+async def acurrent_stock(ids):
+    """current_stock() for async views"""
+    return {
+        row[0]: row[1:]
+        async for row in Sweet.objects.filter(pk__in=ids)
+        .values_list('id', 'quantity', 'reserved', 'updated_at')
+    }
+
+
+def bump_catalog_version():
+    """
+    Invalidate every worker's catalog cache, after a catalog edit (not a
+    stock change)
+
+    The bump runs after the surrounding transaction commits; bumping earlier
+    would let another worker cache pre-commit data under the new version.
+    """
+    transaction.on_commit(_bump)
+
+
+def _bump():
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK).update(
+        version=F('version') + 1,
+        changed_at=timezone.now()
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(
+            pk=CATALOG_VERSION_PK, defaults={'version': 1}
+        )
+
+
+class CatalogCache:
+    """
+    Size-capped LRU keyed by request, scoped to one catalog version
+
+    Sizes are measured as the JSON length of each payload, which tracks the
+    memory held closely enough to enforce a cap. A max_bytes of 0 disables
+    the cache without skipping any code paths in the views.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._version = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key, build, version=None):
+        """
+        Return the cached payload for `key`, calling build() on a miss
+
+        Callers that already read the catalog version may pass it in to save
+        the lookup.
+        """
+        if not self.max_bytes:
+            return build()
+
+        # Read the version before building, so a concurrent write can only
+        # make the stored payload newer than its version, never older
+        if version is None:
+            version = get_catalog_version()
+        entry = self._lookup(version, key)
+        if entry is not None:
+            return entry[0]
+
+        data = build()
+        self._store(version, key, data)
+        return data
+
+    async def aget_or_build(self, key, build, version=None):
+        """get_or_build() for async views, where build() is a coroutine"""
+        if not self.max_bytes:
+            return await build()
+
+        if version is None:
+            version = await aget_catalog_version()
+        entry = self._lookup(version, key)
+        if entry is not None:
+            return entry[0]
+
+        data = await build()
+        self._store(version, key, data)
+        return data
+
+    def _lookup(self, version, key):
+        """The (data, size) entry for `key`, or None on a miss"""
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def _store(self, version, key, data):
+        size = len(json.dumps(data, cls=DjangoJSONEncoder))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if version != self._version:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (data, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _reset(self, version):
+        self._entries.clear()
+        self._bytes = 0
+        self._version = version
+
+    def clear(self):
+        with self._lock:
+            self._reset(None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version[0] if self._version else None,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+catalog_cache = CatalogCache(getattr(settings, 'CATALOG_CACHE_MAX_BYTES', 32 * 1024 * 1024))
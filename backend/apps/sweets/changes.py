@@ -0,0 +1,153 @@
+"""
+Delta Sync
+Lets clients mirror the catalog by fetching only what changed since their
+last sync
+
+Changes are read in (changed_at, id) order from two range scans:
+- sweets created or updated after the watermark (sweets_updated_at_id_idx)
+- tombstones of sweets deleted after it (tombstones_deleted_at_idx)
+
+Each page ends with a watermark token for the next request. Changes from
+the last CHANGES_SETTLE_SECONDS are held back: a transaction stamps its
+rows before it commits, and without the delay a client could move its
+watermark past rows that only become visible afterwards.
+
+So the window only has to cover the time from a stamp to its commit,
+writers stamp rows they already hold: stock statements use
+clock_timestamp() (now() or a time from Python would be taken before the
+row lock, however long the wait), and admin edits lock the row before
+saving. A write whose transaction keeps running longer than
+CHANGES_SETTLE_SECONDS after stamping a row can still be missed.
+"""
+
+import base64
+import heapq
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .fastpath import SweetRowSerializer
+from .models import Sweet, SweetTombstone
+
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_PAGE_SIZE = 5000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidWatermark(ValueError):
+    """Raised when ?since= is neither a watermark token nor a timestamp"""
+
+
+class ExpiredWatermark(ValueError):
+    """Raised when tombstones older than the watermark have been purged"""
+
+
+def decode_watermark(value):
+    """
+    (changed_at, id) position of a ?since= value
+
+    Accepts a token from a previous response or an ISO 8601 timestamp.
+    Returns None when there is no value, meaning "from the beginning".
+    """
+    if not value:
+        return None
+
+    moment = parse_datetime(value)
+    if moment is not None:
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, dt_timezone.utc)
+        return moment, 0
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+        moment = parse_datetime(payload['t'])
+        position = (moment, int(payload['id']))
+    except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+        raise InvalidWatermark('Invalid since value')
+    if moment is None or timezone.is_naive(moment):
+        raise InvalidWatermark('Invalid since value')
+    return position
+
+
+def encode_watermark(position):
+    changed_at, sweet_id = position
+    payload = {'t': changed_at.isoformat(), 'id': sweet_id}
+    return base64.urlsafe_b64encode(
+        json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    ).decode('ascii')
+
+
+def tombstone_horizon():
+    """Deletions before this moment may have been purged"""
+    return timezone.now() - timedelta(days=settings.CHANGES_TOMBSTONE_RETENTION_DAYS)
+
+
+def settled_until():
+    """Changes up to this moment are visible to every reader"""
+    return timezone.now() - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+
+
+def changes_since(position, page_size=CHANGES_PAGE_SIZE, fields=None):
+    """
+    One page of changes after `position` (see decode_watermark)
+
+    Returns:
+        {'results': [<sweet>, ...],  # created or updated, as SweetSerializer
+         'deleted': [<id>, ...],
+         'next': '<token>',          # ?since= for the next request
+         'has_more': False}          # True: ask again straight away
+    """
+    if position is not None and position[0] < tombstone_horizon():
+        raise ExpiredWatermark(
+            'Watermark is older than the deletion history, sync again from scratch'
+        )
+
+    after = position or (EPOCH, 0)
+    until = settled_until()
+    ordering = ('updated_at', 'id')
+
+    rows = SweetRowSerializer(fields)
+    updated = rows.select(
+        changed_after(Sweet.objects.filter(updated_at__lte=until), 'updated_at', 'id', after),
+        ordering
+    ).order_by(*ordering)[:page_size + 1]
+
+    # A first sync has no deletions to learn about
+    deleted = []
+    if position is not None:
+        deleted = changed_after(
+            SweetTombstone.objects.filter(deleted_at__lte=until), 'deleted_at', 'sweet_id', after
+        ).order_by('deleted_at', 'sweet_id').values_list('deleted_at', 'sweet_id')[:page_size + 1]
+
+    changes = heapq.merge(
+        ((row.updated_at, row.id, row) for row in updated),
+        ((deleted_at, sweet_id, None) for deleted_at, sweet_id in deleted),
+        key=lambda change: change[:2],
+    )
+    page = []
+    has_more = False
+    for change in changes:
+        if len(page) == page_size:
+            has_more = True
+            break
+        page.append(change)
+
+    last = page[-1][:2] if page else after
+    return {
+        'results': rows.to_representation(row for _, _, row in page if row is not None),
+        'deleted': [sweet_id for _, sweet_id, row in page if row is None],
+        'next': encode_watermark(last),
+        'has_more': has_more,
+    }
+
+
+def changed_after(queryset, time_field, id_field, position):
+    """Rows strictly after `position` in (time_field, id_field) order"""
+    changed_at, sweet_id = position
+    return queryset.filter(**{f'{time_field}__gte': changed_at}).exclude(
+        **{time_field: changed_at, f'{id_field}__lte': sweet_id}
+    )
@@ -0,0 +1,68 @@
+"""
+Conditional Requests for the Catalog
+ETag / Last-Modified validators that are computed without serializing
+
+- list/search pages: catalog version + latest stock change + the full
+  request URL
+- a single sweet: its primary key + updated_at + the fields selected
+"""
+
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def catalog_validators(version, stock_changed_at, request):
+    """
+    (etag, last_modified) for a list or search page
+
+    Stock changes leave the catalog version alone, so the latest one
+    (stock_changed_at, None without sweets) is part of the validators too.
+    """
+    number, changed_at = version
+    if stock_changed_at is not None:
+        changed_at = max(changed_at, stock_changed_at)
+    etag = _strong_etag('page', number, changed_at.isoformat(), request.get_full_path())
+    return etag, changed_at
+
+
+def sweet_validators(pk, updated_at, fields=None):
+    """
+    (etag, last_modified) for one sweet, rendered with `fields` (None for
+    every field)
+
+    The fields are rendered in serializer order whatever order they were
+    asked for in, so the etag does not depend on it.
+    """
+    parts = ['sweet', pk, updated_at.isoformat()]
+    if fields is not None:
+        parts.append(','.join(sorted(fields)))
+    return _strong_etag(*parts), updated_at
+
+
+def evaluate_preconditions(request, etag, last_modified):
+    """
+    Check If-None-Match / If-Modified-Since / If-Match / If-Unmodified-Since
+
+    Returns a 304 or 412 response when a precondition decides the request,
+    otherwise None.
+    """
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()),
+    )
+
+
+def set_validators(response, etag, last_modified):
+    """Attach validators, and make clients revalidate instead of guessing"""
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _strong_etag(*parts):
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8'))
+    return quote_etag(digest.hexdigest())
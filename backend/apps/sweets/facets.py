@@ -0,0 +1,80 @@
+"""
+Catalog Facets
+Category counts, stock counts and a price histogram for a filter set
+
+Every number comes from one aggregate query: each facet value is a
+COUNT(*) FILTER (WHERE ...) over the filtered rows.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Q
+
+from .models import Sweet
+from .search import IN_STOCK, OUT_OF_STOCK
+
+# Lower edges of the price histogram buckets; the last bucket is open ended
+PRICE_BUCKETS = (
+    Decimal('0.00'),
+    Decimal('1.00'),
+    Decimal('2.00'),
+    Decimal('5.00'),
+    Decimal('10.00'),
+    Decimal('20.00'),
+)
+
+
+def facet_counts(queryset):
+    """
+    Facets of a (filtered) Sweet queryset
+
+    Returns:
+        {'total': 12,
+         'categories': [{'value': 'Chocolate', 'count': 4}, ...],
+         'stock': {'in_stock': 9, 'out_of_stock': 3},
+         'price': {'min': '0.50', 'max': '12.00',
+                   'histogram': [{'min': '0.00', 'max': '1.00', 'count': 2}, ...]}}
+    Every category and bucket is listed, including those with no sweets.
+    """
+    categories = [value for value, _label in Sweet.CATEGORY_CHOICES]
+    buckets = list(zip(PRICE_BUCKETS, (*PRICE_BUCKETS[1:], None)))
+
+    aggregates = {
+        'total': Count('id'),
+        'in_stock': Count('id', filter=IN_STOCK),
+        'out_of_stock': Count('id', filter=OUT_OF_STOCK),
+        'min_price': Min('price'),
+        'max_price': Max('price'),
+    }
+    for index, value in enumerate(categories):
+        aggregates[f'category_{index}'] = Count('id', filter=Q(category=value))
+    for index, (low, high) in enumerate(buckets):
+        in_bucket = Q(price__gte=low) if high is None else Q(price__gte=low, price__lt=high)
+        aggregates[f'bucket_{index}'] = Count('id', filter=in_bucket)
+
+    row = queryset.order_by().aggregate(**aggregates)
+
+    return {
+        'total': row['total'],
+        'categories': [
+            {'value': value, 'count': row[f'category_{index}']}
+            for index, value in enumerate(categories)
+        ],
+        'stock': {
+            'in_stock': row['in_stock'],
+            'out_of_stock': row['out_of_stock'],
+        },
+        'price': {
+            'min': _price(row['min_price']),
+            'max': _price(row['max_price']),
+            'histogram': [
+                {'min': _price(low), 'max': _price(high), 'count': row[f'bucket_{index}']}
+                for index, (low, high) in enumerate(buckets)
+            ],
+        },
+    }
+
+
+def _price(value):
+    # Same string form as SweetSerializer's prices
+    return None if value is None else f'{value:.2f}'
@@ -0,0 +1,117 @@
+"""
+Read-only Fast Path for Sweet Lists
+Renders list/search pages from `.values_list()` rows instead of model
+instances run through SweetSerializer(many=True)
+
+The output is the same JSON, byte for byte: fields in SweetSerializer.Meta
+order, prices as two-place strings and datetimes as ISO 8601 in the current
+time zone with UTC written as 'Z'.
+"""
+
+from operator import itemgetter
+
+from django.utils import timezone
+
+from .projections import columns_for
+from .serializers import SweetSerializer
+
+# Fields that change with stock rather than with catalog edits, which the
+# catalog cache serves from current_stock() instead of its stored payload
+STOCK_FIELDS = ('quantity', 'is_in_stock', 'updated_at')
+
+
+def _price(value):
+    # numeric(10, 2) comes back already quantized to two places
+    return f'{value:f}'
+
+
+def _datetime_formatter(tz):
+    def convert(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+class SweetRowSerializer:
+    """
+    Turns sweet rows into the dicts SweetSerializer would produce
+
+    Usage:
+        rows = SweetRowSerializer(fields)
+        page = paginator.paginate_queryset(rows.select(queryset, ordering), ...)
+        data = rows.to_representation(page)
+    """
+
+    def __init__(self, fields=None):
+        self.fields = tuple(
+            name for name in SweetSerializer.Meta.fields
+            if fields is None or name in fields
+        )
+        self.columns = columns_for(self.fields)
+
+    def select(self, queryset, ordering=()):
+        """
+        Named-tuple rows of the rendered columns plus any ordering columns
+        (such as the search rank) the cursor paginator needs to read back
+        """
+        extra = [
+            name for name in (field.lstrip('-') for field in ordering)
+            if name not in self.columns
+        ]
+        return queryset.values_list(*self.columns, *extra, named=True)
+
+    def to_representation(self, rows):
+        getters = self._getters()
+        return [{name: get(row) for name, get in getters} for row in rows]
+
+    def iter_representation(self, rows):
+        """to_representation() one row at a time, for streaming responses"""
+        getters = self._getters()
+        for row in rows:
+            yield {name: get(row) for name, get in getters}
+
+    def _getters(self):
+        """(field name, row -> value) pairs, in serializer field order"""
+        position = {column: index for index, column in enumerate(self.columns)}
+        datetime = _datetime_formatter(timezone.get_current_timezone())
+
+        getters = []
+        for name in self.fields:
+            if name == 'is_in_stock':
+                get = _in_stock(position['quantity'], position['reserved'])
+            elif name == 'price':
+                get = _computed(_price, position[name])
+            elif name in ('created_at', 'updated_at'):
+                get = _computed(datetime, position[name])
+            else:
+                get = itemgetter(position[name])
+            getters.append((name, get))
+        return getters
+
+
+def with_stock(item, stock):
+    """
+    A copy of a rendered sweet with the STOCK_FIELDS it has taken from
+    `stock`, a (quantity, reserved, updated_at) row of current_stock()
+
+    Returns the item itself when `stock` is None (the sweet is gone).
+    """
+    if stock is None:
+        return item
+    quantity, reserved, updated_at = stock
+    fresh = {
+        'quantity': quantity,
+        'is_in_stock': quantity - reserved > 0,
+        'updated_at': _datetime_formatter(timezone.get_current_timezone())(updated_at),
+    }
+    return {name: fresh[name] if name in fresh else value for name, value in item.items()}
+
+
+def _computed(convert, index):
+    return lambda row: convert(row[index])
+
+
+def _in_stock(quantity, reserved):
+    return lambda row: row[quantity] - row[reserved] > 0
@@ -0,0 +1,241 @@
+"""
+Benchmark catalog reads under sync (WSGI) and async (ASGI) workers
+
+Seeds a catalog, then serves it twice with gunicorn and the same number of
+workers, once per SERVER_MODE (see gunicorn.conf.py), and drives each with
+--clients concurrent keep-alive connections for --seconds. Requests mix
+list pages, searches and single sweets, with the catalog cache disabled so
+every request reaches the database.
+
+Reports throughput, latency percentiles and how many queries were running
+in the database at once (sampled from pg_stat_activity): the concurrency
+each mode actually achieved.
+
+--db-latency-ms puts a proxy between the servers and PostgreSQL that delays
+every reply, like a database across a network. Sync workers sit idle for
+each round trip; async workers serve other requests meanwhile.
+
+The servers are separate processes, so the catalog is committed; the
+seeded sweets are deleted again at the end.
+
+Usage:
+    python manage.py bench_async --rows 100000 --clients 200 --seconds 20
+    python manage.py bench_async --clients 200 --db-latency-ms 20
+"""
+
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.sweets.benchmarks import (
+    FLAVOURS,
+    SHAPES,
+    free_port,
+    seed_sweets,
+    summarize,
+    wait_for_port,
+)
+from apps.sweets.models import Sweet
+
+MODES = ('wsgi', 'asgi')
+
+ACTIVE_QUERIES_SQL = """
+    SELECT count(*) FROM pg_stat_activity
+    WHERE datname = current_database() AND state = 'active' AND pid <> pg_backend_pid()
+"""
+
+
+class Command(BaseCommand):
+    help = 'Compare catalog read latency and concurrency under WSGI and ASGI workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--seconds', type=float, default=20)
+        parser.add_argument('--workers', type=int, default=3)
+        parser.add_argument('--db-latency-ms', type=float, default=0)
+
+    def handle(self, *args, **options):
+        first_new_id = (Sweet.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        seed_sweets(options['rows'], offset=Sweet.objects.count())
+        user = get_user_model().objects.create_user(
+            email='bench-async@example.com', username='bench-async', password='bench-async'
+        )
+        token = str(RefreshToken.for_user(user).access_token)
+        ids = list(
+            Sweet.objects.filter(id__gte=first_new_id).values_list('id', flat=True)[:1000]
+        )
+
+        results = {}
+        try:
+            for mode in MODES:
+                results[mode] = self.run_mode(mode, token, ids, options)
+        finally:
+            user.delete()
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM sweets WHERE id >= %s', [first_new_id])
+
+        self.stdout.write(
+            f"rows={options['rows']:,} clients={options['clients']} "
+            f"workers={options['workers']} seconds={options['seconds']:g} "
+            f"db latency={options['db_latency_ms']:g}ms"
+        )
+        self.stdout.write(
+            f"{'mode':<6}{'req/s':>9}{'errors':>8}{'p50 ms':>9}{'p99 ms':>9}"
+            f"{'max ms':>9}{'db active avg':>15}{'max':>5}"
+        )
+        for mode, (count, errors, latency, active) in results.items():
+            self.stdout.write(
+                f"{mode:<6}{count / options['seconds']:>9.0f}{errors:>8}"
+                f"{latency['p50']:>9.1f}{latency['p99']:>9.1f}{latency['max']:>9.1f}"
+                f"{active['mean']:>15.1f}{active['max']:>5.0f}"
+            )
+
+    def run_mode(self, mode, token, ids, options):
+        return asyncio.run(self.serve_and_load(mode, token, ids, options))
+
+    async def serve_and_load(self, mode, token, ids, options):
+        database = {}
+        proxy = None
+        if options['db_latency_ms']:
+            proxy = await _latency_proxy(options['db_latency_ms'] / 1000)
+            database = {'DB_HOST': '127.0.0.1', 'DB_PORT': str(proxy.sockets[0].getsockname()[1])}
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+             '--bind', f'127.0.0.1:{port}', '--backlog', '4096', '--log-level', 'warning'],
+            env={
+                **os.environ,
+                'SERVER_MODE': mode,
+                'WEB_CONCURRENCY': str(options['workers']),
+                'ALLOWED_HOSTS': 'localhost',
+                'CATALOG_CACHE_MAX_BYTES': '0',
+                **database,
+            },
+            cwd=settings.BASE_DIR,
+        )
+        try:
+            await asyncio.to_thread(wait_for_port, port)
+            return await self.load(port, token, ids, options)
+        finally:
+            server.terminate()
+            await asyncio.to_thread(server.wait)
+            if proxy is not None:
+                proxy.close()
+
+    async def load(self, port, token, ids, options):
+        rng = random.Random(11)
+        deadline = time.perf_counter() + options['seconds']
+        latencies = []
+        errors = 0
+
+        def next_path():
+            pick = rng.random()
+            if pick < 0.4:
+                return f'/api/sweets/?page_size=20&category={rng.choice(["Chocolate", "Gummy", "Other"])}'
+            if pick < 0.7:
+                return f'/api/sweets/search/?q={rng.choice(FLAVOURS)}+{rng.choice(SHAPES)}'
+            return f'/api/sweets/{rng.choice(ids)}/'
+
+        async def client():
+            nonlocal errors
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    writer.write(
+                        f'GET {next_path()} HTTP/1.1\r\nHost: localhost\r\n'
+                        f'Authorization: Bearer {token}\r\n\r\n'.encode('ascii')
+                    )
+                    status_code, keep_alive = await _read_response(reader)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if status_code != 200:
+                        errors += 1
+                    if not keep_alive:
+                        writer.close()
+                        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            finally:
+                writer.close()
+
+        active = []
+
+        async def sample_database():
+            while time.perf_counter() < deadline:
+                active.append(await asyncio.to_thread(_active_queries))
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(sample_database(), *(client() for _ in range(options['clients'])))
+        if not latencies:
+            raise CommandError('No requests completed')
+        return len(latencies), errors, summarize(latencies), summarize(active)
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise CommandError('Server closed the connection')
+    status_code = int(status_line.split()[1])
+    length, keep_alive = 0, True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection' and value.strip().lower() == 'close':
+            keep_alive = False
+    await reader.readexactly(length)
+    return status_code, keep_alive
+
+
+def _active_queries():
+    with connection.cursor() as cursor:
+        cursor.execute(ACTIVE_QUERIES_SQL)
+        return cursor.fetchone()[0]
+
+
+async def _latency_proxy(delay):
+    """
+    A TCP server forwarding to this project's PostgreSQL, delivering each
+    reply `delay` seconds late (without delaying the replies behind it)
+    """
+    params = connection.get_connection_params()
+    host, port = params.get('host') or 'localhost', params.get('port') or 5432
+
+    async def pipe(reader, writer, late):
+        loop = asyncio.get_running_loop()
+        try:
+            while data := await reader.read(65536):
+                if late:
+                    loop.call_later(delay, writer.write, data)
+                else:
+                    writer.write(data)
+        finally:
+            loop.call_later(delay if late else 0, writer.close)
+
+    async def handle(client_reader, client_writer):
+        if host.startswith('/'):
+            upstream = await asyncio.open_unix_connection(f'{host}/.s.PGSQL.{port}')
+        else:
+            upstream = await asyncio.open_connection(host, port)
+        upstream_reader, upstream_writer = upstream
+        await asyncio.gather(
+            pipe(client_reader, upstream_writer, late=False),
+            pipe(upstream_reader, client_writer, late=True),
+            return_exceptions=True,
+        )
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
@@ -0,0 +1,65 @@
+"""
+Benchmark autocomplete lookups against the icontains search they replace
+
+Seeds a catalog, builds the in-memory name index and times top-10 prefix
+lookups for 1-4 character prefixes, next to the database query behind
+/api/sweets/search/?name=<prefix>.
+
+Usage:
+    python manage.py bench_autocomplete --rows 100000 --lookups 5000
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.sweets.autocomplete import NameIndex
+from apps.sweets.benchmarks import FLAVOURS, SHAPES, measure, seed_sweets, summarize
+from apps.sweets.models import Sweet
+
+
+class Command(BaseCommand):
+    help = 'Time in-memory autocomplete lookups against the icontains search query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--lookups', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        words = FLAVOURS + SHAPES
+        prefixes = [
+            rng.choice(words)[:rng.randint(1, 4)] for _ in range(options['lookups'])
+        ]
+
+        with transaction.atomic():
+            seed_sweets(options['rows'], offset=Sweet.objects.count())
+
+            index = NameIndex(refresh_seconds=3600)
+            start = time.perf_counter()
+            index.load()
+            load_seconds = time.perf_counter() - start
+
+            samples = []
+            for prefix in prefixes:
+                start = time.perf_counter()
+                index.suggest(prefix, limit=10)
+                samples.append((time.perf_counter() - start) * 1000)
+            memory = summarize(samples)
+
+            database = measure(
+                lambda: list(
+                    Sweet.objects.filter(name__icontains=rng.choice(prefixes))
+                    .values_list('id', 'name')[:10]
+                ),
+                repeat=50
+            )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"rows={options['rows']:,} index built in {load_seconds:.2f}s")
+        self.stdout.write(f"{'':<16}{'p50 ms':>10}{'p99 ms':>10}")
+        for label, stats in (('in-memory index', memory), ('icontains query', database)):
+            self.stdout.write(f"{label:<16}{stats['p50']:>10.4f}{stats['p99']:>10.4f}")
@@ -0,0 +1,95 @@
+"""
+Benchmark bulk writes against looping over the single-item endpoints
+
+Creates, updates and deletes N sweets (default 1,000) through the API, once
+with one request per sweet and once with one /api/sweets/bulk/ request per
+operation. Runs in-process through the test client, so the numbers exclude
+network round trips, which would only widen the gap.
+
+Usage:
+    python manage.py bench_bulk --items 1000
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from apps.authentication.models import User
+
+
+class Command(BaseCommand):
+    help = 'Compare bulk create/update/delete with looped single-item requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = options['items']
+
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            client = APIClient()
+            client.force_authenticate(user=User.objects.create_user(
+                email='bench-admin@example.com',
+                username='bench-admin',
+                password='bench',
+                is_admin=True
+            ))
+
+            looped = self.run_looped(client, count)
+            bulk = self.run_bulk(client, count)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{count:,} items   {'looped':>10}{'bulk':>10}{'speedup':>10}")
+        for operation in ('create', 'update', 'delete'):
+            self.stdout.write(
+                f"{operation:<14}{looped[operation]:>9.2f}s{bulk[operation]:>9.2f}s"
+                f"{looped[operation] / bulk[operation]:>9.1f}x"
+            )
+
+    def items(self, prefix, count):
+        return [
+            {'name': f'{prefix} {i}', 'category': 'Gummy', 'price': '1.00', 'quantity': i}
+            for i in range(count)
+        ]
+
+    def run_looped(self, client, count):
+        timings = {}
+        start = time.perf_counter()
+        ids = [
+            client.post('/api/sweets/', item, format='json').data['id']
+            for item in self.items('Looped', count)
+        ]
+        timings['create'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for pk, item in zip(ids, self.items('Looped', count)):
+            client.put(f'/api/sweets/{pk}/', {**item, 'price': '1.10'}, format='json')
+        timings['update'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for pk in ids:
+            client.delete(f'/api/sweets/{pk}/')
+        timings['delete'] = time.perf_counter() - start
+        return timings
+
+    def run_bulk(self, client, count):
+        timings = {}
+        start = time.perf_counter()
+        response = client.post('/api/sweets/bulk/', self.items('Bulk', count), format='json')
+        ids = [item['id'] for item in response.data]
+        timings['create'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        client.patch(
+            '/api/sweets/bulk/', [{'id': pk, 'price': '1.10'} for pk in ids], format='json'
+        )
+        timings['update'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        client.delete('/api/sweets/bulk/', {'ids': ids}, format='json')
+        timings['delete'] = time.perf_counter() - start
+        return timings
@@ -0,0 +1,101 @@
+"""
+Benchmark catalog read throughput with and without the catalog cache
+
+Drives SweetViewSet directly (no HTTP server) with a read mix of list pages,
+detail lookups and searches, first with the cache disabled, then enabled.
+
+Usage:
+    python manage.py bench_catalog_cache --rows 100000 --requests 2000
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.authentication.models import User
+from apps.sweets.benchmarks import seed_sweets
+from apps.sweets.cache import catalog_cache
+from apps.sweets.models import Sweet
+from apps.sweets.views import SweetViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare catalog read throughput with the catalog cache off and on'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--hot-keys',
+            type=int,
+            default=200,
+            help='Number of distinct detail ids in the read mix'
+        )
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        user = User(email='bench@example.com', username='bench')
+        views = {
+            'list': SweetViewSet.as_view({'get': 'list'}),
+            'retrieve': SweetViewSet.as_view({'get': 'retrieve'}),
+            'search': SweetViewSet.as_view({'get': 'search'}),
+        }
+
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            seed_sweets(options['rows'], offset=Sweet.objects.count())
+            ids = list(
+                Sweet.objects.order_by('?').values_list('id', flat=True)[:options['hot_keys']]
+            )
+            rng = random.Random(42)
+            mix = [self.pick(rng, ids) for _ in range(options['requests'])]
+
+            def run():
+                for name, path, kwargs in mix:
+                    request = factory.get(path)
+                    force_authenticate(request, user=user)
+                    views[name](request, **kwargs).render()
+
+            max_bytes = catalog_cache.max_bytes
+            try:
+                catalog_cache.max_bytes = 0
+                uncached = self.timed(run)
+
+                catalog_cache.max_bytes = max_bytes or 32 * 1024 * 1024
+                catalog_cache.clear()
+                run()  # warm up
+                cached = self.timed(run)
+                stats = catalog_cache.stats()
+            finally:
+                catalog_cache.max_bytes = max_bytes
+                catalog_cache.clear()
+
+            transaction.set_rollback(True)
+
+        total = len(mix)
+        self.stdout.write(f"rows={options['rows']} requests={total}")
+        self.stdout.write(f'uncached: {total / uncached:>10,.0f} req/s')
+        self.stdout.write(f'cached:   {total / cached:>10,.0f} req/s')
+        self.stdout.write(f'speedup:  {uncached / cached:>10.1f}x')
+        self.stdout.write(
+            f"cache: {stats['entries']} entries, {stats['bytes']:,} bytes, "
+            f"{stats['hits']} hits / {stats['misses']} misses / "
+            f"{stats['evictions']} evictions"
+        )
+
+    def pick(self, rng, ids):
+        roll = rng.random()
+        if roll < 0.4:
+            return 'list', '/api/sweets/', {}
+        if roll < 0.8:
+            pk = rng.choice(ids)
+            return 'retrieve', f'/api/sweets/{pk}/', {'pk': str(pk)}
+        return 'search', '/api/sweets/search/?q=chocolate&max_price=10', {}
+
+    def timed(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
@@ -0,0 +1,60 @@
+"""
+Benchmark payload size and latency of sparse fieldsets
+
+Fetches, serializes and renders a 1,000-item page with the full
+representation, the card projection and a minimal ?fields= selection.
+
+Usage:
+    python manage.py bench_projection --rows 100000 --page 1000
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from apps.sweets.benchmarks import measure, seed_sweets
+from apps.sweets.models import Sweet
+from apps.sweets.projections import PROJECTIONS, columns_for
+from apps.sweets.serializers import SweetSerializer
+
+VARIANTS = [
+    ('full', None),
+    ('view=card', PROJECTIONS['card']),
+    ('fields=id,name,price,quantity', ('id', 'name', 'price', 'quantity')),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare payload bytes and latency of full vs projected sweet pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--page', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+
+        with transaction.atomic():
+            seed_sweets(options['rows'], offset=Sweet.objects.count())
+
+            baseline = None
+            self.stdout.write(f"{'variant':<32}{'bytes':>10}{'p50 ms':>10}{'p95 ms':>10}")
+            for label, fields in VARIANTS:
+                def render():
+                    queryset = Sweet.objects.defer('search_vector')
+                    if fields:
+                        queryset = queryset.only(*columns_for(fields))
+                    page = queryset.order_by('name', 'id')[:options['page']]
+                    return renderer.render(SweetSerializer(page, many=True, fields=fields).data)
+
+                size = len(render())
+                stats = measure(render, repeat=options['repeat'])
+                baseline = baseline or (size, stats['p50'])
+                self.stdout.write(
+                    f"{label:<32}{size:>10,}{stats['p50']:>10.2f}{stats['p95']:>10.2f}"
+                    f"   ({100 * (1 - size / baseline[0]):.0f}% smaller,"
+                    f" {100 * (1 - stats['p50'] / baseline[1]):.0f}% faster)"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,80 @@
+"""
+Benchmark the search engine against the legacy icontains filter
+
+Usage:
+    python manage.py bench_search --rows 10000,100000,1000000 --repeat 20
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.sweets.benchmarks import index_exists, measure, seed_sweets
+from apps.sweets.models import Sweet
+from apps.sweets.search import search_sweets
+
+TERMS = ['chocolate', 'lemon drops', 'ramel', 'hint of ginger']
+
+
+class Command(BaseCommand):
+    help = 'Compare first-page search latency: full-text + trigram vs name__icontains'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            default='10000,100000,1000000',
+            help='Comma separated catalog sizes to benchmark'
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Commit the seeded rows instead of rolling them back'
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['rows'].split(','))
+        page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+
+        if not index_exists('sweets_name_trgm'):
+            self.stdout.write(self.style.WARNING(
+                'sweets_name_trgm is missing; run migrations for realistic numbers'
+            ))
+
+        self.stdout.write(
+            f"{'rows':>9}  {'term':<16}{'icontains p50/p95 ms':>22}"
+            f"{'search p50/p95 ms':>22}{'speedup':>9}"
+        )
+
+        with transaction.atomic():
+            seeded = Sweet.objects.count()
+            for size in sizes:
+                if size > seeded:
+                    seed_sweets(size - seeded, offset=seeded)
+                    seeded = size
+
+                for term in TERMS:
+                    legacy = measure(
+                        lambda: list(
+                            Sweet.objects.filter(name__icontains=term)
+                            .order_by('name', 'id')[:page_size + 1]
+                        ),
+                        repeat=options['repeat']
+                    )
+                    engine = measure(
+                        lambda: self.run_search(term, page_size),
+                        repeat=options['repeat']
+                    )
+                    self.stdout.write(
+                        f'{size:>9}  {term:<16}'
+                        f"{legacy['p50']:>12.2f} / {legacy['p95']:<7.2f}"
+                        f"{engine['p50']:>12.2f} / {engine['p95']:<7.2f}"
+                        f"{legacy['p50'] / engine['p50']:>8.1f}x"
+                    )
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def run_search(self, term, page_size):
+        queryset, ordering = search_sweets(Sweet.objects.all(), {'q': term})
+        return list(queryset.order_by(*ordering)[:page_size + 1])
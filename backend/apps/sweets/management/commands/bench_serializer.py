@@ -0,0 +1,61 @@
+"""
+Benchmark the values_list() read fast path against SweetSerializer
+
+Times fetching, serializing and rendering 100, 1,000 and 10,000 sweets
+with SweetSerializer(many=True) and with SweetRowSerializer, after checking
+both produce identical JSON.
+
+Usage:
+    python manage.py bench_serializer --sizes 100 1000 10000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from apps.sweets.benchmarks import measure, seed_sweets
+from apps.sweets.fastpath import SweetRowSerializer
+from apps.sweets.models import Sweet
+from apps.sweets.serializers import SweetSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare SweetSerializer(many=True) with the values_list() fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        sizes = options['sizes']
+
+        with transaction.atomic():
+            missing = max(sizes) - Sweet.objects.count()
+            if missing > 0:
+                seed_sweets(missing, offset=Sweet.objects.count())
+
+            self.stdout.write(
+                f"{'rows':>8}{'serializer p50':>18}{'fast path p50':>18}{'speedup':>10}"
+            )
+            for size in sizes:
+                queryset = Sweet.objects.defer('search_vector').order_by('name', 'id')[:size]
+                rows = SweetRowSerializer()
+
+                def serializer():
+                    return renderer.render(SweetSerializer(queryset, many=True).data)
+
+                def fast_path():
+                    return renderer.render(rows.to_representation(rows.select(queryset)))
+
+                if serializer() != fast_path():
+                    raise CommandError(f'Outputs differ at {size} rows')
+
+                slow = measure(serializer, repeat=options['repeat'])
+                fast = measure(fast_path, repeat=options['repeat'])
+                self.stdout.write(
+                    f"{size:>8,}{slow['p50']:>15.2f} ms{fast['p50']:>15.2f} ms"
+                    f"{slow['p50'] / fast['p50']:>9.1f}x"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,172 @@
+"""
+Load-test the live stock stream with many concurrent subscribers
+
+Starts the ASGI app under uvicorn in a subprocess, opens --subscribers SSE
+connections to /api/sweets/stream/, then restocks one sweet --updates
+times and measures how long each update takes to reach every subscriber
+(from just before the restock commits to the event arriving).
+
+Unlike the other benchmarks this one has to commit: NOTIFY is only sent
+when a transaction commits. The sweet and user it creates are deleted
+afterwards.
+
+Usage:
+    python manage.py bench_stream --subscribers 5000 --updates 20
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.inventory import services
+from apps.sweets.benchmarks import free_port, summarize, wait_for_port
+from apps.sweets.models import Sweet, SweetTombstone
+
+# Connections opened at once while subscribing
+CONNECT_CONCURRENCY = 200
+
+DELIVERY_TIMEOUT_SECONDS = 30
+
+
+class Subscriber:
+    """One SSE connection, noting when each stock event arrives"""
+
+    def __init__(self, delivered):
+        self.arrivals = []
+        self.delivered = delivered
+        self.task = None
+
+    async def connect(self, port, token):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', port)
+        self.writer.write(
+            f'GET /api/sweets/stream/?token={token} HTTP/1.1\r\n'
+            f'Host: localhost\r\nAccept: text/event-stream\r\n\r\n'.encode('ascii')
+        )
+        status_line = await self.reader.readline()
+        if b' 200 ' not in status_line:
+            raise CommandError(f'Stream refused: {status_line.decode().strip()}')
+        # Headers, then the retry hint
+        while b'retry:' not in await self.reader.readuntil(b'\n\n'):
+            pass
+        self.task = asyncio.create_task(self.listen())
+
+    async def listen(self):
+        while True:
+            message = await self.reader.readuntil(b'\n\n')
+            if b'event: stock' in message:
+                self.arrivals.append(time.perf_counter())
+                self.delivered(len(self.arrivals))
+
+    def close(self):
+        self.task.cancel()
+        self.writer.close()
+
+
+class Command(BaseCommand):
+    help = 'Measure fan-out latency of /api/sweets/stream/ with many subscribers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=5000)
+        parser.add_argument('--updates', type=int, default=20)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            email='bench-stream@example.com', username='bench-stream', password='bench-stream'
+        )
+        sweet = Sweet.objects.create(
+            name='Bench Stream Sweet', price=Decimal('1.00'), quantity=0
+        )
+        token = str(RefreshToken.for_user(user).access_token)
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'sweet_shop.asgi:application',
+             '--port', str(port), '--log-level', 'warning', '--backlog', '4096'],
+            env={**os.environ, 'ALLOWED_HOSTS': 'localhost'},
+        )
+        try:
+            wait_for_port(port)
+            result = asyncio.run(self.run(port, token, sweet.id, server.pid, options))
+        finally:
+            server.terminate()
+            server.wait()
+            SweetTombstone.objects.filter(sweet_id=sweet.id).delete()
+            sweet.delete()
+            SweetTombstone.objects.filter(sweet_id=sweet.id).delete()
+            user.delete()
+
+        self.report(options, *result)
+
+    async def run(self, port, token, sweet_id, server_pid, options):
+        # Subscribers still waiting for each update, and who to wake once it is everywhere
+        waiting = {}
+        done = {}
+
+        def delivered(update):
+            waiting[update] = waiting.get(update, len(subscribers)) - 1
+            if waiting[update] == 0:
+                done[update].set()
+
+        subscribers = [Subscriber(delivered) for _ in range(options['subscribers'])]
+        idle_rss = _rss_kb(server_pid)
+
+        limit = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+        async def connect(subscriber):
+            async with limit:
+                await subscriber.connect(port, token)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(connect(subscriber) for subscriber in subscribers))
+        connect_seconds = time.perf_counter() - start
+        memory_kb = _rss_kb(server_pid) - idle_rss
+
+        restock = sync_to_async(services.restock)
+        latencies, slowest = [], []
+        for update in range(1, options['updates'] + 1):
+            done[update] = asyncio.Event()
+            sent = time.perf_counter()
+            await restock(sweet_id, 1)
+            try:
+                await asyncio.wait_for(done[update].wait(), DELIVERY_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise CommandError(f'Update {update} did not reach every subscriber')
+            arrivals = [(s.arrivals[update - 1] - sent) * 1000 for s in subscribers]
+            latencies.extend(arrivals)
+            slowest.append(max(arrivals))
+
+        for subscriber in subscribers:
+            subscriber.close()
+        return connect_seconds, memory_kb, summarize(latencies), summarize(slowest)
+
+    def report(self, options, connect_seconds, memory_kb, latency, slowest):
+        subscribers = options['subscribers']
+        self.stdout.write(
+            f"subscribers={subscribers:,} connected in {connect_seconds:.2f}s, "
+            f"server memory +{memory_kb / 1024:.1f} MiB "
+            f"({memory_kb / max(subscribers, 1):.1f} KiB per subscriber)"
+        )
+        self.stdout.write(f"updates={options['updates']}")
+        self.stdout.write(f"{'':<28}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for label, stats in (
+            ('commit -> each subscriber', latency),
+            ('commit -> last subscriber', slowest),
+        ):
+            self.stdout.write(
+                f"{label:<28}{stats['p50']:>10.2f}{stats['p99']:>10.2f}{stats['max']:>10.2f}"
+            )
+
+
+def _rss_kb(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
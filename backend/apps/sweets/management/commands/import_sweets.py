@@ -0,0 +1,46 @@
+"""
+Import a CSV or NDJSON catalog file
+
+Same rules and report as POST /api/sweets/import/.
+
+Usage:
+    python manage.py import_sweets supplier.csv
+    python manage.py import_sweets catalog.jsonl --type ndjson
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sweets.bulk_import import IMPORT_FORMATS, InvalidImportFile, import_sweets
+
+
+class Command(BaseCommand):
+    help = 'Create or update sweets from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--type', choices=IMPORT_FORMATS, default=None,
+                            help='File format (default: from the file extension)')
+        parser.add_argument('--show-errors', type=int, default=20,
+                            help='How many row errors to print')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        name = options['type'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+
+        try:
+            with open(path, 'rb') as stream:
+                report = import_sweets(stream, name)
+        except (OSError, InvalidImportFile) as exc:
+            raise CommandError(str(exc))
+
+        errors = report['errors']
+        self.stdout.write(
+            f"Processed {report['processed']} rows: {report['created']} created, "
+            f"{report['updated']} updated, {len(errors)} rejected"
+        )
+        for error in errors[:options['show_errors']]:
+            self.stdout.write(f"  line {error['line']}: {json.dumps(error['errors'])}")
+        if len(errors) > options['show_errors']:
+            self.stdout.write(f"  ... and {len(errors) - options['show_errors']} more")
@@ -0,0 +1,22 @@
+"""
+Purge delta sync tombstones older than CHANGES_TOMBSTONE_RETENTION_DAYS
+
+Clients whose watermark is older than that are told to sync from scratch,
+so the tombstones are no longer needed. Run daily, e.g. from cron.
+
+Usage:
+    python manage.py purge_tombstones
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.sweets.changes import tombstone_horizon
+from apps.sweets.models import SweetTombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete tombstones older than the delta sync retention period'
+
+    def handle(self, *args, **options):
+        deleted, _ = SweetTombstone.objects.filter(deleted_at__lt=tombstone_horizon()).delete()
+        self.stdout.write(f'Purged {deleted} tombstones')
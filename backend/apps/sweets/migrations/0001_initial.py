@@ -0,0 +1,35 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:45
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sweet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of the sweet', max_length=200)),
+                ('category', models.CharField(choices=[('Chocolate', 'Chocolate'), ('Gummy', 'Gummy'), ('Hard Candy', 'Hard Candy'), ('Lollipop', 'Lollipop'), ('Sour', 'Sour'), ('Other', 'Other')], default='Other', help_text='Category of the sweet', max_length=50)),
+                ('description', models.TextField(blank=True, help_text='Detailed description of the sweet')),
+                ('price', models.DecimalField(decimal_places=2, help_text='Price per unit', max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('quantity', models.IntegerField(default=0, help_text='Current quantity in stock', validators=[django.core.validators.MinValueValidator(0)])),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sweet',
+                'verbose_name_plural': 'Sweets',
+                'db_table': 'sweets',
+                'ordering': ['name', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sweets', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='sweet',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('name', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='sweet',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='sweets_search_vector_gin'),
+        ),
+        # Serves the substring fallback, which Django renders as
+        # UPPER("name"::text) LIKE UPPER('%term%'). Kept out of Sweet.Meta so
+        # that test databases built without migrations do not need pg_trgm.
+        migrations.RunSQL(
+            sql='CREATE INDEX sweets_name_trgm ON sweets USING gin (UPPER(name::text) gin_trgm_ops);',
+            reverse_sql='DROP INDEX IF EXISTS sweets_name_trgm;',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sweets', '0002_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='sweet',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity__gte', 0)), name='sweets_quantity_non_negative'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-18 04:57
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Build the indexes without blocking writes to a live catalog
+    atomic = False
+
+    dependencies = [
+        ('sweets', '0004_catalog_version'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='sweet',
+            index=models.Index(fields=['category', 'price'], name='sweets_category_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sweet',
+            index=models.Index(fields=['name', 'id'], name='sweets_name_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sweet',
+            index=models.Index(condition=models.Q(('quantity__gt', 0)), fields=['name', 'id'], name='sweets_in_stock_name_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-18 05:22
+
+import django.utils.timezone
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Build the sweets index without blocking writes to a live catalog
+    atomic = False
+
+    dependencies = [
+        ('sweets', '0005_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SweetTombstone',
+            fields=[
+                ('sweet_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'sweet_tombstones',
+            },
+        ),
+        AddIndexConcurrently(
+            model_name='sweet',
+            index=models.Index(fields=['updated_at', 'id'], name='sweets_updated_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sweettombstone',
+            index=models.Index(fields=['deleted_at', 'sweet_id'], name='tombstones_deleted_at_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sweets', '0006_sweet_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sweet',
+            name='stock_folded_at',
+            field=models.DateTimeField(help_text='When quantity was last summed from the stock shards', null=True),
+        ),
+        migrations.AddField(
+            model_name='sweet',
+            name='stock_shards',
+            field=models.PositiveSmallIntegerField(db_default=0, help_text='Counter rows the stock is split over, 0 if not sharded'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sweets', '0007_stock_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sweet',
+            name='reserved',
+            field=models.PositiveIntegerField(db_default=0, help_text='Units held by reservations; quantity - reserved can be bought'),
+        ),
+        migrations.AddConstraint(
+            model_name='sweet',
+            constraint=models.CheckConstraint(condition=models.Q(('reserved__lte', models.F('quantity'))), name='sweets_reserved_within_quantity'),
+        ),
+    ]
@@ -32,8 +32,12 @@ Sweet Model
 Represents a sweet/candy item in the shop
 """
 
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from decimal import Decimal
 
 
@@ -85,15 +89,67 @@ class Sweet(models.Model):
         help_text="Current quantity in stock"
     )
     
+    # Sharded stock for flash sales, see apps/inventory/sharding.py
+    stock_shards = models.PositiveSmallIntegerField(
+        db_default=0,
+        help_text="Counter rows the stock is split over, 0 if not sharded"
+    )
+    stock_folded_at = models.DateTimeField(
+        null=True,
+        help_text="When quantity was last summed from the stock shards"
+    )
+    
+    # Held for unexpired reservations, see apps/inventory/reservations.py
+    reserved = models.PositiveIntegerField(
+        db_default=0,
+        help_text="Units held by reservations; quantity - reserved can be bought"
+    )
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Full-text search document, kept up to date by PostgreSQL itself
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config='english')
+            + SearchVector('description', weight='B', config='english')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    
     class Meta:
         db_table = 'sweets'
-        ordering = ['name']
+        ordering = ['name', 'id']
         verbose_name = 'Sweet'
         verbose_name_plural = 'Sweets'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='sweets_search_vector_gin'),
+            # search: category equality plus a price range
+            models.Index(fields=['category', 'price'], name='sweets_category_price_idx'),
+            # Meta.ordering and the (name, id) keyset cursor
+            models.Index(fields=['name', 'id'], name='sweets_name_id_idx'),
+            # Delta sync: changes since an (updated_at, id) watermark
+            models.Index(fields=['updated_at', 'id'], name='sweets_updated_at_id_idx'),
+            # The in-stock view of the catalog, in cursor order
+            models.Index(
+                fields=['name', 'id'],
+                condition=models.Q(quantity__gt=0),
+                name='sweets_in_stock_name_idx',
+            ),
+        ]
+        constraints = [
+            # Last line of defence against overselling
+            models.CheckConstraint(
+                condition=models.Q(quantity__gte=0),
+                name='sweets_quantity_non_negative',
+            ),
+            models.CheckConstraint(
+                condition=models.Q(reserved__lte=models.F('quantity')),
+                name='sweets_reserved_within_quantity',
+            ),
+        ]
     
     def __str__(self):
         """String representation"""
@@ -101,5 +157,72 @@ class Sweet(models.Model):
     
     @property
     def is_in_stock(self):
-        """Check if sweet is in stock"""
-        return self.quantity > 0
\ No newline at end of file
+        """Check if sweet has units for sale, not held by reservations"""
+        return self.quantity - self.reserved > 0
+
+
+class CatalogVersion(models.Model):
+    """
+    Single-row counter bumped whenever the catalog changes
+    Shared by every worker process so their caches invalidate together
+    """
+    
+    version = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'catalog_version'
+    
+    def __str__(self):
+        """String representation"""
+        return f'v{self.version}'
+
+
+class SweetTombstone(models.Model):
+    """
+    Record of a deleted sweet, so delta sync clients learn about deletions
+    Sweet ids are never reused, so the id alone identifies the row
+    """
+    
+    sweet_id = models.BigIntegerField(primary_key=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'sweet_tombstones'
+        indexes = [
+            models.Index(fields=['deleted_at', 'sweet_id'], name='tombstones_deleted_at_idx'),
+        ]
+    
+    def __str__(self):
+        """String representation"""
+        return f'Sweet {self.sweet_id} deleted at {self.deleted_at}'
+
+
+class StreamTicket(models.Model):
+    """
+    Single-use pass to open the live stock stream (see realtime.py)
+    EventSource cannot send an Authorization header, so browsers trade
+    their JWT for a ticket and put that in the stream URL instead
+    """
+    
+    key = models.CharField(
+        max_length=64, primary_key=True, help_text="SHA-256 of the ticket, never the ticket itself"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'stream_tickets'
+        indexes = [
+            models.Index(fields=['expires_at'], name='stream_tickets_expires_idx'),
+        ]
+    
+    def __str__(self):
+        """String representation"""
+        return f'Stream ticket of user {self.user_id} until {self.expires_at}'
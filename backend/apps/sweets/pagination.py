@@ -0,0 +1,185 @@
+"""
+Keyset (cursor) pagination for the sweets catalog
+
+Pages are located by the ordering values of the last row seen instead of
+an OFFSET, so every page costs the same index range scan no matter how deep
+the client pages, and no COUNT(*) is ever issued.
+"""
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class SweetCursorPagination(BasePagination):
+    """
+    Keyset pagination over (name, id)
+
+    Query Parameters:
+    - cursor: Opaque token taken from a previous `next`/`previous` link
+    - page_size: Number of items per page (capped at max_page_size)
+    """
+
+    ordering = ('name', 'id')
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, reading with the async ORM"""
+        return self.set_page([row async for row in self.page_queryset(queryset, request, view)])
+
+    def page_queryset(self, queryset, request, view=None):
+        """The rows of the requested page, plus one to tell if there are more"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+
+        position, reverse = self.decode_cursor(request)
+        self.has_cursor = position is not None
+        self.reverse = reverse
+
+        order_by = self.ordering
+        if reverse:
+            order_by = [_invert(field) for field in order_by]
+        queryset = queryset.order_by(*order_by)
+
+        if position is not None:
+            queryset = queryset.filter(
+                _keyset_filter(self.ordering, position, reverse)
+            )
+
+        # Fetch one extra row to find out whether another page exists
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        """Keep the fetched rows of page_queryset() as the current page"""
+        self.has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.page = rows
+        return rows
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'cursor_ordering', None) or self.ordering)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def has_next(self):
+        return self.has_more if not self.reverse else self.has_cursor
+
+    def has_previous(self):
+        return self.has_more if self.reverse else self.has_cursor
+
+    def get_next_link(self):
+        if not self.page or not self.has_next():
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.page or not self.has_previous():
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def get_position(self, item):
+        """Ordering values of a row, read from a model instance or a dict"""
+        fields = [field.lstrip('-') for field in self.ordering]
+        if isinstance(item, dict):
+            return [item[field] for field in fields]
+        return [getattr(item, field) for field in fields]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position = payload['p']
+            reverse = bool(payload.get('r', False))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+        ).decode('ascii')
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _keyset_filter(ordering, position, reverse):
+    """
+    Build the "rows after position" filter for a multi-column ordering
+
+    Expands (a, b, c) > (x, y, z) into
+        a >= x AND (a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z))
+    The leading non-strict bound lets PostgreSQL start the index scan at the
+    cursor instead of filtering from the first row.
+    """
+    keyset = Q()
+    equal = {}
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        lookup = 'gt' if descending == reverse else 'lt'
+        keyset |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+
+    first = ordering[0].lstrip('-')
+    bound = 'gte' if ordering[0].startswith('-') == reverse else 'lte'
+    return Q(**{f'{first}__{bound}': position[0]}) & keyset
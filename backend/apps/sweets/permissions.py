@@ -18,4 +18,14 @@ class IsAdminOrReadOnly(permissions.BasePermission):
             return request.user and request.user.is_authenticated
         
         # Write permissions only for admins
-        return request.user and request.user.is_authenticated and request.user.is_admin
\ No newline at end of file
+        return request.user and request.user.is_authenticated and request.user.is_admin
+
+
+class IsAdmin(permissions.BasePermission):
+    """
+    Custom permission:
+    - Only admin users, for reads as well as writes
+    """
+    
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and request.user.is_admin
@@ -0,0 +1,57 @@
+"""
+Sparse Fieldsets for Sweet Reads
+Lets clients ask for a subset of SweetSerializer fields, either by name
+(?fields=id,name,price) or as a named projection (?view=card)
+
+Only the columns behind the requested fields are selected from the database.
+"""
+
+from .serializers import SweetSerializer
+
+PROJECTIONS = {
+    'card': ('id', 'name', 'category', 'price', 'quantity', 'is_in_stock'),
+}
+
+# Serializer fields that are not model columns, and the columns they read
+COMPUTED_FIELDS = {
+    'is_in_stock': ('quantity', 'reserved'),
+}
+
+# Always selected: the primary key and the keyset cursor's ordering column
+REQUIRED_COLUMNS = ('id', 'name')
+
+
+class InvalidProjection(ValueError):
+    """Raised when ?fields= or ?view= names something unknown"""
+
+
+def requested_fields(params):
+    """
+    Parse ?fields= / ?view= into a tuple of serializer field names
+
+    Returns None when the client wants the full representation.
+    """
+    view = params.get('view', None)
+    fields = params.get('fields', None)
+
+    if view:
+        if view not in PROJECTIONS:
+            raise InvalidProjection(f'Unknown view: {view}')
+        return PROJECTIONS[view]
+
+    if not fields:
+        return None
+
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+    unknown = [name for name in names if name not in SweetSerializer.Meta.fields]
+    if unknown or not names:
+        raise InvalidProjection(f"Unknown field(s): {', '.join(unknown) or fields}")
+    return names
+
+
+def columns_for(fields):
+    """Model columns needed to render `fields`"""
+    columns = dict.fromkeys(REQUIRED_COLUMNS)
+    for name in fields:
+        columns.update(dict.fromkeys(COMPUTED_FIELDS.get(name, (name,))))
+    return tuple(columns)
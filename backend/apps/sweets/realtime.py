@@ -0,0 +1,276 @@
+"""
+Real-time Stock Updates
+Pushes {id, quantity, price} deltas to dashboards over Server-Sent Events
+
+Writers call publish_stock() inside their transaction. Once it commits,
+the deltas go out as PostgreSQL NOTIFYs to every listening worker, so no
+external broker is needed. They are sent from transaction.on_commit rather
+than within the transaction: a NOTIFY queued by a transaction makes every
+other notifying transaction wait for it to commit, which would serialize
+all stock writers on one lock.
+
+Browsers cannot send an Authorization header with EventSource, so a stream
+is opened with a ticket from issue_stream_ticket(): random, valid for
+STOCK_STREAM_TICKET_SECONDS and good for one stream only. A JWT in the URL
+would end up in proxy and access logs, still usable for its whole life.
+
+Each ASGI worker runs one StockHub: a single LISTEN connection read from
+the event loop, fanning each message out to the queues of the SSE streams
+served by that worker. Messages are encoded once and shared by every
+subscriber. If that connection is lost, every stream is ended, so browsers
+reconnect and refetch what they missed, and the hub reconnects in the
+background, backing off up to MAX_RECONNECT_SECONDS between attempts.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import secrets
+from datetime import timedelta
+from functools import partial
+
+import psycopg2
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import StreamTicket
+
+logger = logging.getLogger(__name__)
+
+STOCK_CHANNEL = 'sweet_stock'
+
+# NOTIFY payloads must stay under 8000 bytes
+MAX_PAYLOAD_BYTES = 7500
+
+# First and longest waits between attempts to (re)connect the listener
+RECONNECT_SECONDS = 1.0
+MAX_RECONNECT_SECONDS = 30.0
+
+# How long browsers wait before reconnecting a dropped stream
+STREAM_RETRY_MILLISECONDS = 3000
+
+# Sends every payload of a commit in one round trip
+NOTIFY_SQL = 'SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload'
+
+# Uses up a ticket: only one of two streams redeeming it at once gets a row
+REDEEM_SQL = """
+    DELETE FROM stream_tickets
+     WHERE key = %s AND expires_at > %s
+    RETURNING user_id
+"""
+
+
+def stock_delta(sweet):
+    """Compact delta of a sweet (model instance or dict)"""
+    if isinstance(sweet, dict):
+        sweet_id, quantity, price = sweet['id'], sweet['quantity'], sweet['price']
+    else:
+        sweet_id, quantity, price = sweet.id, sweet.quantity, sweet.price
+    return {'id': sweet_id, 'quantity': quantity, 'price': f'{price:.2f}'}
+
+
+def publish_stock(sweets):
+    """
+    Announce the current stock and price of `sweets` to every subscriber
+
+    Sent once the caller's transaction commits, and never if it rolls back.
+    Deltas are batched into as few NOTIFYs as the payload limit allows.
+    """
+    payloads = []
+    batch, size = [], 2
+    for sweet in sweets:
+        encoded = json.dumps(stock_delta(sweet), separators=(',', ':'))
+        if batch and size + len(encoded) + 1 > MAX_PAYLOAD_BYTES:
+            payloads.append('[' + ','.join(batch) + ']')
+            batch, size = [], 2
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        payloads.append('[' + ','.join(batch) + ']')
+
+    if payloads:
+        transaction.on_commit(partial(_notify, payloads))
+
+
+def _notify(payloads):
+    with connection.cursor() as cursor:
+        cursor.execute(NOTIFY_SQL, [STOCK_CHANNEL, payloads])
+
+
+def issue_stream_ticket(user):
+    """
+    A new single-use ticket for `user` to open the stock stream with
+
+    Only its hash is stored. Expired tickets are cleared out on the way.
+    """
+    now = timezone.now()
+    ticket = secrets.token_urlsafe(32)
+    StreamTicket.objects.filter(expires_at__lte=now).delete()
+    StreamTicket.objects.create(
+        key=_ticket_key(ticket),
+        user=user,
+        expires_at=now + timedelta(seconds=settings.STOCK_STREAM_TICKET_SECONDS),
+    )
+    return ticket
+
+
+def redeem_stream_ticket(ticket):
+    """
+    The active user a ticket was issued to, or None if it is unknown,
+    expired, already used or its user deactivated. Either way the ticket
+    cannot be used again.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(REDEEM_SQL, [_ticket_key(ticket), timezone.now()])
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return get_user_model().objects.filter(pk=row[0], is_active=True).first()
+
+
+def _ticket_key(ticket):
+    return hashlib.sha256(ticket.encode('utf-8')).hexdigest()
+
+
+def sse_message(delta):
+    return f"event: stock\ndata: {json.dumps(delta, separators=(',', ':'))}\n\n".encode('utf-8')
+
+
+class StockHub:
+    """
+    Per-worker fan-out from one LISTEN connection to many SSE streams
+
+    subscribe() returns an asyncio.Queue of encoded SSE messages. A queue
+    that fills up (a client not reading) gets None and is dropped; the
+    browser's EventSource then reconnects. Every queue is dropped that way
+    when the listener connection is lost.
+    """
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self._loop = None
+        self._connection = None
+        self._starting = None
+
+    async def subscribe(self):
+        await self._ensure_listening()
+        queue = asyncio.Queue(maxsize=self.queue_size or settings.STOCK_STREAM_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    async def stream(self):
+        """
+        Body of one SSE response: a retry hint, then stock events as they
+        arrive, with a comment line whenever it has been idle for
+        STOCK_STREAM_KEEPALIVE_SECONDS so proxies keep the connection open
+        """
+        queue = await self.subscribe()
+        try:
+            yield f'retry: {STREAM_RETRY_MILLISECONDS}\n\n'.encode('ascii')
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        queue.get(), settings.STOCK_STREAM_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield b': keepalive\n\n'
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(queue)
+
+    def broadcast(self, message):
+        """Queue one encoded message for every subscriber"""
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(queue)
+
+    def drop_all(self):
+        """End every stream; their clients reconnect"""
+        for queue in list(self.subscribers):
+            self._drop(queue)
+
+    def _drop(self, queue):
+        self.subscribers.discard(queue)
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def _ensure_listening(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or the previous event loop is gone (tests, reloads)
+            self.close()
+            self._loop = loop
+            self._starting = None
+        if self._connection is None:
+            if self._starting is None:
+                self._starting = loop.create_task(self._connect())
+            await asyncio.shield(self._starting)
+
+    async def _connect(self):
+        """Open the listener, retrying with backoff until it connects"""
+        delay = RECONNECT_SECONDS
+        while True:
+            try:
+                listener = await self._loop.run_in_executor(None, _open_listener)
+            except psycopg2.Error:
+                logger.exception('Could not LISTEN for stock updates, retrying in %ss', delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_SECONDS)
+                continue
+            self._connection = listener
+            self._loop.add_reader(listener.fileno(), self._on_readable)
+            return
+
+    def _on_readable(self):
+        listener = self._connection
+        try:
+            listener.poll()
+        except psycopg2.Error:
+            logger.exception('Stock update listener lost its connection, reconnecting')
+            self.close()
+            # Streams would otherwise stay open and silently miss updates
+            self.drop_all()
+            self._starting = self._loop.create_task(self._connect())
+            return
+
+        while listener.notifies:
+            notification = listener.notifies.pop(0)
+            for delta in json.loads(notification.payload):
+                self.broadcast(sse_message(delta))
+
+    def close(self):
+        """Stop listening; the next subscribe() starts again"""
+        if self._connection is not None:
+            try:
+                self._loop.remove_reader(self._connection.fileno())
+            except (ValueError, RuntimeError):
+                pass
+            self._connection.close()
+            self._connection = None
+        if self._starting is not None and not self._starting.done():
+            self._starting.cancel()
+        self._starting = None
+
+
+def _open_listener():
+    listener = psycopg2.connect(**connection.get_connection_params())
+    listener.set_session(autocommit=True)
+    with listener.cursor() as cursor:
+        cursor.execute(f'LISTEN {STOCK_CHANNEL}')
+    return listener
+
+
+stock_hub = StockHub()
@@ -0,0 +1,142 @@
+"""
+Catalog Search
+Full-text search over name + description, ranked by relevance
+
+The text term is matched two ways and the results are merged:
+- against the stored `search_vector` (GIN index), which gives the ranking
+- as a case-insensitive substring of the name, served by the pg_trgm GIN
+  index created in migration 0002, so partial words like "choc" still match
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = 'english'
+
+# Keyset orderings understood by SweetCursorPagination
+DEFAULT_ORDERING = ('name', 'id')
+RANKED_ORDERING = ('-rank', 'name', 'id')
+
+# Sweets with units for sale, not held by reservations. quantity > 0 is
+# implied, but spelled out so sweets_in_stock_name_idx still applies.
+IN_STOCK = Q(quantity__gt=0) & Q(quantity__gt=F('reserved'))
+OUT_OF_STOCK = Q(quantity__lte=F('reserved'))
+
+
+class InvalidSearchParam(ValueError):
+    """Raised when a search query parameter cannot be parsed"""
+
+
+def search_filters(params):
+    """
+    Parse the search query parameters into normalized filter values
+
+    Query Parameters:
+    - q (or name): Free text matched against name and description
+    - category: Filter by exact category
+    - min_price / max_price: Price range filter
+    - in_stock: true for sweets with stock left, false for sold out ones
+
+    Raises InvalidSearchParam for values that cannot be parsed.
+    """
+    return {
+        # Matching ignores case and extra whitespace, so normalize both away
+        'term': ' '.join((params.get('q') or params.get('name') or '').lower().split()),
+        'category': params.get('category', None) or None,
+        'min_price': _parse_price(params, 'min_price'),
+        'max_price': _parse_price(params, 'max_price'),
+        'in_stock': _parse_bool(params, 'in_stock'),
+    }
+
+
+def filter_key(filters):
+    """
+    Hashable cache key for parsed filters
+
+    Requests that filter the same way share a key however their query
+    strings were written (?min_price=2 and ?min_price=2.00&q=).
+    """
+    return tuple(sorted(filters.items()))
+
+
+def search_sweets(queryset, params):
+    """
+    Apply the search query parameters (see search_filters) to a Sweet queryset
+
+    Returns a (queryset, ordering) pair. When a text term is given the
+    queryset is annotated with `rank` and ordered by relevance first.
+    """
+    return filter_sweets(queryset, search_filters(params))
+
+
+def filter_sweets(queryset, filters, ranked=True):
+    """
+    Apply filters parsed by search_filters() to a Sweet queryset
+
+    Pass ranked=False when the rows are only aggregated, to skip computing
+    the relevance rank.
+    """
+    term = filters['term']
+    category = filters['category']
+    min_price = filters['min_price']
+    max_price = filters['max_price']
+    in_stock = filters['in_stock']
+
+    if category:
+        queryset = queryset.filter(category=category)
+
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    if in_stock is True:
+        queryset = queryset.filter(IN_STOCK)
+    elif in_stock is False:
+        queryset = queryset.filter(OUT_OF_STOCK)
+
+    if not term:
+        return queryset, DEFAULT_ORDERING
+
+    query = SearchQuery(term, search_type='websearch', config=SEARCH_CONFIG)
+    queryset = queryset.filter(Q(search_vector=query) | Q(name__icontains=term))
+    if not ranked:
+        return queryset, DEFAULT_ORDERING
+
+    queryset = queryset.annotate(
+        # Cast from real so the rank round-trips exactly through a cursor
+        rank=Cast(SearchRank(F('search_vector'), query), output_field=FloatField())
+    )
+    return queryset, RANKED_ORDERING
+
+
+def _parse_price(params, key):
+    value = params.get(key, None)
+    if not value:
+        return None
+
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise InvalidSearchParam(f'Invalid {key} value')
+
+    if not price.is_finite():
+        raise InvalidSearchParam(f'Invalid {key} value')
+    return price
+
+
+def _parse_bool(params, key):
+    value = params.get(key, None)
+    if not value:
+        return None
+
+    value = value.lower()
+    if value in ('true', '1', 'yes'):
+        return True
+    if value in ('false', '0', 'no'):
+        return False
+    raise InvalidSearchParam(f'Invalid {key} value')
@@ -1,11 +1,78 @@
 from decimal import Decimal
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Sweet
 
+# Most sweets one bulk request may create, update or delete
+BULK_MAX_ITEMS = 1000
+
+SHARDED_QUANTITY_ERROR = (
+    'This sweet has sharded stock, which only purchases and restocks can change'
+)
+
+RESERVED_QUANTITY_ERROR = 'Quantity cannot go below the units held by reservations'
+
+
+class SweetListSerializer(serializers.ListSerializer):
+    """
+    Writes many sweets with one statement per operation
+
+    - create(): a single bulk_create INSERT
+    - update(): `instance` maps id -> Sweet for the sweets being changed;
+      every item must carry the `id` of one of them, and the changes are
+      written with a single bulk_update
+    
+    Model signals do not fire, so callers bump the catalog version.
+    """
+
+    def to_internal_value(self, data):
+        self._seen_ids = set()
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+
+        sweet_id = data.get('id') if isinstance(data, dict) else None
+        try:
+            sweet = self.instance.get(int(sweet_id))
+        except (TypeError, ValueError):
+            raise serializers.ValidationError({'id': ['A valid integer is required.']})
+        if sweet is None:
+            raise serializers.ValidationError({'id': ['Sweet not found']})
+        if sweet.pk in self._seen_ids:
+            raise serializers.ValidationError({'id': ['Each id may only appear once']})
+        self._seen_ids.add(sweet.pk)
+
+        self.child.instance = sweet
+        self.child.initial_data = data
+        attrs = super().run_child_validation(data)
+        attrs['id'] = sweet.pk
+        return attrs
+
+    def create(self, validated_data):
+        return Sweet.objects.bulk_create(Sweet(**attrs) for attrs in validated_data)
+
+    def update(self, instance, validated_data):
+        now = timezone.now()
+        sweets = []
+        fields = {'updated_at'}
+        for attrs in validated_data:
+            sweet = instance[attrs.pop('id')]
+            for field, value in attrs.items():
+                setattr(sweet, field, value)
+            fields.update(attrs)
+            sweet.updated_at = now
+            sweets.append(sweet)
+
+        Sweet.objects.bulk_update(sweets, sorted(fields))
+        return sweets
+
 
 class SweetSerializer(serializers.ModelSerializer):
     """
     Serializer for Sweet model
+    Pass `fields` to render only a subset of the fields
     """
 
     price = serializers.DecimalField(
@@ -34,6 +101,42 @@ class SweetSerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at',
         )
+        list_serializer_class = SweetListSerializer
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def validate_quantity(self, value):
+        """Sharded stock lives in counter rows, and reserved units must stay in stock"""
+        if self.instance is None or value == self.instance.quantity:
+            return value
+        if self.instance.stock_shards:
+            raise serializers.ValidationError(SHARDED_QUANTITY_ERROR)
+        if value < self.instance.reserved:
+            raise serializers.ValidationError(RESERVED_QUANTITY_ERROR)
+        return value
 
     def get_is_in_stock(self, obj):
-        return obj.quantity > 0
+        return obj.quantity - obj.reserved > 0
+
+
+
+class SweetBulkDeleteSerializer(serializers.Serializer):
+    """
+    Serializer for bulk delete requests
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+        help_text="Ids of the sweets to delete"
+    )
+
+    def validate_ids(self, value):
+        """Each sweet may only appear once"""
+        if len(value) != len(set(value)):
+            raise serializers.ValidationError("Each id may only appear once")
+        return value
@@ -0,0 +1,43 @@
+"""
+Signal handlers for Sweets
+Any saved or deleted sweet invalidates the catalog cache in every worker
+and updates this worker's autocomplete index; saved sweets are pushed to
+live stock streams, and deleted sweets leave a tombstone for delta sync
+clients
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import name_index
+from .cache import bump_catalog_version
+from .models import Sweet, SweetTombstone
+from .realtime import publish_stock
+
+
+@receiver([post_save, post_delete], sender=Sweet)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Sweet)
+def index_sweet_name(sender, instance, **kwargs):
+    sweet_id, name = instance.pk, instance.name
+    transaction.on_commit(lambda: name_index.update(sweet_id, name))
+
+
+@receiver(post_save, sender=Sweet)
+def announce_stock(sender, instance, **kwargs):
+    publish_stock([instance])
+
+
+@receiver(post_delete, sender=Sweet)
+def record_tombstone(sender, instance, **kwargs):
+    SweetTombstone.objects.update_or_create(sweet_id=instance.pk)
+
+
+@receiver(post_delete, sender=Sweet)
+def unindex_sweet_name(sender, instance, **kwargs):
+    sweet_id = instance.pk
+    transaction.on_commit(lambda: name_index.remove(sweet_id))
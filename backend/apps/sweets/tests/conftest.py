@@ -0,0 +1,28 @@
+"""
+Shared fixtures for the sweets tests
+"""
+
+import importlib
+
+import pytest
+from django.test import override_settings
+from django.urls import clear_url_caches
+
+import apps.sweets.urls
+import sweet_shop.urls
+
+
+def reload_urls():
+    """Rebuild the URL patterns, which depend on SERVER_MODE"""
+    importlib.reload(apps.sweets.urls)
+    importlib.reload(sweet_shop.urls)
+    clear_url_caches()
+
+
+@pytest.fixture
+def asgi_routes():
+    """Route requests as the app does with SERVER_MODE=asgi"""
+    with override_settings(SERVER_MODE='asgi'):
+        reload_urls()
+        yield
+    reload_urls()
@@ -0,0 +1,162 @@
+"""
+Tests for the Async Catalog Reads
+"""
+
+import asyncio
+import pytest
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.urls import resolve
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.sweets.cache import catalog_cache
+from apps.sweets.models import Sweet
+from apps.sweets.views import SweetViewSet
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('asgi_routes')
+class TestAsyncCatalogReads:
+    """Async list/retrieve/search must answer exactly like the sync views"""
+
+    def setup_method(self):
+        catalog_cache.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="user123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.fudge = Sweet.objects.create(
+            name="Chocolate Fudge", category="Chocolate", price=Decimal("3.50"), quantity=4,
+            description="Rich chocolate fudge"
+        )
+        Sweet.objects.create(
+            name="Lemon Drops", category="Hard Candy", price=Decimal("1.25"), quantity=0
+        )
+        Sweet.objects.create(
+            name="Chocolate Buttons", category="Chocolate", price=Decimal("2.00"), quantity=9
+        )
+
+    def sync_response(self, actions, url, **kwargs):
+        """The same request answered by the sync viewset"""
+        catalog_cache.clear()
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=self.user)
+        return SweetViewSet.as_view(actions)(request, **kwargs).render()
+
+    def test_reads_are_routed_to_async_views(self):
+        for url in ('/api/sweets/', '/api/sweets/search/', f'/api/sweets/{self.fudge.id}/'):
+            assert iscoroutinefunction(resolve(url).func)
+        # Routes without an async version stay on the router
+        assert not iscoroutinefunction(resolve('/api/sweets/facets/').func)
+
+    @pytest.mark.parametrize("url, actions, kwargs", [
+        ('/api/sweets/?page_size=2', {'get': 'list'}, {}),
+        ('/api/sweets/?view=card', {'get': 'list'}, {}),
+        ('/api/sweets/search/?q=chocolate&in_stock=true', {'get': 'search'}, {}),
+        ('/api/sweets/search/?category=Chocolate&page_size=1', {'get': 'search'}, {}),
+        ('/api/sweets/search/?min_price=abc', {'get': 'search'}, {}),
+    ])
+    def test_pages_match_sync_views(self, url, actions, kwargs):
+        expected = self.sync_response(actions, url, **kwargs)
+
+        response = self.client.get(url)
+
+        assert response.status_code == expected.status_code
+        assert response.content == expected.content
+        assert response.get('ETag') == expected.get('ETag')
+
+    def test_retrieve_matches_sync_view(self):
+        url = f'/api/sweets/{self.fudge.id}/?fields=id,name,price'
+        expected = self.sync_response({'get': 'retrieve'}, url, pk=str(self.fudge.id))
+
+        response = self.client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == expected.content
+        assert response['ETag'] == expected['ETag']
+
+    def test_next_page_cursor_is_followed(self):
+        first = self.client.get('/api/sweets/?page_size=2').json()
+        second = self.client.get(first['next']).json()
+
+        names = [sweet['name'] for sweet in first['results'] + second['results']]
+        assert names == ["Chocolate Buttons", "Chocolate Fudge", "Lemon Drops"]
+        assert second['next'] is None
+
+    def test_not_modified(self):
+        etag = self.client.get('/api/sweets/')['ETag']
+
+        response = self.client.get('/api/sweets/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_head(self):
+        response = self.client.head(f'/api/sweets/{self.fudge.id}/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == b''
+
+    def test_missing_sweet(self):
+        response = self.client.get('/api/sweets/999999/')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {'detail': 'Sweet not found'}
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/sweets/?cursor=garbage')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_requires_authentication(self):
+        response = APIClient().get('/api/sweets/')
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_writes_go_to_sync_views(self):
+        payload = {"name": "Toffee", "category": "Other", "price": "1.00", "quantity": 1}
+
+        assert self.client.post('/api/sweets/', payload).status_code == status.HTTP_403_FORBIDDEN
+
+        self.user.is_admin = True
+        self.user.save()
+        assert self.client.post('/api/sweets/', payload).status_code == status.HTTP_201_CREATED
+        response = self.client.delete(f'/api/sweets/{self.fudge.id}/')
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    def test_concurrent_reads_wait_for_a_database_slot(self, settings):
+        settings.ASYNC_DB_CONCURRENCY = 1
+        token = RefreshToken.for_user(self.user).access_token
+        headers = {'Authorization': f'Bearer {token}'}
+
+        async def scenario():
+            client = AsyncClient()
+            return await asyncio.gather(*(
+                client.get(f'/api/sweets/?page_size={size}', headers=headers)
+                for size in range(1, 6)
+            ))
+
+        responses = async_to_sync(scenario)()
+
+        assert [len(response.json()['results']) for response in responses] == [1, 2, 3, 3, 3]
+
+
+@pytest.mark.django_db
+def test_wsgi_mode_routes_to_sync_views():
+    """The default SERVER_MODE serves reads from the sync views and has no stream"""
+    user = User.objects.create_user(email="user@example.com", username="user", password="user123")
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    assert not iscoroutinefunction(resolve('/api/sweets/').func)
+    assert not iscoroutinefunction(resolve('/api/sweets/1/').func)
+    assert client.get('/api/sweets/stream/').status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,170 @@
+"""
+Tests for Name Autocomplete
+"""
+
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.inventory import services
+from apps.sweets import autocomplete
+from apps.sweets.autocomplete import NameIndex, name_index, normalize
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+
+def test_normalize():
+    assert normalize("  Crème   BRÛLÉE ") == "creme brulee"
+
+
+@pytest.mark.django_db
+class TestNameIndex:
+    """Test the sorted in-memory name index"""
+
+    def setup_method(self):
+        for name in ["Milk Chocolate Bar", "Chocolate Buttons", "Chewy Cola", "Crème Egg"]:
+            Sweet.objects.create(name=name, price=Decimal("1.00"), quantity=1)
+        self.index = NameIndex(refresh_seconds=3600)
+        self.index.load()
+
+    def names(self, prefix, **kwargs):
+        return [item["name"] for item in self.index.suggest(prefix, **kwargs)]
+
+    def test_prefix_matches_any_word_whole_names_first(self):
+        assert self.names("choc") == ["Chocolate Buttons", "Milk Chocolate Bar"]
+        assert self.names("bar") == ["Milk Chocolate Bar"]
+
+    def test_matching_ignores_case_and_accents(self):
+        assert self.names("CREME e") == ["Crème Egg"]
+
+    def test_limit(self):
+        assert len(self.names("c", limit=2)) == 2
+
+    def test_each_sweet_is_suggested_once(self):
+        Sweet.objects.create(name="Cola Cola Cubes", price=Decimal("1.00"), quantity=1)
+        self.index.load()
+
+        assert self.names("cola") == ["Cola Cola Cubes", "Chewy Cola"]
+
+    def test_lookups_do_not_query_the_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.names("choc")
+
+        assert not queries
+
+    def test_unbuilt_index_suggests_nothing_and_starts_building(self, monkeypatch):
+        index = NameIndex()
+        started = []
+        monkeypatch.setattr(index, "start", lambda: started.append(True))
+
+        with CaptureQueriesContext(connection) as queries:
+            assert index.suggest("choc") == []
+
+        assert not queries
+        assert started
+
+    def test_update_and_remove(self):
+        buttons = Sweet.objects.get(name="Chocolate Buttons")
+
+        self.index.update(buttons.id, "Toffee Buttons")
+        assert self.names("choc") == ["Milk Chocolate Bar"]
+        assert self.names("toff") == ["Toffee Buttons"]
+
+        self.index.remove(buttons.id)
+        assert self.names("butt") == []
+
+    def test_follows_changes_made_elsewhere(self, settings):
+        settings.CHANGES_SETTLE_SECONDS = 0
+
+        # Writes that bypass this index, as other workers, bulk endpoints and imports do
+        Sweet.objects.bulk_create([Sweet(name="Bulk Bonbons", price=Decimal("1"), quantity=1)])
+        Sweet.objects.filter(name="Chewy Cola").update(name="Fizzy Cola", updated_at=timezone.now())
+        Sweet.objects.filter(name="Crème Egg").delete()
+        assert self.names("bon") == []
+
+        self.index.sync()
+
+        assert self.names("bon") == ["Bulk Bonbons"]
+        assert self.names("fizz") == ["Fizzy Cola"]
+        assert self.names("chew") == []
+        assert self.names("egg") == []
+
+    def test_stock_changes_leave_the_index_alone(self, settings):
+        settings.CHANGES_SETTLE_SECONDS = 0
+        whole, words = self.index._whole, self.index._words
+        before = list(whole)
+
+        services.purchase(Sweet.objects.get(name="Chewy Cola").id, 1)
+        self.index.sync()
+
+        assert self.names("chew") == ["Chewy Cola"]
+        # Changed in place, never rebuilt
+        assert self.index._whole is whole and self.index._words is words
+        assert whole == before
+
+    def test_large_change_sets_rebuild_the_index(self, settings, monkeypatch):
+        settings.CHANGES_SETTLE_SECONDS = 0
+        monkeypatch.setattr(autocomplete, "SYNC_REBUILD_AFTER", 2)
+        whole = self.index._whole
+
+        Sweet.objects.bulk_create([
+            Sweet(name=f"Bulk Bonbon {number}", price=Decimal("1"), quantity=1)
+            for number in range(3)
+        ])
+        self.index.sync()
+
+        assert self.index._whole is not whole
+        assert len(self.names("bulk")) == 3
+@pytest.mark.django_db
+class TestAutocompleteEndpoint:
+    """Test GET /api/sweets/autocomplete/"""
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="pass123"
+        ))
+        self.sweet = Sweet.objects.create(
+            name="Lemon Sherbet", price=Decimal("1.00"), quantity=1
+        )
+        name_index.load()
+        self.url = "/api/sweets/autocomplete/"
+
+    def teardown_method(self):
+        name_index.clear()
+
+    def test_suggestions(self):
+        response = self.client.get(self.url, {"q": "sher"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {"results": [{"id": self.sweet.id, "name": "Lemon Sherbet"}]}
+
+    def test_saves_update_the_index(self, django_capture_on_commit_callbacks):
+        self.client.get(self.url, {"q": "lem"})
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Sweet.objects.create(name="Lemon Drops", price=Decimal("1.00"), quantity=1)
+            self.sweet.delete()
+
+        response = self.client.get(self.url, {"q": "lem"})
+
+        assert [item["name"] for item in response.data["results"]] == ["Lemon Drops"]
+
+    def test_empty_query(self):
+        response = self.client.get(self.url)
+
+        assert response.data == {"results": []}
+
+    def test_invalid_limit_returns_400(self):
+        response = self.client.get(self.url, {"q": "lem", "limit": "lots"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,152 @@
+"""
+Tests for Bulk Create / Update / Delete
+"""
+
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.sweets.cache import get_catalog_version
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestBulkEndpoints:
+    """Test /api/sweets/bulk/"""
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            username="admin",
+            password="admin123",
+            is_admin=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.url = "/api/sweets/bulk/"
+        self.sweets = [
+            Sweet.objects.create(
+                name=f"Bulk Sweet {i}",
+                category="Gummy",
+                price=Decimal("1.00"),
+                quantity=10
+            )
+            for i in range(3)
+        ]
+
+    def test_bulk_create(self, django_capture_on_commit_callbacks):
+        data = [
+            {"name": f"New {i}", "category": "Sour", "price": "0.50", "quantity": i}
+            for i in range(50)
+        ]
+        before = get_catalog_version()[0]
+
+        with CaptureQueriesContext(connection) as queries:
+            with django_capture_on_commit_callbacks(execute=True):
+                response = self.client.post(self.url, data, format="json")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.data) == 50
+        assert all(item["id"] for item in response.data)
+        assert Sweet.objects.filter(category="Sour").count() == 50
+        inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "sweets"')]
+        assert len(inserts) == 1
+        assert get_catalog_version()[0] > before
+
+    def test_bulk_create_is_all_or_nothing(self):
+        data = [
+            {"name": "Fine", "price": "1.00", "quantity": 1},
+            {"name": "Free", "price": "0.00", "quantity": 1},
+        ]
+
+        response = self.client.post(self.url, data, format="json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["items"][0] == {}
+        assert "price" in response.data["items"][1]
+        assert not Sweet.objects.filter(name="Fine").exists()
+
+    def test_bulk_create_rejects_non_list_and_empty_body(self):
+        assert self.client.post(self.url, {"name": "x"}, format="json").status_code == 400
+        assert self.client.post(self.url, [], format="json").status_code == 400
+
+    def test_bulk_partial_update(self):
+        data = [{"id": sweet.id, "price": "2.25"} for sweet in reversed(self.sweets)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, data, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert {item["price"] for item in response.data} == {"2.25"}
+        assert set(Sweet.objects.values_list("price", flat=True)) == {Decimal("2.25")}
+        updates = [q for q in queries if q["sql"].startswith('UPDATE "sweets"')]
+        assert len(updates) == 1
+        # Rows are locked in primary-key order, whatever the body's order
+        locks = [q["sql"] for q in queries if q["sql"].endswith("FOR UPDATE")]
+        assert len(locks) == 1
+        assert 'ORDER BY "sweets"."id" ASC' in locks[0]
+
+    def test_bulk_full_update_requires_all_fields(self):
+        response = self.client.put(
+            self.url, [{"id": self.sweets[0].id, "price": "2.25"}], format="json"
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "name" in response.data["items"][0]
+
+    def test_bulk_update_reports_unknown_and_duplicate_ids(self):
+        data = [
+            {"id": self.sweets[0].id, "quantity": 1},
+            {"id": 999999, "quantity": 1},
+            {"id": self.sweets[0].id, "quantity": 2},
+            {"quantity": 3},
+        ]
+
+        response = self.client.patch(self.url, data, format="json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        items = response.data["items"]
+        assert items[0] == {}
+        assert items[1] == {"id": ["Sweet not found"]}
+        assert items[2] == {"id": ["Each id may only appear once"]}
+        assert "id" in items[3]
+        self.sweets[0].refresh_from_db()
+        assert self.sweets[0].quantity == 10
+
+    def test_bulk_delete(self, django_capture_on_commit_callbacks):
+        ids = [sweet.id for sweet in self.sweets[:2]]
+        before = get_catalog_version()[0]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.delete(self.url, {"ids": ids}, format="json")
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert list(Sweet.objects.values_list("id", flat=True)) == [self.sweets[2].id]
+        assert get_catalog_version()[0] > before
+
+    def test_bulk_delete_is_all_or_nothing(self):
+        response = self.client.delete(
+            self.url, {"ids": [self.sweets[0].id, 999999]}, format="json"
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["items"] == [{}, {"id": ["Sweet not found"]}]
+        assert Sweet.objects.count() == 3
+
+    def test_bulk_writes_are_admin_only(self):
+        self.client.force_authenticate(user=User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="pass123"
+        ))
+
+        response = self.client.delete(self.url, {"ids": [self.sweets[0].id]}, format="json")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,194 @@
+"""
+Tests for the Bulk Catalog Import
+"""
+
+import json
+import threading
+import time
+import pytest
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+import psycopg2
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.sweets.bulk_import import import_sweets
+from apps.sweets.cache import get_catalog_version
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+
+def ndjson(*records):
+    return "\n".join(json.dumps(record) for record in records).encode()
+
+
+@pytest.mark.django_db
+class TestBulkImport:
+    """Test POST /api/sweets/import/"""
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            username="admin",
+            password="admin123",
+            is_admin=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.existing = Sweet.objects.create(
+            name="Old Toffee",
+            category="Other",
+            price=Decimal("1.00"),
+            quantity=5,
+            description="Keep me"
+        )
+        self.url = "/api/sweets/import/"
+
+    def upload(self, content, filename="catalog.csv", **params):
+        return self.client.post(
+            self.url + ("?type=" + params["type"] if params else ""),
+            {"file": SimpleUploadedFile(filename, content)},
+            format="multipart"
+        )
+
+    def test_csv_import_creates_and_updates(self, django_capture_on_commit_callbacks):
+        content = (
+            "name,category,price,quantity,description\n"
+            "Old Toffee,,1.50,9,\n"
+            "New Bears,Gummy,2.00,30,\"Chewy, fruity\"\n"
+        ).encode()
+        before = get_catalog_version()[0]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.upload(content)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {"processed": 2, "created": 1, "updated": 1, "errors": []}
+
+        self.existing.refresh_from_db()
+        assert (self.existing.price, self.existing.quantity) == (Decimal("1.50"), 9)
+        # Blank cells leave the current values alone
+        assert self.existing.category == "Other"
+        assert self.existing.description == "Keep me"
+
+        bears = Sweet.objects.get(name="New Bears")
+        assert (bears.category, bears.description) == ("Gummy", "Chewy, fruity")
+        assert get_catalog_version()[0] > before
+
+    def test_ndjson_import_updates_by_id(self):
+        content = ndjson({
+            "id": self.existing.id, "name": "Renamed Toffee", "price": "2.00", "quantity": 1
+        })
+
+        response = self.upload(content, filename="catalog.ndjson")
+
+        assert response.data["updated"] == 1
+        self.existing.refresh_from_db()
+        assert self.existing.name == "Renamed Toffee"
+
+    def test_invalid_rows_are_reported_not_fatal(self):
+        content = ndjson(
+            {"name": "Good One", "price": "1.00", "quantity": 1},
+            {"name": "Free", "price": "0.00", "quantity": 1},
+            {"name": "Negative", "price": "1.00", "quantity": -3},
+            {"name": "Mystery", "category": "Cake", "price": "1.00", "quantity": 1},
+            {"id": 999999, "name": "Ghost", "price": "1.00", "quantity": 1},
+            {"name": "Good One", "price": "3.00", "quantity": 1},
+        ) + b"\n{not json"
+
+        response = self.upload(content, type="ndjson")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["processed"] == 7
+        assert response.data["created"] == 1
+        errors = {error["line"]: error["errors"] for error in response.data["errors"]}
+        assert set(errors) == {2, 3, 4, 5, 6, 7}
+        assert "price" in errors[2]
+        assert "quantity" in errors[3]
+        assert "category" in errors[4]
+        assert errors[5] == {"id": ["Sweet not found"]}
+        assert errors[6] == {"name": ["Duplicate of line 1"]}
+        assert Sweet.objects.get(name="Good One").price == Decimal("1.00")
+
+    def test_ambiguous_name_is_rejected(self):
+        Sweet.objects.create(name="Old Toffee", price=Decimal("1.00"), quantity=1)
+
+        response = self.upload(b"name,price,quantity\nOld Toffee,9.00,1\n")
+
+        assert response.data["updated"] == 0
+        assert response.data["errors"][0]["line"] == 2
+        assert "name" in response.data["errors"][0]["errors"]
+
+    def test_missing_file_returns_400(self):
+        response = self.client.post(self.url, {}, format="multipart")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_undecodable_file_returns_400_and_writes_nothing(self):
+        response = self.upload(b"name,price,quantity\nGood,1.00,1\n\xff\xfe,1.00,1\n")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Sweet.objects.filter(name="Good").exists()
+
+    def test_import_is_admin_only(self):
+        self.client.force_authenticate(user=User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="pass123"
+        ))
+
+        response = self.upload(b"name,price,quantity\nSneaky,1.00,1\n")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+def test_import_sweets_command(tmp_path):
+    path = tmp_path / "supplier.csv"
+    path.write_text("name,price,quantity\nCommand Chews,0.75,40\nBroken,,1\n")
+    out = StringIO()
+
+    call_command("import_sweets", str(path), stdout=out)
+
+    assert Sweet.objects.get(name="Command Chews").quantity == 40
+    assert "1 created, 0 updated, 1 rejected" in out.getvalue()
+    assert "line 3" in out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_import_waits_for_reservations_in_flight():
+    """
+    A reservation committing while the import runs is checked like one made
+    before it, instead of failing the merge on the reserved <= quantity check
+    """
+    sweet = Sweet.objects.create(name="Hot Fudge", price=Decimal("1.00"), quantity=10)
+    reserving = psycopg2.connect(**connection.get_connection_params())
+    with reserving.cursor() as cursor:
+        cursor.execute("UPDATE sweets SET reserved = 5 WHERE id = %s", [sweet.id])
+    results = []
+
+    def run_import():
+        try:
+            results.append(import_sweets(BytesIO(b"name,price,quantity\nHot Fudge,1.00,2\n"), "csv"))
+        except Exception as exc:
+            results.append(exc)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run_import)
+    thread.start()
+    time.sleep(0.5)
+    reserving.commit()
+    reserving.close()
+    thread.join()
+
+    assert results[0]["updated"] == 0
+    assert list(results[0]["errors"][0]["errors"]) == ["quantity"]
+    assert Sweet.objects.get(pk=sweet.id).quantity == 10
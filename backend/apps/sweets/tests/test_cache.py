@@ -0,0 +1,144 @@
+"""
+Tests for the Catalog Cache
+"""
+
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.sweets.cache import CatalogCache, catalog_cache, get_catalog_version
+from apps.sweets.models import Sweet
+from apps.sweets.serializers import SweetSerializer
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestCatalogCache:
+    """Test CatalogCache versioning, LRU eviction and counters"""
+
+    def test_second_lookup_is_a_hit(self):
+        cache = CatalogCache(max_bytes=1024)
+        calls = []
+
+        def build():
+            calls.append(1)
+            return {'results': [1, 2, 3]}
+
+        assert cache.get_or_build('key', build) == {'results': [1, 2, 3]}
+        assert cache.get_or_build('key', build) == {'results': [1, 2, 3]}
+
+        assert len(calls) == 1
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_version_bump_invalidates_entries(self, django_capture_on_commit_callbacks):
+        cache = CatalogCache(max_bytes=1024)
+        cache.get_or_build('key', lambda: 'old')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Sweet.objects.create(name="New", price=Decimal("1.00"), quantity=1)
+
+        assert cache.get_or_build('key', lambda: 'new') == 'new'
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = CatalogCache(max_bytes=30)
+        cache.get_or_build('a', lambda: 'x' * 10)
+        cache.get_or_build('b', lambda: 'y' * 10)
+        cache.get_or_build('a', lambda: 'unused')
+        cache.get_or_build('c', lambda: 'z' * 10)
+
+        stats = cache.stats()
+        assert stats['entries'] == 2
+        assert stats['evictions'] == 1
+        assert stats['bytes'] <= 30
+        assert cache.get_or_build('a', lambda: 'rebuilt') == 'x' * 10
+        assert cache.get_or_build('b', lambda: 'rebuilt') == 'rebuilt'
+
+    def test_oversized_payload_is_not_stored(self):
+        cache = CatalogCache(max_bytes=8)
+        cache.get_or_build('big', lambda: 'x' * 100)
+
+        assert cache.stats()['entries'] == 0
+
+    def test_disabled_cache_always_builds(self):
+        cache = CatalogCache(max_bytes=0)
+
+        assert cache.get_or_build('key', lambda: 1) == 1
+        assert cache.get_or_build('key', lambda: 2) == 2
+
+
+@pytest.mark.django_db
+class TestCatalogCacheInvalidation:
+    """Test that catalog writes invalidate cached API responses"""
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="pass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.sweet = Sweet.objects.create(
+            name="Cached Sweet",
+            category="Chocolate",
+            price=Decimal("2.00"),
+            quantity=5
+        )
+
+    def test_repeated_list_is_served_from_cache(self):
+        self.client.get("/api/sweets/")
+        hits = catalog_cache.stats()['hits']
+
+        response = self.client.get("/api/sweets/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert catalog_cache.stats()['hits'] == hits + 1
+
+    def test_purchase_keeps_the_cache_and_shows_current_stock(
+        self, django_capture_on_commit_callbacks
+    ):
+        url = f"/api/sweets/{self.sweet.id}/"
+        assert self.client.get(url).data["quantity"] == 5
+        assert self.client.get("/api/sweets/").data["results"][0]["quantity"] == 5
+        version = get_catalog_version()
+        hits = catalog_cache.stats()['hits']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.client.post(
+                f"/api/sweets/{self.sweet.id}/purchase/", {"quantity": 5}, format="json"
+            )
+        detail = self.client.get(url).data
+        listed = self.client.get("/api/sweets/?view=card").data["results"][0]
+        self.sweet.refresh_from_db()
+
+        assert get_catalog_version() == version
+        assert (detail["quantity"], detail["is_in_stock"]) == (0, False)
+        assert detail["updated_at"] == SweetSerializer(self.sweet).data["updated_at"]
+        assert (listed["quantity"], listed["is_in_stock"]) == (0, False)
+        assert "updated_at" not in listed
+        assert self.client.get("/api/sweets/").data["results"][0]["quantity"] == 0
+        assert catalog_cache.stats()['hits'] == hits + 2
+
+    def test_stock_dependent_reads_follow_stock(self):
+        self.client.get("/api/sweets/search/?in_stock=true")
+        self.client.get("/api/sweets/facets/")
+        self.client.post(f"/api/sweets/{self.sweet.id}/purchase/", {"quantity": 5}, format="json")
+
+        search = self.client.get("/api/sweets/search/?in_stock=true")
+        facets = self.client.get("/api/sweets/facets/")
+
+        assert search.data["results"] == []
+        assert facets.data["stock"] == {"in_stock": 0, "out_of_stock": 1}
+
+    def test_save_bumps_shared_version(self, django_capture_on_commit_callbacks):
+        before = get_catalog_version()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.sweet.save()
+
+        assert get_catalog_version()[0] == before[0] + 1
@@ -0,0 +1,138 @@
+"""
+Tests for Delta Sync (GET /api/sweets/changes/)
+"""
+
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.sweets.changes import decode_watermark, encode_watermark
+from apps.sweets.models import Sweet, SweetTombstone
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestChanges:
+    """Test incremental catalog sync"""
+
+    @pytest.fixture(autouse=True)
+    def no_settle_delay(self, settings):
+        settings.CHANGES_SETTLE_SECONDS = 0
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            username="admin",
+            password="admin123",
+            is_admin=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.sweets = [
+            Sweet.objects.create(
+                name=f"Sync Sweet {i}", price=Decimal("1.00"), quantity=i
+            )
+            for i in range(5)
+        ]
+        self.url = "/api/sweets/changes/"
+
+    def sync(self, since=None, **params):
+        if since:
+            params["since"] = since
+        response = self.client.get(self.url, params)
+        assert response.status_code == status.HTTP_200_OK, response.data
+        return response.data
+
+    def test_first_sync_returns_whole_catalog(self):
+        data = self.sync()
+
+        assert [item["id"] for item in data["results"]] == [s.id for s in self.sweets]
+        assert data["deleted"] == []
+        assert data["has_more"] is False
+        assert self.sync(data["next"])["results"] == []
+
+    def test_pages_cover_every_change_once(self):
+        seen = []
+        data = self.sync(page_size=2)
+        seen += [item["id"] for item in data["results"]]
+        while data["has_more"]:
+            data = self.sync(data["next"], page_size=2)
+            seen += [item["id"] for item in data["results"]]
+
+        assert seen == [s.id for s in self.sweets]
+
+    def test_updates_and_deletes_since_watermark(self):
+        watermark = self.sync()["next"]
+        self.client.put(f"/api/sweets/{self.sweets[1].id}/", {
+            "name": "Renamed", "category": "Other", "price": "2.00", "quantity": 3
+        }, format="json")
+        self.client.delete(f"/api/sweets/{self.sweets[2].id}/")
+        self.client.delete(
+            "/api/sweets/bulk/", {"ids": [self.sweets[3].id]}, format="json"
+        )
+
+        data = self.sync(watermark)
+
+        assert [item["name"] for item in data["results"]] == ["Renamed"]
+        assert sorted(data["deleted"]) == [self.sweets[2].id, self.sweets[3].id]
+
+    def test_purchases_show_up_as_changes(self):
+        watermark = self.sync()["next"]
+
+        self.client.post(f"/api/sweets/{self.sweets[4].id}/purchase/", {"quantity": 1}, format="json")
+
+        assert [item["quantity"] for item in self.sync(watermark)["results"]] == [3]
+
+    def test_sparse_fieldset(self):
+        data = self.sync(fields="id,quantity")
+
+        assert data["results"][0] == {"id": self.sweets[0].id, "quantity": 0}
+
+    def test_recent_changes_are_held_back(self, settings):
+        settings.CHANGES_SETTLE_SECONDS = 60
+
+        data = self.sync()
+
+        assert data["results"] == []
+        assert decode_watermark(data["next"])[0].year == 1970
+
+    def test_since_accepts_timestamp(self):
+        moment = (timezone.now() + timedelta(minutes=1)).isoformat()
+
+        assert self.sync(moment)["results"] == []
+
+    def test_watermark_round_trip(self):
+        position = (timezone.now(), 42)
+
+        assert decode_watermark(encode_watermark(position)) == position
+
+    def test_invalid_since_returns_400(self):
+        response = self.client.get(self.url, {"since": "yesterday"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_expired_watermark_returns_410(self, settings):
+        settings.CHANGES_TOMBSTONE_RETENTION_DAYS = 1
+        old = (timezone.now() - timedelta(days=2)).isoformat()
+
+        response = self.client.get(self.url, {"since": old})
+
+        assert response.status_code == status.HTTP_410_GONE
+
+    def test_purge_tombstones(self):
+        SweetTombstone.objects.create(
+            sweet_id=1001, deleted_at=timezone.now() - timedelta(days=365)
+        )
+        SweetTombstone.objects.create(sweet_id=1002)
+
+        call_command("purge_tombstones", stdout=StringIO())
+
+        assert list(SweetTombstone.objects.values_list("sweet_id", flat=True)) == [1002]
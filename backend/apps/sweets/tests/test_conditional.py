@@ -0,0 +1,164 @@
+"""
+Tests for Conditional GET and If-Match on Sweet Endpoints
+"""
+
+import pytest
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.sweets.models import Sweet
+from apps.sweets.views import SweetViewSet
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    """Test ETag / Last-Modified on list, retrieve and search"""
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="pass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.sweet = Sweet.objects.create(
+            name="Etag Sweet",
+            category="Chocolate",
+            price=Decimal("2.00"),
+            quantity=5
+        )
+
+    @pytest.mark.parametrize("url", ["/api/sweets/", "/api/sweets/search/?q=etag"])
+    def test_matching_etag_returns_304_without_serializing(self, url):
+        first = self.client.get(url)
+        assert first.status_code == status.HTTP_200_OK
+        assert first["Last-Modified"]
+        assert "no-cache" in first["Cache-Control"]
+
+        with mock.patch.object(SweetViewSet, "get_page_data") as build:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == first["ETag"]
+        assert not response.content
+        build.assert_not_called()
+
+    def test_etag_differs_per_page(self):
+        first = self.client.get("/api/sweets/")
+        other = self.client.get("/api/sweets/", {"page_size": 1})
+
+        assert first["ETag"] != other["ETag"]
+
+    def test_catalog_change_gives_new_etag(self, django_capture_on_commit_callbacks):
+        first = self.client.get("/api/sweets/")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Sweet.objects.create(name="Another", price=Decimal("1.00"), quantity=1)
+
+        response = self.client.get("/api/sweets/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 2
+
+    def test_stock_change_gives_new_etag(self):
+        first = self.client.get("/api/sweets/")
+
+        self.client.post(f"/api/sweets/{self.sweet.id}/purchase/", {"quantity": 1}, format="json")
+        response = self.client.get("/api/sweets/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"][0]["quantity"] == 4
+
+    def test_retrieve_returns_304_for_current_etag(self):
+        url = f"/api/sweets/{self.sweet.id}/"
+        first = self.client.get(url)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_retrieve_etag_changes_after_purchase(self):
+        url = f"/api/sweets/{self.sweet.id}/"
+        first = self.client.get(url)
+        self.client.post(f"{url}purchase/", {"quantity": 1}, format="json")
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != first["ETag"]
+
+    def test_retrieve_etag_depends_on_the_fields_selected(self):
+        url = f"/api/sweets/{self.sweet.id}/"
+        full = self.client.get(url)
+        card = self.client.get(url, {"view": "card"})
+        some = self.client.get(url, {"fields": "name,price"})
+
+        assert len({full["ETag"], card["ETag"], some["ETag"]}) == 3
+        # A projection is not a copy of the full sweet, nor of another projection
+        stale_card = self.client.get(url, {"view": "card"}, HTTP_IF_NONE_MATCH=full["ETag"])
+        stale_full = self.client.get(url, HTTP_IF_NONE_MATCH=some["ETag"])
+        assert stale_card.status_code == status.HTTP_200_OK
+        assert stale_full.status_code == status.HTTP_200_OK
+        # The same fields in another order are the same representation
+        response = self.client.get(url, {"fields": "price,name"}, HTTP_IF_NONE_MATCH=some["ETag"])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+class TestUpdateIfMatch:
+    """Test optimistic concurrency on PUT /api/sweets/:id/"""
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            username="admin",
+            password="admin123",
+            is_admin=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.sweet = Sweet.objects.create(
+            name="Old Name",
+            category="Chocolate",
+            price=Decimal("2.50"),
+            quantity=10
+        )
+        self.url = f"/api/sweets/{self.sweet.id}/"
+        self.data = {
+            "name": "New Name",
+            "category": "Chocolate",
+            "price": "2.50",
+            "quantity": 10,
+        }
+
+    def test_update_with_current_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.put(self.url, self.data, format="json", HTTP_IF_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+    def test_update_with_stale_etag_is_rejected(self):
+        etag = self.client.get(self.url)["ETag"]
+        Sweet.objects.filter(pk=self.sweet.pk).update(quantity=3)
+        self.sweet.refresh_from_db()
+        self.sweet.save()
+
+        response = self.client.put(self.url, self.data, format="json", HTTP_IF_MATCH=etag)
+
+        assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+        self.sweet.refresh_from_db()
+        assert self.sweet.name == "Old Name"
+
+    def test_update_without_if_match_still_allowed(self):
+        response = self.client.put(self.url, self.data, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
@@ -0,0 +1,177 @@
+"""
+Tests for the Streaming Catalog Export
+"""
+
+import csv
+import io
+import json
+import tracemalloc
+import pytest
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.sweets.benchmarks import seed_sweets
+from apps.sweets.models import Sweet
+from apps.sweets.serializers import SweetSerializer
+
+User = get_user_model()
+
+
+def make_admin_client():
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(
+        email="admin@example.com",
+        username="admin",
+        password="admin123",
+        is_admin=True
+    ))
+    return client
+
+
+@pytest.mark.django_db
+class TestCatalogExport:
+    """Test GET /api/sweets/export/"""
+
+    def setup_method(self):
+        self.client = make_admin_client()
+        self.chocolate = Sweet.objects.create(
+            name="Export Truffle",
+            category="Chocolate",
+            price=Decimal("4.10"),
+            quantity=3,
+            description="Line one, with a comma"
+        )
+        self.gummy = Sweet.objects.create(
+            name="Export Bears",
+            category="Gummy",
+            price=Decimal("1.00"),
+            quantity=0
+        )
+        self.url = "/api/sweets/export/"
+
+    def test_ndjson_export_matches_serializer(self):
+        response = self.client.get(self.url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/x-ndjson"
+        assert response.streaming
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        expected = SweetSerializer(Sweet.objects.order_by("name", "id"), many=True).data
+        assert [json.loads(line) for line in lines] == json.loads(json.dumps(expected))
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {"type": "csv", "fields": "id,name,description"})
+
+        assert response["Content-Type"] == "text/csv; charset=utf-8"
+        assert "sweets.csv" in response["Content-Disposition"]
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        assert rows == [
+            ["id", "name", "description"],
+            [str(self.gummy.id), "Export Bears", ""],
+            [str(self.chocolate.id), "Export Truffle", "Line one, with a comma"],
+        ]
+
+    def test_export_applies_search_filters(self):
+        response = self.client.get(self.url, {"category": "Gummy", "fields": "name"})
+
+        assert b"".join(response.streaming_content) == b'{"name":"Export Bears"}\n'
+
+    def test_invalid_type_returns_400(self):
+        response = self.client.get(self.url, {"type": "xlsx"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "Invalid type value" in response.data["error"]
+
+    def test_invalid_filter_returns_400(self):
+        response = self.client.get(self.url, {"max_price": "lots"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_export_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="pass123"
+        ))
+
+        response = client.get(self.url)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def measure_export(client):
+    """(bytes exported, peak traced memory) for one streamed export"""
+    tracemalloc.start()
+    try:
+        response = client.get("/api/sweets/export/")
+        exported = sum(len(chunk) for chunk in response.streaming_content)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return exported, peak
+
+
+@pytest.mark.django_db
+def test_export_memory_stays_flat():
+    """Peak memory does not grow with the catalog and stays under a ceiling"""
+    client = make_admin_client()
+    seed_sweets(5000)
+    measure_export(client)
+    small, small_peak = measure_export(client)
+
+    seed_sweets(45000, offset=5000)
+    large, large_peak = measure_export(client)
+
+    assert large > 9 * small
+    assert large_peak < small_peak * 1.5, f"{small_peak:,} -> {large_peak:,} bytes"
+    assert large_peak < 8 * 1024 * 1024
+
+
+def measure_asgi_export(user):
+    """(bytes exported, chunks, peak traced memory) for one export served by ASGI"""
+
+    async def scenario():
+        token = RefreshToken.for_user(user).access_token
+        response = await AsyncClient().get(
+            "/api/sweets/export/", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.is_async
+        exported = chunks = 0
+        async for chunk in response.streaming_content:
+            exported += len(chunk)
+            chunks += 1
+        return exported, chunks
+
+    tracemalloc.start()
+    try:
+        exported, chunks = async_to_sync(scenario)()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return exported, chunks, peak
+
+
+@pytest.mark.django_db
+def test_asgi_export_streams_with_flat_memory():
+    """Served by ASGI, the export is sent chunk by chunk, not read whole first"""
+    admin = User.objects.create_user(
+        email="admin@example.com", username="admin", password="admin123", is_admin=True
+    )
+    seed_sweets(5000)
+    measure_asgi_export(admin)
+    small, _, small_peak = measure_asgi_export(admin)
+
+    seed_sweets(45000, offset=5000)
+    large, chunks, large_peak = measure_asgi_export(admin)
+
+    assert large > 9 * small
+    assert chunks >= 25
+    assert large_peak < small_peak * 1.5, f"{small_peak:,} -> {large_peak:,} bytes"
+    assert large_peak < 8 * 1024 * 1024
@@ -0,0 +1,100 @@
+"""
+Tests for Catalog Facets
+"""
+
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+
+def facet_queries(queries):
+    """Queries that read sweets, other than the stock_changed_at() probe"""
+    return [
+        q for q in queries
+        if 'FROM "sweets"' in q["sql"] and 'MAX("sweets"."updated_at")' not in q["sql"]
+    ]
+
+
+@pytest.mark.django_db
+class TestFacets:
+    """Test GET /api/sweets/facets/"""
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="pass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        for name, category, price, quantity in [
+            ("Milk Chocolate Bar", "Chocolate", "1.50", 10),
+            ("Dark Chocolate Bar", "Chocolate", "2.50", 0),
+            ("Chocolate Gummies", "Gummy", "0.80", 5),
+            ("Sour Worms", "Sour", "25.00", 3),
+        ]:
+            Sweet.objects.create(
+                name=name, category=category, price=Decimal(price), quantity=quantity
+            )
+        self.url = "/api/sweets/facets/"
+
+    def counts(self, facet):
+        return {entry["value"]: entry["count"] for entry in facet if entry["count"]}
+
+    def test_facets_for_whole_catalog(self):
+        response = self.client.get(self.url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["total"] == 4
+        assert self.counts(response.data["categories"]) == {
+            "Chocolate": 2, "Gummy": 1, "Sour": 1
+        }
+        assert len(response.data["categories"]) == len(Sweet.CATEGORY_CHOICES)
+        assert response.data["stock"] == {"in_stock": 3, "out_of_stock": 1}
+        price = response.data["price"]
+        assert (price["min"], price["max"]) == ("0.80", "25.00")
+        assert [bucket["count"] for bucket in price["histogram"]] == [1, 1, 1, 0, 0, 1]
+        assert price["histogram"][-1] == {"min": "20.00", "max": None, "count": 1}
+
+    def test_facets_follow_search_filters(self):
+        response = self.client.get(self.url, {"q": "chocolate", "in_stock": "true"})
+
+        assert response.data["total"] == 2
+        assert self.counts(response.data["categories"]) == {"Chocolate": 1, "Gummy": 1}
+        assert response.data["stock"] == {"in_stock": 2, "out_of_stock": 0}
+
+    def test_facets_of_empty_result(self):
+        response = self.client.get(self.url, {"category": "Lollipop"})
+
+        assert response.data["total"] == 0
+        assert response.data["price"]["min"] is None
+
+    def test_facets_use_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {"max_price": "3"})
+
+        assert len(facet_queries(queries)) == 1
+
+    def test_equivalent_filters_share_a_cache_entry(self):
+        self.client.get(self.url, {"min_price": "1", "q": "Chocolate "})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"q": "chocolate", "min_price": "1.00"})
+
+        assert response.data["total"] == 2
+        assert not facet_queries(queries)
+
+    def test_invalid_filter_returns_400(self):
+        response = self.client.get(self.url, {"in_stock": "perhaps"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["error"] == "Invalid in_stock value"
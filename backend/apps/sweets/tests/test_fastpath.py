@@ -0,0 +1,74 @@
+"""
+Tests for the values_list() Read Fast Path
+"""
+
+import datetime
+import pytest
+from decimal import Decimal
+
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from apps.sweets.fastpath import SweetRowSerializer
+from apps.sweets.models import Sweet
+from apps.sweets.projections import PROJECTIONS
+from apps.sweets.serializers import SweetSerializer
+
+
+@pytest.mark.django_db
+class TestSweetRowSerializer:
+    """Fast path output must match SweetSerializer(many=True) byte for byte"""
+
+    def setup_method(self):
+        Sweet.objects.create(
+            name="Fast Fudge",
+            category="Other",
+            price=Decimal("3.50"),
+            quantity=0,
+            description='Quotes " and unicode é'
+        )
+        Sweet.objects.create(
+            name="Quick Chews",
+            category="Gummy",
+            price=Decimal("12.00"),
+            quantity=7
+        )
+        # A whole-second timestamp, which isoformat() renders without micros
+        Sweet.objects.filter(name="Quick Chews").update(
+            updated_at=datetime.datetime(2024, 5, 1, 9, 30, tzinfo=datetime.timezone.utc)
+        )
+
+    def render_both(self, fields=None):
+        queryset = Sweet.objects.order_by("name", "id")
+        rows = SweetRowSerializer(fields)
+        renderer = JSONRenderer()
+
+        expected = renderer.render(SweetSerializer(queryset, many=True, fields=fields).data)
+        actual = renderer.render(rows.to_representation(rows.select(queryset)))
+        return expected, actual
+
+    @pytest.mark.parametrize("fields", [
+        None,
+        PROJECTIONS["card"],
+        ("id", "name"),
+        ("updated_at", "price"),
+        ("is_in_stock",),
+    ])
+    def test_output_is_byte_identical(self, fields):
+        expected, actual = self.render_both(fields)
+
+        assert actual == expected
+
+    def test_output_is_byte_identical_in_other_time_zone(self):
+        with timezone.override("Asia/Kolkata"):
+            expected, actual = self.render_both()
+
+        assert actual == expected
+        assert b"+05:30" in actual
+
+    def test_select_adds_ordering_columns(self):
+        rows = SweetRowSerializer(("id",))
+
+        row = rows.select(Sweet.objects.all(), ("-quantity", "name", "id")).first()
+
+        assert row._fields == ("id", "name", "quantity")
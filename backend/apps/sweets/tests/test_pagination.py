@@ -0,0 +1,117 @@
+"""
+Tests for Sweet Cursor Pagination
+"""
+
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestSweetCursorPagination:
+    """Test cursor pagination on GET /api/sweets/ and /api/sweets/search/"""
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="pass123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+        # Duplicate names force the id tie-breaker to do its job
+        for index in range(7):
+            Sweet.objects.create(
+                name=f"Sweet {index // 2}",
+                category="Chocolate" if index % 2 else "Gummy",
+                price=Decimal("2.00"),
+                quantity=index
+            )
+
+        self.url = "/api/sweets/"
+
+    def walk(self, url, params=None):
+        """Follow `next` links and return every page's ids"""
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            pages.append([item["id"] for item in response.data["results"]])
+            if not response.data["next"]:
+                return pages
+            response = self.client.get(response.data["next"])
+
+    def test_first_page_honours_page_size(self):
+        response = self.client.get(self.url, {"page_size": 3})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 3
+        assert response.data["next"] is not None
+        assert response.data["previous"] is None
+        assert "count" not in response.data
+
+    def test_walk_visits_every_sweet_once_in_order(self):
+        pages = self.walk(self.url, {"page_size": 2})
+
+        expected = list(
+            Sweet.objects.order_by("name", "id").values_list("id", flat=True)
+        )
+        assert [len(page) for page in pages] == [2, 2, 2, 1]
+        assert [sweet_id for page in pages for sweet_id in page] == expected
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get(self.url, {"page_size": 3})
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+
+        assert back.data["results"] == first.data["results"]
+        assert back.data["previous"] is None
+        assert back.data["next"] is not None
+
+    def test_cursor_is_stable_when_rows_are_inserted(self):
+        first = self.client.get(self.url, {"page_size": 3})
+        Sweet.objects.create(
+            name="AAA New Arrival",
+            category="Other",
+            price=Decimal("1.00"),
+            quantity=1
+        )
+        second = self.client.get(first.data["next"])
+
+        seen = {item["id"] for item in first.data["results"]}
+        assert not seen & {item["id"] for item in second.data["results"]}
+
+    def test_page_size_is_capped(self):
+        Sweet.objects.bulk_create([
+            Sweet(name=f"Bulk {index:03}", price=Decimal("1.00"), quantity=1)
+            for index in range(120)
+        ])
+
+        response = self.client.get(self.url, {"page_size": 1000})
+
+        assert len(response.data["results"]) == 100
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_list_does_not_count_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {"page_size": 2})
+
+        assert not any("COUNT(" in query["sql"] for query in queries)
+
+    def test_search_results_are_paginated(self):
+        pages = self.walk("/api/sweets/search/", {"category": "Gummy", "page_size": 3})
+
+        assert [len(page) for page in pages] == [3, 1]
@@ -0,0 +1,94 @@
+"""
+Tests for Sparse Fieldsets (?fields= and ?view=)
+"""
+
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.sweets.models import Sweet
+from apps.sweets.projections import PROJECTIONS
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+    """Test field selection on sweet read endpoints"""
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="pass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.sweet = Sweet.objects.create(
+            name="Fieldset Fudge",
+            category="Other",
+            price=Decimal("3.25"),
+            quantity=0,
+            description="A very long description " * 20
+        )
+
+    def test_list_returns_only_requested_fields(self):
+        response = self.client.get("/api/sweets/", {"fields": "id,name,price,quantity"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"] == [{
+            "id": self.sweet.id,
+            "name": "Fieldset Fudge",
+            "price": "3.25",
+            "quantity": 0,
+        }]
+
+    def test_unrequested_columns_are_not_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/sweets/", {"fields": "id,name,price"})
+
+        page_query = next(q["sql"] for q in queries if 'FROM "sweets"' in q["sql"])
+        assert '"description"' not in page_query
+        assert '"search_vector"' not in page_query
+
+    def test_card_view(self):
+        response = self.client.get("/api/sweets/", {"view": "card"})
+
+        item = response.data["results"][0]
+        assert tuple(item) == PROJECTIONS["card"]
+        assert item["is_in_stock"] is False
+
+    def test_retrieve_with_fields(self):
+        response = self.client.get(
+            f"/api/sweets/{self.sweet.id}/", {"fields": "name,is_in_stock"}
+        )
+
+        assert response.data == {"name": "Fieldset Fudge", "is_in_stock": False}
+
+    def test_retrieve_caches_each_fieldset_separately(self):
+        url = f"/api/sweets/{self.sweet.id}/"
+        self.client.get(url, {"fields": "name"})
+
+        response = self.client.get(url)
+
+        assert "description" in response.data
+
+    def test_ranked_search_with_fields(self):
+        response = self.client.get("/api/sweets/search/", {"q": "fudge", "fields": "id"})
+
+        assert response.data["results"] == [{"id": self.sweet.id}]
+
+    def test_unknown_field_returns_400(self):
+        response = self.client.get("/api/sweets/", {"fields": "id,password"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_unknown_view_returns_400(self):
+        response = self.client.get("/api/sweets/", {"view": "poster"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,318 @@
+"""
+Tests for Real-time Stock Updates
+"""
+
+import asyncio
+import json
+import select
+import socket
+import psycopg2
+import pytest
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import AsyncClient
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.inventory import services
+from apps.sweets.models import Sweet
+from apps.sweets import realtime
+from apps.sweets.realtime import (
+    MAX_PAYLOAD_BYTES,
+    StockHub,
+    _open_listener,
+    issue_stream_ticket,
+    publish_stock,
+    redeem_stream_ticket,
+    sse_message,
+    stock_hub,
+)
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def close_stock_hub():
+    yield
+    # A leftover LISTEN connection would keep the test database in use
+    stock_hub.close()
+
+
+def received(listener, timeout=2):
+    """Deltas of every notification that reaches `listener` within `timeout`"""
+    deltas = []
+    while select.select([listener], [], [], timeout)[0]:
+        listener.poll()
+        while listener.notifies:
+            deltas.append(json.loads(listener.notifies.pop(0).payload))
+        timeout = 0.2
+    return deltas
+
+
+@pytest.mark.django_db(transaction=True)
+class TestPublishStock:
+    """Test NOTIFY of stock deltas"""
+
+    def setup_method(self):
+        self.listener = _open_listener()
+
+    def teardown_method(self):
+        self.listener.close()
+
+    def test_delivered_on_commit(self):
+        sweet = Sweet(id=7, name="Fudge", price=Decimal("2.5"), quantity=9)
+
+        with transaction.atomic():
+            publish_stock([sweet])
+            assert received(self.listener, timeout=0.2) == []
+
+        assert received(self.listener) == [[{'id': 7, 'quantity': 9, 'price': '2.50'}]]
+
+    def test_rollback_sends_nothing(self):
+        with transaction.atomic():
+            publish_stock([{'id': 1, 'quantity': 0, 'price': Decimal('1.00')}])
+            transaction.set_rollback(True)
+
+        assert received(self.listener, timeout=0.2) == []
+
+    def test_large_batches_are_split(self):
+        deltas = [{'id': n, 'quantity': n, 'price': Decimal('1.25')} for n in range(1000)]
+
+        publish_stock(deltas)
+
+        payloads = received(self.listener)
+        assert len(payloads) > 1
+        assert all(len(json.dumps(payload, separators=(',', ':'))) <= MAX_PAYLOAD_BYTES
+                   for payload in payloads)
+        assert [delta['id'] for payload in payloads for delta in payload] == list(range(1000))
+
+
+class TestStockHub:
+    """Test fan-out to subscriber queues"""
+
+    def setup_method(self):
+        self.hub = StockHub(queue_size=2)
+
+        async def listening():
+            pass
+        # These tests never need the database listener
+        self.hub._ensure_listening = listening
+
+    def test_broadcast_reaches_every_subscriber(self):
+        async def scenario():
+            first, second = await self.hub.subscribe(), await self.hub.subscribe()
+            self.hub.broadcast(b'message')
+            return first.get_nowait(), second.get_nowait()
+
+        assert async_to_sync(scenario)() == (b'message', b'message')
+
+    def test_slow_subscriber_is_dropped(self):
+        async def scenario():
+            queue = await self.hub.subscribe()
+            for number in range(3):
+                self.hub.broadcast(f'message {number}')
+            return queue, [queue.get_nowait() for _ in range(queue.qsize())]
+
+        queue, messages = async_to_sync(scenario)()
+
+        assert messages == ['message 1', None]
+        assert queue not in self.hub.subscribers
+
+    def test_stream_sends_events_and_unsubscribes_when_dropped(self, settings):
+        settings.STOCK_STREAM_KEEPALIVE_SECONDS = 0.05
+        event = sse_message({'id': 1, 'quantity': 3, 'price': '1.00'})
+
+        async def scenario():
+            chunks = []
+            async for chunk in self.hub.stream():
+                chunks.append(chunk)
+                if chunk.startswith(b': keepalive'):
+                    self.hub.broadcast(event)
+                elif chunk == event:
+                    # Overflow the queue so the stream is dropped
+                    for _ in range(3):
+                        self.hub.broadcast(event)
+            return chunks
+
+        chunks = async_to_sync(scenario)()
+
+        assert chunks[0] == b'retry: 3000\n\n'
+        assert chunks[1:3] == [b': keepalive\n\n', event]
+        assert event == b'event: stock\ndata: {"id":1,"quantity":3,"price":"1.00"}\n\n'
+        assert not self.hub.subscribers
+
+
+class FakeListener:
+    """Stands in for the LISTEN connection; poll() fails once `lost` is set"""
+
+    def __init__(self):
+        self.socket, self.peer = socket.socketpair()
+        self.notifies = []
+        self.lost = False
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def poll(self):
+        if self.lost:
+            raise psycopg2.OperationalError('server closed the connection')
+
+    def close(self):
+        self.socket.close()
+        self.peer.close()
+
+
+class TestStockHubListener:
+    """Test connecting, losing and reconnecting the listener"""
+
+    def setup_method(self):
+        self.hub = StockHub()
+        self.listeners = []
+
+    def teardown_method(self):
+        for listener in filter(None, self.listeners):
+            listener.close()
+
+    def open_after(self, failures):
+        """An _open_listener that fails `failures` times, then connects"""
+        def open_listener():
+            if len(self.listeners) < failures:
+                self.listeners.append(None)
+                raise psycopg2.OperationalError('connection refused')
+            listener = FakeListener()
+            self.listeners.append(listener)
+            return listener
+        return open_listener
+
+    def test_connect_retries_until_the_database_is_back(self, monkeypatch):
+        monkeypatch.setattr(realtime, 'RECONNECT_SECONDS', 0.01)
+        monkeypatch.setattr(realtime, '_open_listener', self.open_after(3))
+
+        async def scenario():
+            await asyncio.wait_for(self.hub.subscribe(), timeout=2)
+            connected = self.hub._connection
+            self.hub.close()
+            return connected
+
+        assert async_to_sync(scenario)() is self.listeners[-1]
+        assert len(self.listeners) == 4
+
+    def test_losing_the_listener_ends_every_stream_and_reconnects(self, monkeypatch):
+        monkeypatch.setattr(realtime, 'RECONNECT_SECONDS', 0.01)
+        monkeypatch.setattr(realtime, '_open_listener', self.open_after(1))
+
+        async def scenario():
+            first, second = await self.hub.subscribe(), await self.hub.subscribe()
+            lost = self.hub._connection
+            lost.lost = True
+            # Wake the reader as a closed connection would
+            lost.peer.send(b'x')
+            ended = [await asyncio.wait_for(queue.get(), timeout=2) for queue in (first, second)]
+            await asyncio.wait_for(asyncio.shield(self.hub._starting), timeout=2)
+            reconnected = self.hub._connection
+            self.hub.close()
+            return ended, lost, reconnected
+
+        ended, lost, reconnected = async_to_sync(scenario)()
+
+        assert ended == [None, None]
+        assert not self.hub.subscribers
+        assert reconnected is not None and reconnected is not lost
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures('asgi_routes')
+class TestStockStreamView:
+    """Test GET /api/sweets/stream/"""
+
+    def setup_method(self):
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="user123"
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.sweet = Sweet.objects.create(
+            name="Toffee", category="Other", price=Decimal("1.50"), quantity=10
+        )
+
+    def next_event(self, change, headers=None):
+        """Open a stream, make `change`, and return the first stock event"""
+        url = '/api/sweets/stream/'
+        if not headers:
+            url += f'?ticket={issue_stream_ticket(self.user)}'
+
+        async def scenario():
+            response = await AsyncClient().get(url, headers=headers)
+            assert response['Content-Type'] == 'text/event-stream'
+            chunks = aiter(response.streaming_content)
+            assert await anext(chunks) == b'retry: 3000\n\n'
+            await sync_to_async(change)()
+            return await asyncio.wait_for(anext(chunks), 5)
+
+        return async_to_sync(scenario)()
+
+    def test_requires_authentication(self):
+        response = APIClient().get('/api/sweets/stream/')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_rejects_invalid_ticket(self):
+        response = APIClient().get('/api/sweets/stream/?ticket=nonsense')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_rejects_jwt_in_the_url(self):
+        response = APIClient().get(f'/api/sweets/stream/?token={self.token}')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_ticket_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post('/api/sweets/stream/ticket/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['expires_in'] == 30
+        assert redeem_stream_ticket(response.data['ticket']) == self.user
+        assert APIClient().post('/api/sweets/stream/ticket/').status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_ticket_is_single_use(self):
+        ticket = issue_stream_ticket(self.user)
+
+        assert redeem_stream_ticket(ticket) == self.user
+        assert redeem_stream_ticket(ticket) is None
+
+    def test_ticket_expires(self, settings):
+        settings.STOCK_STREAM_TICKET_SECONDS = -1
+        ticket = issue_stream_ticket(self.user)
+
+        assert redeem_stream_ticket(ticket) is None
+
+    def test_ticket_of_deactivated_user(self):
+        ticket = issue_stream_ticket(self.user)
+        self.user.is_active = False
+        self.user.save()
+
+        assert redeem_stream_ticket(ticket) is None
+
+    def test_purchase_is_pushed(self):
+        event = self.next_event(lambda: services.purchase(self.sweet.id, 3))
+        assert event == b'event: stock\ndata: {"id":%d,"quantity":7,"price":"1.50"}\n\n' % self.sweet.id
+
+    def test_restock_is_pushed_with_bearer_header(self):
+        event = self.next_event(
+            lambda: services.restock(self.sweet.id, 5),
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        assert b'"quantity":15' in event
+
+    def test_admin_edit_is_pushed(self):
+        def edit():
+            self.sweet.price = Decimal("1.75")
+            self.sweet.save()
+
+        event = self.next_event(edit)
+        assert b'"price":"1.75"' in event
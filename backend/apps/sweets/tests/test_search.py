@@ -0,0 +1,112 @@
+"""
+Tests for Sweet Full-Text Search
+"""
+
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.sweets.models import Sweet
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestSweetFullTextSearch:
+    """Test ranked search on GET /api/sweets/search/"""
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com",
+            username="user",
+            password="pass123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+        Sweet.objects.create(
+            name="Caramel Fudge",
+            category="Other",
+            price=Decimal("3.00"),
+            quantity=4,
+            description="Soft fudge swirled with dark chocolate"
+        )
+        Sweet.objects.create(
+            name="Chocolate Buttons",
+            category="Chocolate",
+            price=Decimal("1.20"),
+            quantity=30,
+            description="Small discs of milk chocolate"
+        )
+        Sweet.objects.create(
+            name="Lemon Drops",
+            category="Hard Candy",
+            price=Decimal("0.90"),
+            quantity=12,
+            description="Tangy boiled sweets"
+        )
+
+        self.url = "/api/sweets/search/"
+
+    def names(self, response):
+        return [item["name"] for item in response.data["results"]]
+
+    def test_search_matches_description(self):
+        response = self.client.get(self.url, {"q": "chocolate"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(self.names(response)) == {"Caramel Fudge", "Chocolate Buttons"}
+
+    def test_name_matches_rank_above_description_matches(self):
+        response = self.client.get(self.url, {"q": "chocolate"})
+
+        assert self.names(response)[0] == "Chocolate Buttons"
+
+    def test_search_matches_word_stems(self):
+        response = self.client.get(self.url, {"q": "drop"})
+
+        assert self.names(response) == ["Lemon Drops"]
+
+    def test_search_matches_partial_name(self):
+        response = self.client.get(self.url, {"name": "ramel"})
+
+        assert self.names(response) == ["Caramel Fudge"]
+
+    def test_ranked_results_honour_filters(self):
+        response = self.client.get(
+            self.url, {"q": "chocolate", "category": "Other", "max_price": "5"}
+        )
+
+        assert self.names(response) == ["Caramel Fudge"]
+
+    def test_ranked_results_paginate_without_gaps(self):
+        first = self.client.get(self.url, {"q": "chocolate", "page_size": 1})
+        second = self.client.get(first.data["next"])
+
+        assert self.names(first) + self.names(second) == [
+            "Chocolate Buttons", "Caramel Fudge"
+        ]
+        assert second.data["next"] is None
+
+    def test_invalid_price_returns_400(self):
+        response = self.client.get(self.url, {"min_price": "cheap"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["error"] == "Invalid min_price value"
+
+    def test_in_stock_filter(self):
+        Sweet.objects.filter(name="Lemon Drops").update(quantity=0)
+
+        in_stock = self.client.get(self.url, {"in_stock": "true"})
+        sold_out = self.client.get(self.url, {"in_stock": "false"})
+
+        assert "Lemon Drops" not in self.names(in_stock)
+        assert self.names(sold_out) == ["Lemon Drops"]
+
+    def test_invalid_in_stock_returns_400(self):
+        response = self.client.get(self.url, {"in_stock": "maybe"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -99,4 +99,19 @@ class TestSweetSerializer:
         
         serializer = SweetSerializer(data=data)
         assert not serializer.is_valid()
-        assert 'quantity' in serializer.errors
\ No newline at end of file
+        assert 'quantity' in serializer.errors
+    
+    def test_serialize_subset_of_fields(self):
+        """
+        Test that `fields` limits the serialized representation
+        """
+        sweet = Sweet.objects.create(
+            name="Test Chocolate",
+            category="Chocolate",
+            price=Decimal("2.50"),
+            quantity=0
+        )
+        
+        data = SweetSerializer(sweet, fields=("name", "is_in_stock")).data
+        
+        assert data == {"name": "Test Chocolate", "is_in_stock": False}
@@ -44,7 +44,7 @@ class TestSweetListEndpoint:
         response = self.client.get(self.url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 2
+        assert len(response.data["results"]) == 2
 
     def test_list_sweets_unauthenticated(self):
         response = self.client.get(self.url)
@@ -314,27 +314,27 @@ class TestSweetSearchEndpoint:
     def test_search_by_name(self):
         response = self.client.get(self.url, {"name": "chocolate"})
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 2
+        assert len(response.data["results"]) == 2
 
     def test_search_by_category(self):
         response = self.client.get(self.url, {"category": "Gummy"})
-        assert len(response.data) == 1
-        assert response.data[0]["name"] == "Gummy Bears"
+        assert len(response.data["results"]) == 1
+        assert response.data["results"][0]["name"] == "Gummy Bears"
 
     def test_search_by_price_range(self):
         response = self.client.get(
             self.url, {"min_price": "2.00", "max_price": "3.00"}
         )
-        assert len(response.data) == 2
+        assert len(response.data["results"]) == 2
 
     def test_search_with_multiple_filters(self):
         response = self.client.get(
             self.url, {"name": "chocolate", "min_price": "3.00"}
         )
-        assert len(response.data) == 1
-        assert response.data[0]["name"] == "Dark Chocolate Truffle"
+        assert len(response.data["results"]) == 1
+        assert response.data["results"][0]["name"] == "Dark Chocolate Truffle"
 
     def test_search_no_results(self):
         response = self.client.get(self.url, {"name": "nonexistent"})
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 0
+        assert len(response.data["results"]) == 0
@@ -2,7 +2,8 @@
 URL Configuration for Sweets API
 """
 
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 
@@ -12,4 +13,24 @@ router.register(r'', views.SweetViewSet, basename='sweet')
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if settings.SERVER_MODE == 'asgi':
+    # Async catalog reads and the live stock stream, ahead of the router's
+    # sync routes for the same URLs
+    urlpatterns = [
+        path('stream/', views.stock_stream, name='sweet-stream'),
+        path('stream/ticket/', views.stream_ticket, name='sweet-stream-ticket'),
+        path('', views.SweetViewSet.as_async_view(
+            {'get': 'list', 'post': 'create'}
+        ), name='sweet-list'),
+        path('search/', views.SweetViewSet.as_async_view(
+            {'get': 'search'}
+        ), name='sweet-search'),
+        re_path(r'^(?P<pk>\d+)/$', views.SweetViewSet.as_async_view({
+            'get': 'retrieve',
+            'put': 'update',
+            'patch': 'partial_update',
+            'delete': 'destroy',
+        }), name='sweet-detail'),
+    ] + urlpatterns
\ No newline at end of file
@@ -3,41 +3,152 @@ API Views for Sweet Management
 Handles CRUD operations for sweets
 """
 
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, ParseError
+from rest_framework.pagination import _positive_int
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Q
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from .models import Sweet
-from .serializers import SweetSerializer
-from .permissions import IsAdminOrReadOnly
+from .serializers import BULK_MAX_ITEMS, SweetBulkDeleteSerializer, SweetSerializer
+from .fastpath import SweetRowSerializer, with_stock
+from .permissions import IsAdmin, IsAdminOrReadOnly
+from .pagination import SweetCursorPagination
+from .search import (
+    InvalidSearchParam,
+    filter_key,
+    filter_sweets,
+    search_filters,
+    search_sweets,
+)
+from .facets import facet_counts
+from .autocomplete import DEFAULT_LIMIT, MAX_LIMIT, name_index
+from .changes import (
+    CHANGES_MAX_PAGE_SIZE,
+    CHANGES_PAGE_SIZE,
+    ExpiredWatermark,
+    InvalidWatermark,
+    changes_since,
+    decode_watermark,
+)
+from .bulk_import import InvalidImportFile, import_sweets
+from .export import InvalidExportFormat, export_format, export_stream
+from .realtime import issue_stream_ticket, publish_stock, redeem_stream_ticket, stock_hub
+from .cache import (
+    acurrent_stock,
+    aget_catalog_version,
+    astock_changed_at,
+    bump_catalog_version,
+    catalog_cache,
+    current_stock,
+    get_catalog_version,
+    stock_changed_at,
+)
+from .async_views import AsyncReadMixin
+from .projections import InvalidProjection, columns_for, requested_fields
+from .conditional import (
+    catalog_validators,
+    evaluate_preconditions,
+    set_validators,
+    sweet_validators,
+)
 
+# Delete sweets and leave their tombstones for delta sync, in one statement
+BULK_DELETE_SQL = """
+    WITH deleted AS (
+        DELETE FROM sweets WHERE id = ANY(%s) RETURNING id
+    ), shards AS (
+        DELETE FROM stock_shards WHERE sweet_id IN (SELECT id FROM deleted)
+    ), reservations AS (
+        DELETE FROM stock_reservations WHERE sweet_id IN (SELECT id FROM deleted)
+    )
+    INSERT INTO sweet_tombstones (sweet_id, deleted_at)
+    SELECT id, clock_timestamp() FROM deleted
+    RETURNING sweet_id
+"""
 
 
-class SweetViewSet(viewsets.ModelViewSet):
+class SweetViewSet(AsyncReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for Sweet CRUD operations
     
     Endpoints:
-    - GET /api/sweets/ - List all sweets
+    - GET /api/sweets/ - List sweets (cursor paginated)
     - POST /api/sweets/ - Create new sweet (Admin only)
     - GET /api/sweets/:id/ - Get sweet details
     - PUT /api/sweets/:id/ - Update sweet (Admin only)
     - DELETE /api/sweets/:id/ - Delete sweet (Admin only)
+    - GET /api/sweets/autocomplete/ - Name suggestions from an in-memory index
+    - GET /api/sweets/changes/ - Sweets changed or deleted since a watermark
+    - GET /api/sweets/facets/ - Category, stock and price counts for a search
+    - POST/PUT/PATCH/DELETE /api/sweets/bulk/ - Write many sweets at once (Admin only)
+    - GET /api/sweets/export/ - Stream the catalog as NDJSON or CSV (Admin only)
+    - POST /api/sweets/import/ - Upsert sweets from a CSV or NDJSON file (Admin only)
+    
+    Reads carry ETag/Last-Modified and answer If-None-Match with 304;
+    PUT honours If-Match with the ETag returned by GET /api/sweets/:id/
+    (without ?fields= or ?view=, which have ETags of their own).
+    
+    Reads accept ?fields=id,name,price or ?view=card to return (and select
+    from the database) only some fields.
+    
+    Under ASGI, list/retrieve/search are served by their async versions
+    (alist/aretrieve/asearch, see async_views.py). Each pair shares the
+    read steps at the end of the class and differs only in how it awaits
+    the database.
     """
     
     queryset = Sweet.objects.all()
     serializer_class = SweetSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+    pagination_class = SweetCursorPagination
+    # Numeric ids only, so sibling routes like checkout/ are not swallowed
+    lookup_value_regex = r'\d+'
+    async_actions = {'list': 'alist', 'retrieve': 'aretrieve', 'search': 'asearch'}
+    
+    def initial(self, request, *args, **kwargs):
+        """Parse the sparse fieldset of read requests before any handler runs"""
+        super().initial(request, *args, **kwargs)
+        self.requested_fields = None
+        if request.method in ('GET', 'HEAD'):
+            try:
+                self.requested_fields = requested_fields(request.query_params)
+            except InvalidProjection as exc:
+                raise ParseError(str(exc))
+    
+    def get_queryset(self):
+        # The search document is never rendered, so never fetch it
+        queryset = super().get_queryset().defer('search_vector')
+        if getattr(self, 'requested_fields', None):
+            queryset = queryset.only(*columns_for(self.requested_fields))
+        return queryset
+    
+    def get_serializer(self, *args, **kwargs):
+        if getattr(self, 'requested_fields', None):
+            kwargs.setdefault('fields', self.requested_fields)
+        return super().get_serializer(*args, **kwargs)
     
     def list(self, request):
         """
-        List all sweets
-        GET /api/sweets/
+        List sweets one page at a time
+        GET /api/sweets/?cursor=<token>&page_size=20
         """
-        sweets = self.get_queryset()
-        serializer = self.get_serializer(sweets, many=True)
-        return Response(serializer.data)
+        return self.get_page_response(
+            request, lambda: self.get_page_data(self.get_queryset())
+        )
+    
+    async def alist(self, request):
+        return await self.aget_page_response(
+            request, lambda: self.aget_page_data(self.get_queryset())
+        )
     
     def create(self, request):
         """
@@ -56,9 +167,34 @@ class SweetViewSet(viewsets.ModelViewSet):
         GET /api/sweets/:id/
         """
         try:
-            sweet = self.get_queryset().get(pk=pk)
-            serializer = self.get_serializer(sweet)
-            return Response(serializer.data)
+            stock = self.sweet_versions().get(pk=pk)
+            validators = sweet_validators(pk, stock[-1], self.requested_fields)
+            response = self.precondition_response(request, validators)
+            if response is None:
+                data = catalog_cache.get_or_build(
+                    self.detail_cache_key(pk),
+                    lambda: self.get_serializer(self.get_queryset().get(pk=pk)).data
+                )
+                response = self.data_response(with_stock(data, stock), validators)
+            return response
+        except Sweet.DoesNotExist:
+            return Response(
+                {'detail': 'Sweet not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+    
+    async def aretrieve(self, request, pk=None):
+        async def build():
+            return self.get_serializer(await self.get_queryset().aget(pk=pk)).data
+        
+        try:
+            stock = await self.sweet_versions().aget(pk=pk)
+            validators = sweet_validators(pk, stock[-1], self.requested_fields)
+            response = self.precondition_response(request, validators)
+            if response is None:
+                data = await catalog_cache.aget_or_build(self.detail_cache_key(pk), build)
+                response = self.data_response(with_stock(data, stock), validators)
+            return response
         except Sweet.DoesNotExist:
             return Response(
                 {'detail': 'Sweet not found'},
@@ -71,12 +207,25 @@ class SweetViewSet(viewsets.ModelViewSet):
         PUT /api/sweets/:id/
         """
         try:
-            sweet = self.get_queryset().get(pk=pk)
-            serializer = self.get_serializer(sweet, data=request.data)
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic():
+                sweet = self.get_queryset().select_for_update().get(pk=pk)
+                
+                # Optimistic concurrency: reject the write if If-Match names
+                # a version of the sweet other than the current one
+                precondition = evaluate_preconditions(
+                    request, *sweet_validators(sweet.pk, sweet.updated_at)
+                )
+                if precondition is not None:
+                    return precondition
+                
+                serializer = self.get_serializer(sweet, data=request.data)
+                if not serializer.is_valid():
+                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+                sweet = serializer.save()
+            
+            return set_validators(
+                Response(serializer.data), *sweet_validators(sweet.pk, sweet.updated_at)
+            )
         except Sweet.DoesNotExist:
             return Response(
                 {'detail': 'Sweet not found'},
@@ -101,47 +250,493 @@ class SweetViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def search(self, request):
         """
-        Search sweets by name, category, or price range
-        GET /api/sweets/search/?name=chocolate&category=Chocolate&min_price=2.00&max_price=5.00
+        Search sweets by text, category, or price range
+        GET /api/sweets/search/?q=chocolate&category=Chocolate&min_price=2.00&max_price=5.00
         
         Query Parameters:
-        - name: Search in sweet name (case-insensitive, partial match)
+        - q (or name): Full-text search over name and description, also
+          matching partial names; results are ranked by relevance
         - category: Filter by exact category
         - min_price: Minimum price filter
         - max_price: Maximum price filter
+        - in_stock: true/false to only show sweets with/without stock
+        - cursor / page_size: Pagination, same as the list endpoint
+        """
+        try:
+            return self.get_page_response(
+                request,
+                lambda: self.get_page_data(self.search_queryset(request)),
+                by_stock=search_filters(request.query_params)['in_stock'] is not None
+            )
+        except InvalidSearchParam as exc:
+            return Response(
+                {'error': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    async def asearch(self, request):
+        try:
+            return await self.aget_page_response(
+                request,
+                lambda: self.aget_page_data(self.search_queryset(request)),
+                by_stock=search_filters(request.query_params)['in_stock'] is not None
+            )
+        except InvalidSearchParam as exc:
+            return Response(
+                {'error': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Suggest sweet names for a search box
+        GET /api/sweets/autocomplete/?q=choc&limit=10
+        
+        Matches names with a word starting with q, ignoring case and
+        accents. Served from an in-memory index, not the database.
         """
-        queryset = self.get_queryset()
+        try:
+            limit = _positive_int(
+                request.query_params.get('limit', DEFAULT_LIMIT), strict=True, cutoff=MAX_LIMIT
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid limit value'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = name_index.suggest(request.query_params.get('q', ''), limit=limit)
+        return Response({'results': results})
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Sweets created, updated or deleted since a watermark, for clients
+        that keep a copy of the catalog
+        GET /api/sweets/changes/?since=<token>&page_size=500
         
-        # Get query parameters
-        name = request.query_params.get('name', None)
-        category = request.query_params.get('category', None)
-        min_price = request.query_params.get('min_price', None)
-        max_price = request.query_params.get('max_price', None)
+        Query Parameters:
+        - since: `next` token of the previous response, or an ISO 8601
+          timestamp; leave out to fetch the whole catalog
+        - page_size: Changes per response (default 500, max 5000)
+        - fields / view: Same field selection as the other reads
         
-        # Apply filters
-        if name:
-            queryset = queryset.filter(name__icontains=name)
+        Returns {"results": [...], "deleted": [ids], "next": token, "has_more": bool}.
+        Keep requesting with since=next while has_more is true. 410 means
+        the watermark is too old and the client must sync from scratch.
+        """
+        try:
+            position = decode_watermark(request.query_params.get('since', None))
+        except InvalidWatermark as exc:
+            return Response(
+                {'error': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if category:
-            queryset = queryset.filter(category=category)
+        try:
+            page_size = _positive_int(
+                request.query_params.get('page_size', CHANGES_PAGE_SIZE),
+                strict=True,
+                cutoff=CHANGES_MAX_PAGE_SIZE
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid page_size value'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if min_price:
-            try:
-                queryset = queryset.filter(price__gte=float(min_price))
-            except ValueError:
-                return Response(
-                    {'error': 'Invalid min_price value'},
-                    status=status.HTTP_400_BAD_REQUEST
+        try:
+            data = changes_since(position, page_size=page_size, fields=self.requested_fields)
+        except ExpiredWatermark as exc:
+            return Response(
+                {'error': str(exc)},
+                status=status.HTTP_410_GONE
+            )
+        return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Facet counts for a search
+        GET /api/sweets/facets/?q=chocolate&max_price=5.00
+        
+        Accepts the same filters as search and returns, in one query:
+        - total: number of matching sweets
+        - categories: count per category
+        - stock: in_stock / out_of_stock counts
+        - price: min, max and a histogram of price buckets
+        
+        Results are cached per distinct filter set, however the query
+        string spells it, and per stock state, since the counts depend on it.
+        """
+        try:
+            filters = search_filters(request.query_params)
+        except InvalidSearchParam as exc:
+            return Response(
+                {'error': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        version, changed_at = get_catalog_version(), stock_changed_at()
+        validators = catalog_validators(version, changed_at, request)
+        response = self.precondition_response(request, validators)
+        if response is None:
+            data = catalog_cache.get_or_build(
+                ('facets', filter_key(filters), changed_at),
+                lambda: facet_counts(filter_sweets(self.get_queryset(), filters, ranked=False)[0]),
+                version=version
+            )
+            response = self.data_response(data, validators)
+        return response
+    
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Create many sweets at once (Admin only)
+        POST /api/sweets/bulk/
+        Body: [{"name": "...", "price": "1.00", "quantity": 5}, ...]
+        
+        All or nothing: if any item is invalid, nothing is created and the
+        errors come back per item, in request order.
+        """
+        serializer = self.get_bulk_serializer(data=request.data)
+        if not serializer.is_valid():
+            return self.bulk_error_response('Bulk create failed, no sweets were created', serializer)
+        
+        with transaction.atomic():
+            sweets = serializer.save()
+            bump_catalog_version()
+            publish_stock(sweets)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @bulk_create.mapping.put
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        """
+        Update many sweets at once (Admin only)
+        PUT /api/sweets/bulk/   - full updates, like PUT /api/sweets/:id/
+        PATCH /api/sweets/bulk/ - partial updates
+        Body: [{"id": 1, "price": "1.10"}, ...]
+        
+        All or nothing, with per-item errors like bulk create.
+        """
+        with transaction.atomic():
+            # Locked in primary-key order, like checkouts and bulk restocks,
+            # so overlapping writes queue instead of deadlocking
+            sweets = {
+                sweet.pk: sweet
+                for sweet in self.get_queryset().select_for_update()
+                .filter(pk__in=_item_ids(request.data))
+                .order_by('pk')
+            }
+            serializer = self.get_bulk_serializer(
+                sweets,
+                data=request.data,
+                partial=request.method == 'PATCH'
+            )
+            if not serializer.is_valid():
+                return self.bulk_error_response(
+                    'Bulk update failed, no sweets were changed', serializer
                 )
+            sweets = serializer.save()
+            bump_catalog_version()
+            publish_stock(sweets)
+        return Response(serializer.data)
+    
+    @bulk_create.mapping.delete
+    def bulk_destroy(self, request):
+        """
+        Delete many sweets at once (Admin only)
+        DELETE /api/sweets/bulk/
+        Body: {"ids": [1, 2, 3]}
         
-        if max_price:
-            try:
-                queryset = queryset.filter(price__lte=float(max_price))
-            except ValueError:
+        All or nothing: if any id does not exist, nothing is deleted.
+        """
+        serializer = SweetBulkDeleteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        ids = serializer.validated_data['ids']
+        
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(BULK_DELETE_SQL, [ids])
+                deleted = {row[0] for row in cursor.fetchall()}
+            
+            if len(deleted) != len(ids):
+                transaction.set_rollback(True)
                 return Response(
-                    {'error': 'Invalid max_price value'},
+                    {
+                        'error': 'Bulk delete failed, no sweets were deleted',
+                        'items': [
+                            {} if pk in deleted else {'id': ['Sweet not found']}
+                            for pk in ids
+                        ],
+                    },
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            bump_catalog_version()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    def get_bulk_serializer(self, *args, **kwargs):
+        return self.get_serializer(
+            *args, many=True, allow_empty=False, max_length=BULK_MAX_ITEMS, **kwargs
+        )
+    
+    def bulk_error_response(self, message, serializer):
+        errors = serializer.errors
+        if isinstance(errors, dict):
+            # The body itself was wrong: not a list, empty or too long
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'error': message, 'items': errors},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdmin])
+    def export(self, request):
+        """
+        Stream the whole catalog (Admin only)
+        GET /api/sweets/export/?type=csv&category=Chocolate
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        Query Parameters:
+        - type: ndjson (default, one JSON object per line) or csv
+        - q, name, category, min_price, max_price, in_stock: Same filters as search
+        - fields / view: Same field selection as the other reads
+        """
+        try:
+            name, content_type, filename = export_format(request.query_params)
+            queryset, ordering = search_sweets(self.get_queryset(), request.query_params)
+        except (InvalidExportFormat, InvalidSearchParam) as exc:
+            return Response(
+                {'error': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        response = StreamingHttpResponse(
+            export_stream(request, queryset, ordering, name, fields=self.requested_fields),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Create or update many sweets from a CSV or NDJSON file (Admin only)
+        POST /api/sweets/import/?type=csv  (multipart, file in `file`)
+        
+        Rows with an id update that sweet, other rows update the sweet of
+        the same name or create one. Invalid rows are skipped and reported:
+        {"processed": 3, "created": 1, "updated": 1,
+         "errors": [{"line": 4, "errors": {"price": ["..."]}}]}
+        """
+        upload = request.FILES.get('file', None)
+        if upload is None:
+            return Response(
+                {'error': 'Upload the catalog as multipart form field "file"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        name = request.query_params.get('type', None)
+        if not name:
+            name = 'csv' if upload.name.lower().endswith('.csv') else 'ndjson'
+        
+        try:
+            report = import_sweets(upload, name)
+        except InvalidImportFile as exc:
+            return Response(
+                {'error': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(report)
+    
+    def get_page_response(self, request, build, by_stock=False):
+        """
+        Answer a page read: 304 if the client's copy is current, else the
+        page build() renders (see get_page_data), from the catalog cache
+        
+        Cached pages are served with their stock read fresh. When stock
+        decides which rows are on the page, pass by_stock=True to cache it
+        per stock state instead.
+        """
+        version, changed_at = get_catalog_version(), stock_changed_at()
+        validators = catalog_validators(version, changed_at, request)
+        response = self.precondition_response(request, validators)
+        if response is None:
+            page = catalog_cache.get_or_build(
+                self.page_cache_key(request, changed_at if by_stock else None),
+                build,
+                version=version
+            )
+            if not by_stock:
+                page = self.page_with_stock(page, current_stock(page['ids']))
+            response = self.data_response(page['data'], validators)
+        return response
+    
+    async def aget_page_response(self, request, build, by_stock=False):
+        version, changed_at = await aget_catalog_version(), await astock_changed_at()
+        validators = catalog_validators(version, changed_at, request)
+        response = self.precondition_response(request, validators)
+        if response is None:
+            page = await catalog_cache.aget_or_build(
+                self.page_cache_key(request, changed_at if by_stock else None),
+                build,
+                version=version
+            )
+            if not by_stock:
+                page = self.page_with_stock(page, await acurrent_stock(page['ids']))
+            response = self.data_response(page['data'], validators)
+        return response
+    
+    def get_page_data(self, queryset):
+        """
+        Render one cursor page of `queryset` with its next/previous links,
+        as {'data': ..., 'ids': [...]} with the ids of the sweets on it
+        
+        Rows are read with values_list() and rendered by the fast path,
+        which produces the same JSON as SweetSerializer(many=True).
+        """
+        rows, selected = self.page_rows(queryset)
+        return self.render_page(rows, self.paginate_queryset(selected))
+    
+    async def aget_page_data(self, queryset):
+        rows, selected = self.page_rows(queryset)
+        page = await self.paginator.apaginate_queryset(selected, self.request, view=self)
+        return self.render_page(rows, page)
+    
+    # Read steps shared by the sync handlers and their async versions
+    
+    def sweet_versions(self):
+        """
+        (quantity, reserved, updated_at) of the sweets: the stock of a
+        cached copy of one, and updated_at to validate it
+        """
+        return self.get_queryset().values_list('quantity', 'reserved', 'updated_at')
+    
+    def search_queryset(self, request):
+        """The sweets a search matches, in the order of its pages"""
+        queryset, self.cursor_ordering = search_sweets(self.get_queryset(), request.query_params)
+        return queryset
+    
+    def detail_cache_key(self, pk):
+        return ('detail', str(pk), self.requested_fields)
+    
+    def page_cache_key(self, request, stock_changed_at=None):
+        return ('page', request.build_absolute_uri(), stock_changed_at)
+    
+    def precondition_response(self, request, validators):
+        """The 304 or 412 that answers a read without data, if any"""
+        response = evaluate_preconditions(request, *validators)
+        if response is not None:
+            response = set_validators(response, *validators)
+        return response
+    
+    def data_response(self, data, validators):
+        return set_validators(Response(data), *validators)
+    
+    def page_rows(self, queryset):
+        """The fast path for this read, and `queryset` selecting its rows in page order"""
+        rows = SweetRowSerializer(self.requested_fields)
+        return rows, rows.select(queryset, self.paginator.get_ordering(self))
+    
+    def render_page(self, rows, page):
+        return {
+            'data': self.get_paginated_response(rows.to_representation(page)).data,
+            'ids': [row.id for row in page],
+        }
+    
+    def page_with_stock(self, page, stock):
+        """A cached page with its sweets' stock fields from current_stock()"""
+        data = dict(page['data'])
+        data['results'] = [
+            with_stock(item, stock.get(pk)) for item, pk in zip(data['results'], page['ids'])
+        ]
+        return {'data': data, 'ids': page['ids']}
+
+
+def _item_ids(items):
+    """The integer `id`s found in a bulk request body, skipping malformed items"""
+    if not isinstance(items, list):
+        return []
+    ids = []
+    for item in items:
+        try:
+            ids.append(int(item['id']))
+        except (TypeError, ValueError, KeyError):
+            continue
+    return ids
+
+
+@require_GET
+async def stock_stream(request):
+    """
+    Live stock and price changes as Server-Sent Events
+    GET /api/sweets/stream/
+    
+    Sends `event: stock` with data {"id": 1, "quantity": 7, "price": "2.50"}
+    whenever a purchase, restock, checkout or admin edit commits. Takes the
+    usual Bearer token, or ?ticket= from POST /api/sweets/stream/ticket/
+    because EventSource cannot send headers.
+    Runs as a plain async view (not DRF) so that, under ASGI, an open stream
+    holds no worker thread.
+    """
+    try:
+        await _stream_user(request)
+    except (NotAuthenticated, AuthenticationFailed) as exc:
+        return JsonResponse({'detail': exc.detail}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    response = StreamingHttpResponse(stock_hub.stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def stream_ticket(request):
+    """
+    A single-use ticket to open the stock stream with
+    POST /api/sweets/stream/ticket/
+    
+    Returns {"ticket": "...", "expires_in": 30}; open the stream with
+    ?ticket= within that many seconds.
+    """
+    return Response({
+        'ticket': issue_stream_ticket(request.user),
+        'expires_in': settings.STOCK_STREAM_TICKET_SECONDS,
+    })
+
+
+async def _stream_user(request):
+    """The user of a stream request's JWT header or ?ticket="""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header:
+        raw_token = authentication.get_raw_token(header)
+        if not raw_token:
+            raise NotAuthenticated()
+        token = authentication.get_validated_token(raw_token)
+        load = partial(_load_stream_user, authentication.get_user, token)
+    elif request.GET.get('ticket'):
+        load = partial(_load_stream_user, _redeem_ticket, request.GET['ticket'])
+    else:
+        raise NotAuthenticated()
+    # Not thread-sensitive: a request's own thread, and its database
+    # connection, would otherwise live as long as the stream
+    return await sync_to_async(load, thread_sensitive=False)()
+
+
+def _redeem_ticket(ticket):
+    user = redeem_stream_ticket(ticket)
+    if user is None:
+        raise AuthenticationFailed('Stream ticket is invalid, expired or already used')
+    return user
+
+
+def _load_stream_user(get_user, credentials):
+    try:
+        return get_user(credentials)
+    finally:
+        connection.close()
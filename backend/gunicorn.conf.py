@@ -0,0 +1,34 @@
+"""
+Gunicorn configuration
+
+SERVER_MODE picks how the app is served:
+- wsgi (default): sync workers running sweet_shop.wsgi, one request per
+  worker. With PURCHASE_GROUP_COMMIT_MS set, threaded workers instead
+  (GUNICORN_THREADS each), since purchases can only share a commit with
+  others their worker serves at the same time
+- asgi: uvicorn workers running sweet_shop.asgi. Catalog reads run on the
+  event loop, so a slow query does not hold a worker, and
+  /api/sweets/stream/ is available. The dashboard's live stock updates
+  need this mode; docker-compose.yml sets it
+"""
+
+import os
+
+bind = '0.0.0.0:8000'
+workers = int(os.getenv('WEB_CONCURRENCY', 3))
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'sweet_shop.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'sweet_shop.wsgi:application'
+    if float(os.getenv('PURCHASE_GROUP_COMMIT_MS', 0)):
+        worker_class = 'gthread'
+        threads = int(os.getenv('GUNICORN_THREADS', 16))
+
+
+def post_worker_init(worker):
+    """Start building the worker's autocomplete index, and keeping it current"""
+    from apps.sweets.autocomplete import name_index
+
+    name_index.start()
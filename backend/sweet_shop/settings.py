@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 import os
 
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework_simplejwt',
@@ -119,6 +121,65 @@ REST_FRAMEWORK = {
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
 }
 
+# Per-worker cache of serialized catalog pages, see apps/sweets/cache.py
+# Set to 0 to disable
+CATALOG_CACHE_MAX_BYTES = int(os.getenv("CATALOG_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# How often the background thread of each worker's autocomplete index checks
+# for writes made elsewhere, see apps/sweets/autocomplete.py
+AUTOCOMPLETE_REFRESH_SECONDS = float(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", 5))
+
+# Delta sync (GET /api/sweets/changes/), see apps/sweets/changes.py
+# Changes younger than this are held back until their transactions commit;
+# it must exceed the time any write takes from stamping a row to committing
+CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS", 5))
+# Deletions are remembered this long; older watermarks must resync in full
+CHANGES_TOMBSTONE_RETENTION_DAYS = int(os.getenv("CHANGES_TOMBSTONE_RETENTION_DAYS", 30))
+
+# Server mode, chosen in gunicorn.conf.py: 'wsgi' (sync workers) serves
+# everything from the sync DRF views; 'asgi' (uvicorn workers) serves
+# catalog reads from async views and offers the live stock stream, which
+# is not routed at all under WSGI. docker-compose.yml runs 'asgi'. The
+# default stays 'wsgi' because runserver and sweet_shop.wsgi are WSGI
+# servers, where a stream would pin a whole worker per open dashboard
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+# Async catalog reads querying at once per worker, see apps/sweets/async_views.py
+# Each holds a database connection, so keep workers x this under max_connections
+ASYNC_DB_CONCURRENCY = int(os.getenv("ASYNC_DB_CONCURRENCY", 20))
+
+# Live stock updates (GET /api/sweets/stream/), see apps/sweets/realtime.py
+# Idle streams get a comment line this often so proxies keep them open
+STOCK_STREAM_KEEPALIVE_SECONDS = float(os.getenv("STOCK_STREAM_KEEPALIVE_SECONDS", 15))
+# Updates buffered per client; a client this far behind is disconnected
+STOCK_STREAM_QUEUE_SIZE = int(os.getenv("STOCK_STREAM_QUEUE_SIZE", 256))
+# Streams are opened with a single-use ticket (POST /api/sweets/stream/ticket/)
+# that must be redeemed within this many seconds
+STOCK_STREAM_TICKET_SECONDS = float(os.getenv("STOCK_STREAM_TICKET_SECONDS", 30))
+
+# Inventory ledger snapshots (manage.py snapshot_stock), see apps/inventory/ledger.py
+# Movements younger than this are left to the next run until they commit
+STOCK_SNAPSHOT_SETTLE_SECONDS = float(os.getenv("STOCK_SNAPSHOT_SETTLE_SECONDS", 60))
+
+# Sales rollups (manage.py rollup_sales), see apps/inventory/sales.py
+# Purchases younger than this are left to the next run until they commit
+SALES_ROLLUP_SETTLE_SECONDS = float(os.getenv("SALES_ROLLUP_SETTLE_SECONDS", 60))
+
+# Idempotency-Key on purchase/restock/checkout, see apps/inventory/idempotency.py
+# Retries within this window replay the stored response; older keys are purged
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", 24))
+
+# Stock reservations, see apps/inventory/reservations.py
+# Units stay held this long unless confirmed or cancelled first
+RESERVATION_TTL_SECONDS = int(os.getenv("RESERVATION_TTL_SECONDS", 900))
+
+# Group commit for purchases, see apps/inventory/group_commit.py
+# Purchases wait up to this long to share a commit; 0 commits each alone.
+# Needs workers serving requests at once: ASGI, or WSGI with the threaded
+# workers gunicorn.conf.py then runs
+PURCHASE_GROUP_COMMIT_MS = float(os.getenv("PURCHASE_GROUP_COMMIT_MS", 0))
+# A batch is committed at once when it has this many purchases
+PURCHASE_GROUP_COMMIT_MAX_BATCH = int(os.getenv("PURCHASE_GROUP_COMMIT_MAX_BATCH", 256))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -149,6 +210,11 @@ CORS_ALLOWED_ORIGINS = config(
     default='http://localhost:5173,http://localhost:3000'
 ).split(',')
 
+# Let the dashboard revalidate catalog reads, send If-Match on updates and
+# retry stock changes with an Idempotency-Key
+CORS_ALLOW_HEADERS = (*default_headers, 'if-match', 'if-none-match', 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified', 'Idempotent-Replayed']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -1,18 +1,30 @@
 /**
  * SearchBar Component
  * Allows users to search and filter sweets (Modern Tailwind UI)
+ * `facets` (from getSweetFacets) adds match counts to the filters
  */
 
 import { useState } from 'react';
 
-const SearchBar = ({ onSearch, onClear }) => {
+const SearchBar = ({ onSearch, onClear, facets = null }) => {
   const [filters, setFilters] = useState({
     name: '',
     category: '',
     min_price: '',
     max_price: '',
+    in_stock: false,
   });
 
+  const categoryCounts = Object.fromEntries(
+    (facets?.categories || []).map(({ value, count }) => [value, count])
+  );
+
+  const categoryLabel = (cat) => {
+    if (!facets) return cat;
+    const count = cat === 'All' ? facets.total : categoryCounts[cat] ?? 0;
+    return `${cat} (${count})`;
+  };
+
   const categories = [
     'All',
     'Chocolate',
@@ -27,10 +39,10 @@ const SearchBar = ({ onSearch, onClear }) => {
    * Handle input change
    */
   const handleChange = (e) => {
-    const { name, value } = e.target;
+    const { name, value, type, checked } = e.target;
     setFilters((prev) => ({
       ...prev,
-      [name]: value,
+      [name]: type === 'checkbox' ? checked : value,
     }));
   };
 
@@ -45,6 +57,7 @@ const SearchBar = ({ onSearch, onClear }) => {
     if (filters.category) searchFilters.category = filters.category;
     if (filters.min_price) searchFilters.min_price = filters.min_price;
     if (filters.max_price) searchFilters.max_price = filters.max_price;
+    if (filters.in_stock) searchFilters.in_stock = true;
 
     onSearch(searchFilters);
   };
@@ -58,6 +71,7 @@ const SearchBar = ({ onSearch, onClear }) => {
       category: '',
       min_price: '',
       max_price: '',
+      in_stock: false,
     });
     onClear();
   };
@@ -101,7 +115,7 @@ const SearchBar = ({ onSearch, onClear }) => {
             >
               {categories.map((cat) => (
                 <option key={cat} value={cat === 'All' ? '' : cat}>
-                  {cat}
+                  {categoryLabel(cat)}
                 </option>
               ))}
             </select>
@@ -117,7 +131,7 @@ const SearchBar = ({ onSearch, onClear }) => {
               name="min_price"
               value={filters.min_price}
               onChange={handleChange}
-              placeholder="0.00"
+              placeholder={facets?.price.min ?? '0.00'}
               step="0.01"
               min="0"
               className="w-full px-4 py-2 border border-gray-300 rounded-lg
@@ -136,7 +150,7 @@ const SearchBar = ({ onSearch, onClear }) => {
               name="max_price"
               value={filters.max_price}
               onChange={handleChange}
-              placeholder="100.00"
+              placeholder={facets?.price.max ?? '100.00'}
               step="0.01"
               min="0"
               className="w-full px-4 py-2 border border-gray-300 rounded-lg
@@ -147,7 +161,17 @@ const SearchBar = ({ onSearch, onClear }) => {
         </div>
 
         {/* Actions */}
-        <div className="flex flex-col sm:flex-row gap-4 justify-end">
+        <div className="flex flex-col sm:flex-row gap-4 justify-end sm:items-center">
+          <label className="flex items-center gap-2 text-sm font-medium text-gray-700 sm:mr-auto">
+            <input
+              type="checkbox"
+              name="in_stock"
+              checked={filters.in_stock}
+              onChange={handleChange}
+              className="h-4 w-4 rounded border-gray-300 text-indigo-600 focus:ring-indigo-500"
+            />
+            ✅ In stock only{facets && ` (${facets.stock.in_stock})`}
+          </label>
           <button
             type="button"
             onClick={handleClear}
@@ -3,7 +3,7 @@
  * Main page showing all sweets with search, CRUD, purchase, and inventory operations
  */
 
-import { useState, useEffect, useContext } from 'react';
+import { useState, useEffect, useContext, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { AuthContext } from '../context/AuthContext';
 import { 
@@ -22,6 +22,8 @@ import {
   updateSweet,
   deleteSweet,
   searchSweets,
+  getSweetFacets,
+  subscribeToStock,
 } from '../services/sweets';
 
 import { purchaseSweet, restockSweet } from '../services/inventory';
@@ -53,20 +55,51 @@ const Dashboard = () => {
 
   // Search
   const [isSearching, setIsSearching] = useState(false);
+  const [searchFilters, setSearchFilters] = useState(null);
+  const [facets, setFacets] = useState(null);
+
+  // Pages: the cursor of the next one, null once all are shown
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // Filters of the list on screen, for the stock stream to refetch it
+  const shownFilters = useRef(null);
 
   // -------------------- Effects --------------------
   useEffect(() => {
     loadSweets();
+    // Stock changes arrive as they happen. After the stream drops, refetch
+    // the list on screen to catch up on what was missed.
+    return subscribeToStock(applyStock, () =>
+      shownFilters.current ? handleSearch(shownFilters.current) : loadSweets()
+    );
   }, []);
 
   // -------------------- API Calls --------------------
+  // Counts for the filter controls. Categories are counted without the
+  // category filter, so the other options still show what they would find.
+  const loadFacets = async (filters = {}) => {
+    try {
+      const others = { ...filters };
+      delete others.category;
+      setFacets(await getSweetFacets(others));
+    } catch (err) {
+      setFacets(null);
+      console.error(err);
+    }
+  };
+
   const loadSweets = async () => {
     try {
       setLoading(true);
       setError('');
-      const data = await getAllSweets();
-      setSweets(data);
+      const { results, next } = await getAllSweets();
+      setSweets(results);
+      setNextCursor(next);
       setIsSearching(false);
+      setSearchFilters(null);
+      shownFilters.current = null;
+      loadFacets();
     } catch (err) {
       setError('Failed to load sweets. Please try again.');
       console.error(err);
@@ -79,9 +112,13 @@ const Dashboard = () => {
     try {
       setLoading(true);
       setError('');
-      const data = await searchSweets(filters);
-      setSweets(data);
+      const { results, next } = await searchSweets(filters);
+      setSweets(results);
+      setNextCursor(next);
       setIsSearching(true);
+      setSearchFilters(filters);
+      shownFilters.current = filters;
+      loadFacets(filters);
     } catch (err) {
       setError('Search failed. Please try again.');
       console.error(err);
@@ -92,6 +129,34 @@ const Dashboard = () => {
 
   const handleClearSearch = () => loadSweets();
 
+  const handleLoadMore = async () => {
+    try {
+      setLoadingMore(true);
+      setError('');
+      const { results, next } = searchFilters
+        ? await searchSweets(searchFilters, nextCursor)
+        : await getAllSweets(nextCursor);
+      setSweets((shown) => [...shown, ...results]);
+      setNextCursor(next);
+    } catch (err) {
+      setError('Failed to load more sweets. Please try again.');
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // -------------------- Live Updates --------------------
+  const updateShown = (id, changes) => {
+    setSweets((shown) => shown.map((sweet) => (
+      sweet.id === id ? { ...sweet, ...changes } : sweet
+    )));
+  };
+
+  const applyStock = ({ id, quantity, price }) => {
+    updateShown(id, { quantity, price, is_in_stock: quantity > 0 });
+  };
+
   // -------------------- CRUD --------------------
   const handleAddSweet = () => {
     setEditingSweet(null);
@@ -106,13 +171,16 @@ const Dashboard = () => {
   const handleFormSubmit = async (formData) => {
     try {
       if (editingSweet) {
-        await updateSweet(editingSweet.id, formData);
+        const updated = await updateSweet(editingSweet.id, formData);
+        updateShown(updated.id, updated);
+        loadFacets(searchFilters || {});
       } else {
         await createSweet(formData);
+        // Where a new sweet falls in the list is up to the server
+        loadSweets();
       }
       setShowForm(false);
       setEditingSweet(null);
-      loadSweets();
     } catch (err) {
       throw err;
     }
@@ -120,9 +188,11 @@ const Dashboard = () => {
 
   const handleDeleteConfirm = async () => {
     try {
-      await deleteSweet(deletingSweet.id);
+      const { id } = deletingSweet;
+      await deleteSweet(id);
       setDeletingSweet(null);
-      loadSweets();
+      setSweets((shown) => shown.filter((sweet) => sweet.id !== id));
+      loadFacets(searchFilters || {});
     } catch (err) {
       setError('Failed to delete sweet.');
       console.error(err);
@@ -132,8 +202,14 @@ const Dashboard = () => {
   // -------------------- Purchase --------------------
   const handlePurchaseConfirm = async (quantity) => {
     try {
-      const result = await purchaseSweet(purchasingSweet.id, quantity);
+      const { id } = purchasingSweet;
+      const result = await purchaseSweet(id, quantity);
       setPurchasingSweet(null);
+      // The stream brings the same change; don't wait for it
+      updateShown(id, {
+        quantity: result.remaining_quantity,
+        is_in_stock: result.remaining_quantity > 0,
+      });
 
       setSuccessMessage({
         message: result.message,
@@ -144,7 +220,7 @@ const Dashboard = () => {
         },
       });
 
-      loadSweets();
+      loadFacets(searchFilters || {});
     } catch (err) {
       throw err;
     }
@@ -153,8 +229,10 @@ const Dashboard = () => {
   // -------------------- Restock --------------------
   const handleRestockConfirm = async (quantity) => {
     try {
-      const result = await restockSweet(restockingSweet.id, quantity);
+      const { id } = restockingSweet;
+      const result = await restockSweet(id, quantity);
       setRestockingSweet(null);
+      updateShown(id, { quantity: result.new_quantity, is_in_stock: result.new_quantity > 0 });
 
       setSuccessMessage({
         message: result.message,
@@ -165,7 +243,7 @@ const Dashboard = () => {
         },
       });
 
-      loadSweets();
+      loadFacets(searchFilters || {});
     } catch (err) {
       throw err;
     }
@@ -252,7 +330,7 @@ const Dashboard = () => {
 
         {/* Search Bar */}
         <div className="mb-8">
-          <SearchBar onSearch={handleSearch} onClear={handleClearSearch} />
+          <SearchBar onSearch={handleSearch} onClear={handleClearSearch} facets={facets} />
         </div>
 
         {/* Error Banner */}
@@ -290,6 +368,20 @@ const Dashboard = () => {
           </div>
         )}
 
+        {/* Load More */}
+        {!loading && nextCursor && (
+          <div className="flex justify-center mt-8">
+            <button
+              onClick={handleLoadMore}
+              disabled={loadingMore}
+              className="flex items-center space-x-2 px-6 py-3 bg-white text-purple-600 font-semibold rounded-lg border border-purple-200 hover:bg-purple-50 transition-all duration-200 shadow-md disabled:opacity-60"
+            >
+              {loadingMore && <FaSpinner className="animate-spin" />}
+              <span>{loadingMore ? 'Loading...' : 'Load More Sweets'}</span>
+            </button>
+          </div>
+        )}
+
         {/* Empty State */}
         {!loading && sweets.length === 0 && (
           <div className="bg-white/90 backdrop-blur-md rounded-2xl shadow-xl p-12 text-center border border-purple-100">
@@ -124,6 +124,21 @@ export const getUserProfile = async () => {
   }
 };
 
+/**
+ * Get the current user's orders, newest first
+ * @param {string} cursor - Optional cursor from a previous page's next/previous link
+ * @returns {Promise} Page with next, previous and results
+ */
+export const getMyOrders = async (cursor = null) => {
+  try {
+    const response = await api.get('/auth/profile/orders/', { params: cursor ? { cursor } : {} });
+    return response.data;
+  } catch (error) {
+    console.error('❌ Orders fetch error:', error.response?.data || error.message);
+    throw error.response?.data || { message: error.message };
+  }
+};
+
 /**
  * Check if user is authenticated
  * @returns {boolean} True if user has access token
@@ -5,6 +5,10 @@
 
 import api from './api';
 
+// One key per user action: if the request is retried, the server replays
+// the first response instead of changing stock twice
+const idempotencyHeaders = () => ({ 'Idempotency-Key': crypto.randomUUID() });
+
 /**
  * Purchase a sweet
  * @param {number} sweetId - Sweet ID
@@ -14,7 +18,9 @@ import api from './api';
 export const purchaseSweet = async (sweetId, quantity = 1) => {
   try {
     console.log('🔵 Purchasing sweet:', sweetId, 'quantity:', quantity);
-    const response = await api.post(`/sweets/${sweetId}/purchase/`, { quantity });
+    const response = await api.post(
+      `/sweets/${sweetId}/purchase/`, { quantity }, { headers: idempotencyHeaders() }
+    );
     console.log('✅ Purchase successful:', response.data);
     return response.data;
   } catch (error) {
@@ -32,11 +38,108 @@ export const purchaseSweet = async (sweetId, quantity = 1) => {
 export const restockSweet = async (sweetId, quantity = 10) => {
   try {
     console.log('🔵 Restocking sweet:', sweetId, 'quantity:', quantity);
-    const response = await api.post(`/sweets/${sweetId}/restock/`, { quantity });
+    const response = await api.post(
+      `/sweets/${sweetId}/restock/`, { quantity }, { headers: idempotencyHeaders() }
+    );
     console.log('✅ Restock successful:', response.data);
     return response.data;
   } catch (error) {
     console.error('❌ Restock error:', error);
     throw error.response?.data || { error: error.message };
   }
-};
\ No newline at end of file
+};
+
+/**
+ * Hold units of a sweet until checkout
+ * @param {number} sweetId - Sweet ID
+ * @param {number} quantity - Quantity to hold (default: 1)
+ * @returns {Promise} The reservation, with its id and expires_at
+ */
+export const reserveSweet = async (sweetId, quantity = 1) => {
+  try {
+    const response = await api.post(
+      `/sweets/${sweetId}/reserve/`, { quantity }, { headers: idempotencyHeaders() }
+    );
+    return response.data;
+  } catch (error) {
+    console.error('❌ Reservation error:', error);
+    throw error.response?.data || { error: error.message };
+  }
+};
+
+/**
+ * Purchase the units a reservation holds
+ * @param {number} reservationId - Reservation ID
+ * @returns {Promise} Purchase result
+ */
+export const confirmReservation = async (reservationId) => {
+  try {
+    const response = await api.post(
+      `/sweets/reservations/${reservationId}/confirm/`, {}, { headers: idempotencyHeaders() }
+    );
+    return response.data;
+  } catch (error) {
+    console.error('❌ Confirm reservation error:', error);
+    throw error.response?.data || { error: error.message };
+  }
+};
+
+/**
+ * Release the units a reservation holds
+ * @param {number} reservationId - Reservation ID
+ * @returns {Promise} Cancellation result
+ */
+export const cancelReservation = async (reservationId) => {
+  try {
+    const response = await api.post(`/sweets/reservations/${reservationId}/cancel/`);
+    return response.data;
+  } catch (error) {
+    console.error('❌ Cancel reservation error:', error);
+    throw error.response?.data || { error: error.message };
+  }
+};
+
+/**
+ * Best-selling sweets by units sold (Admin only)
+ * @param {Object} params - start, end (YYYY-MM-DD) and limit, all optional
+ * @returns {Promise} Report with results, best first
+ */
+export const getTopSellers = async (params = {}) => {
+  try {
+    const response = await api.get('/sweets/sales/top-sellers/', { params });
+    return response.data;
+  } catch (error) {
+    console.error('❌ Top sellers error:', error);
+    throw error.response?.data || { error: error.message };
+  }
+};
+
+/**
+ * Units and revenue per category (Admin only)
+ * @param {Object} params - start and end (YYYY-MM-DD), optional
+ * @returns {Promise} Report with results, highest revenue first
+ */
+export const getRevenueByCategory = async (params = {}) => {
+  try {
+    const response = await api.get('/sweets/sales/by-category/', { params });
+    return response.data;
+  } catch (error) {
+    console.error('❌ Revenue by category error:', error);
+    throw error.response?.data || { error: error.message };
+  }
+};
+
+/**
+ * Units and revenue per hour or day (Admin only)
+ * @param {Object} params - interval (hour|day), start, end, sweet_id or category
+ * @returns {Promise} Report with one result per bucket, oldest first
+ */
+export const getSalesOverTime = async (params = {}) => {
+  try {
+    const response = await api.get('/sweets/sales/over-time/', { params });
+    return response.data;
+  } catch (error) {
+    console.error('❌ Sales over time error:', error);
+    throw error.response?.data || { error: error.message };
+  }
+};
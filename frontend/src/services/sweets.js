@@ -5,16 +5,22 @@
 
 import api from './api';
 
+// The cursor in a page's `next` link, or null on the last page
+const nextCursor = (next) =>
+  next ? new URL(next, window.location.origin).searchParams.get('cursor') : null;
+
 /**
- * Get all sweets
- * @returns {Promise} List of all sweets
+ * Get a page of sweets
+ * @param {string} cursor - `next` of the previous page (optional)
+ * @returns {Promise} { results, next }: the sweets on the page, and the
+ *   cursor of the following page (null on the last one)
  */
-export const getAllSweets = async () => {
+export const getAllSweets = async (cursor = null) => {
   try {
-    console.log('🔵 Fetching all sweets...');
-    const response = await api.get('/sweets/');
-    console.log('✅ Sweets fetched:', response.data.length, 'items');
-    return response.data;
+    console.log('🔵 Fetching sweets...');
+    const response = await api.get('/sweets/', { params: cursor ? { cursor } : {} });
+    console.log('✅ Sweets fetched:', response.data.results.length, 'items');
+    return { results: response.data.results, next: nextCursor(response.data.next) };
   } catch (error) {
     console.error('❌ Error fetching sweets:', error);
     throw error.response?.data || { message: error.message };
@@ -91,11 +97,13 @@ export const deleteSweet = async (id) => {
 };
 
 /**
- * Search sweets with filters
- * @param {Object} filters - Search filters (name, category, min_price, max_price)
- * @returns {Promise} List of matching sweets
+ * Search sweets with filters, a page at a time
+ * @param {Object} filters - Search filters (name, category, min_price, max_price, in_stock)
+ * @param {string} cursor - `next` of the previous page (optional)
+ * @returns {Promise} { results, next }: the matching sweets on the page, and
+ *   the cursor of the following page (null on the last one)
  */
-export const searchSweets = async (filters) => {
+export const searchSweets = async (filters, cursor = null) => {
   try {
     console.log('🔵 Searching sweets with filters:', filters);
     
@@ -105,12 +113,86 @@ export const searchSweets = async (filters) => {
     if (filters.category) params.append('category', filters.category);
     if (filters.min_price) params.append('min_price', filters.min_price);
     if (filters.max_price) params.append('max_price', filters.max_price);
+    if (filters.in_stock) params.append('in_stock', 'true');
+    if (cursor) params.append('cursor', cursor);
     
     const response = await api.get(`/sweets/search/?${params.toString()}`);
-    console.log('✅ Search results:', response.data.length, 'items');
-    return response.data;
+    console.log('✅ Search results:', response.data.results.length, 'items');
+    return { results: response.data.results, next: nextCursor(response.data.next) };
   } catch (error) {
     console.error('❌ Error searching sweets:', error);
     throw error.response?.data || { message: error.message };
   }
-};
\ No newline at end of file
+};
+
+/**
+ * Get category, stock and price facets for a set of search filters
+ * @param {Object} filters - Search filters (name, category, min_price, max_price, in_stock)
+ * @returns {Promise} Facet counts ({ total, categories, stock, price })
+ */
+export const getSweetFacets = async (filters = {}) => {
+  try {
+    const response = await api.get('/sweets/facets/', { params: filters });
+    return response.data;
+  } catch (error) {
+    console.error('❌ Error fetching facets:', error);
+    throw error.response?.data || { message: error.message };
+  }
+};
+
+/**
+ * Subscribe to live stock and price changes
+ * @param {Function} onChange - Called with { id, quantity, price } for each change
+ * @param {Function} onReconnect - Called when the stream reopens after a drop;
+ *   changes made while it was down were missed
+ * @returns {Function} Call to unsubscribe
+ */
+export const subscribeToStock = (onChange, onReconnect = () => {}) => {
+  let source = null;
+  let retry = null;
+  let closed = false;
+  let dropped = false;
+
+  // EventSource cannot send headers, so each connection is opened with a
+  // fresh single-use ticket instead of the access token
+  const connect = async () => {
+    try {
+      const response = await api.post('/sweets/stream/ticket/');
+      if (closed) return;
+      source = new EventSource(
+        `${api.defaults.baseURL}/sweets/stream/?ticket=${encodeURIComponent(response.data.ticket)}`
+      );
+      source.addEventListener('stock', (event) => onChange(JSON.parse(event.data)));
+      source.onopen = () => {
+        if (dropped) onReconnect();
+        dropped = false;
+      };
+      // The server ends the stream when it falls behind or loses its own
+      // listener. The browser's reconnect would reuse the spent ticket and
+      // be refused, so start over with a new one instead.
+      source.onerror = () => reconnect();
+    } catch (error) {
+      // Only served under SERVER_MODE=asgi; without it there is no stream
+      if (error.response?.status === 404) {
+        console.warn('⚠️ Live stock updates are not available on this server');
+        return;
+      }
+      console.error('❌ Error opening stock stream:', error);
+      reconnect();
+    }
+  };
+
+  const reconnect = () => {
+    if (source) source.close();
+    source = null;
+    dropped = true;
+    if (!closed) retry = setTimeout(connect, 3000);
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retry);
+    if (source) source.close();
+  };
+};